@@ -0,0 +1,188 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from loguru import logger
+
+from tab_pool import tab_pool, auto_browser_count
+
+# Admission settings, overridable from the `admission` section of config.yaml
+DEFAULT_ADMISSION_SETTINGS = {
+    'enabled': True,
+    'max_browsers': os.getenv('ADMISSION_MAX_BROWSERS', 'auto'),   # auto: sized like the browser pool
+    'max_running_queries': int(os.getenv('ADMISSION_MAX_RUNNING_QUERIES', 200)),
+    'max_queued_queries': int(os.getenv('ADMISSION_MAX_QUEUED_QUERIES', 500)),
+    'max_wait_seconds': 30,       # a batch still queued after this long is turned away
+    'max_retry_after_seconds': 120,
+}
+
+
+class AdmissionRejected(Exception):
+    """The server is saturated; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A batch's claim on the admission limits"""
+
+    def __init__(self, queries, browsers):
+        self.queries = queries
+        self.browsers = browsers
+        self.wait_ms = 0.0
+
+
+class AdmissionController:
+    """
+    Caps the batches the Flask server runs at once: Chromes launched and queries in
+    flight. Batches that do not fit wait in a bounded FIFO queue for up to
+    max_wait_seconds; when the queue is full, or the expected wait is longer than
+    that, they are rejected at once so the client can back off
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_ADMISSION_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._changed = threading.Condition()
+        self._queue = deque()
+        self._running = 0
+        self._browsers = 0
+        self._queries = 0
+        self._queued_queries = 0
+        self._batch_seconds = None   # moving average of how long an admitted batch runs
+        self._waits = deque(maxlen=100)
+        self._counts = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+
+    def configure(self, settings=None):
+        """Apply the `admission` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    def limits(self):
+        browsers = self.settings['max_browsers']
+        if browsers == 'auto':
+            browsers = auto_browser_count(tab_pool.settings)
+        return max(1, int(browsers)), max(1, int(self.settings['max_running_queries']))
+
+    def _fits(self, ticket):
+        max_browsers, max_queries = self.limits()
+        return (self._browsers + ticket.browsers <= max_browsers
+                and self._queries + ticket.queries <= max_queries)
+
+    def _expected_wait(self, ahead):
+        """Seconds until `ahead` queued batches (and this one) could be running"""
+        if self._batch_seconds is None:
+            return None
+        return self._batch_seconds * (ahead + 1) / self.limits()[0]
+
+    def _retry_after(self, ahead):
+        expected = self._expected_wait(ahead)
+        if expected is None:
+            expected = float(self.settings['max_wait_seconds'])
+        return max(1, min(int(self.settings['max_retry_after_seconds']), math.ceil(expected)))
+
+    def _reject(self, reason, ahead, counter='rejected'):
+        self._counts[counter] += 1
+        retry_after = self._retry_after(ahead)
+        logger.warning(f"Admission rejected a batch ({reason}); retry after {retry_after}s")
+        raise AdmissionRejected(reason, retry_after)
+
+    def acquire(self, queries, browsers=1):
+        """
+        Wait for room for a batch of `queries` that launches `browsers` Chromes and return
+        its Ticket, or raise AdmissionRejected. A batch larger than a limit is clamped to
+        it, so it runs alone rather than never
+        """
+        max_browsers, max_queries = self.limits()
+        ticket = Ticket(max(0, min(int(queries), max_queries)), max(0, min(int(browsers), max_browsers)))
+        if not self.settings['enabled']:
+            return ticket
+        started = time.time()
+        max_wait = float(self.settings['max_wait_seconds'])
+        with self._changed:
+            if not self._queue and self._fits(ticket):
+                self._take(ticket, started)
+                return ticket
+            ahead = len(self._queue)
+            if self._queued_queries + ticket.queries > int(self.settings['max_queued_queries']):
+                self._reject('queue full', ahead)
+            expected = self._expected_wait(ahead)
+            if expected is not None and expected > max_wait:
+                self._reject('expected wait too long', ahead)
+            self._queue.append(ticket)
+            self._queued_queries += ticket.queries
+            try:
+                while not (self._queue[0] is ticket and self._fits(ticket)):
+                    remaining = started + max_wait - time.time()
+                    if remaining <= 0:
+                        self._reject('queue wait timed out', self._queue.index(ticket), 'timed_out')
+                    self._changed.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._queued_queries -= ticket.queries
+                self._changed.notify_all()
+            self._take(ticket, started)
+        return ticket
+
+    def _take(self, ticket, started):
+        """Count the ticket as running. Caller holds the lock"""
+        ticket.wait_ms = round((time.time() - started) * 1000, 1)
+        self._running += 1
+        self._browsers += ticket.browsers
+        self._queries += ticket.queries
+        self._counts['admitted'] += 1
+        self._waits.append(ticket.wait_ms)
+
+    def release(self, ticket, seconds):
+        if not self.settings['enabled']:
+            return
+        with self._changed:
+            self._running -= 1
+            self._browsers -= ticket.browsers
+            self._queries -= ticket.queries
+            self._batch_seconds = seconds if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * seconds
+            self._changed.notify_all()
+
+    @contextmanager
+    def admit(self, queries, browsers=1):
+        """acquire() for the duration of a with block"""
+        ticket = self.acquire(queries, browsers)
+        started = time.time()
+        try:
+            yield ticket
+        finally:
+            self.release(ticket, time.time() - started)
+
+    def stats(self):
+        max_browsers, max_queries = self.limits()
+        with self._changed:
+            waits = list(self._waits)
+            return {
+                'running_batches': self._running,
+                'browsers_in_use': self._browsers,
+                'running_queries': self._queries,
+                'queue_depth': len(self._queue),
+                'queued_queries': self._queued_queries,
+                'wait_ms': {
+                    'last': waits[-1] if waits else None,
+                    'avg': round(sum(waits) / len(waits), 1) if waits else None,
+                    'max': max(waits) if waits else None,
+                },
+                'batch_seconds_avg': round(self._batch_seconds, 2) if self._batch_seconds is not None else None,
+                'limits': {
+                    'max_browsers': max_browsers,
+                    'max_running_queries': max_queries,
+                    'max_queued_queries': int(self.settings['max_queued_queries']),
+                    'max_wait_seconds': float(self.settings['max_wait_seconds']),
+                },
+                **self._counts,
+            }
+
+
+admission = AdmissionController()
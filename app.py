@@ -1,85 +1,72 @@
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 import json
+import copy
+import threading
+import hashlib
 import time
 import requests
-import random
 import boto3
 import os
 import yaml
 from selenium.webdriver.common.by import By
 from loguru import logger
-from twocaptcha import TwoCaptcha
 from dotenv import load_dotenv
 from tempfile import mkdtemp
-from flask import Flask, request, jsonify
+from collections import OrderedDict
+from flask import Flask, Response, request, jsonify, stream_with_context
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from browser_manager import browser_manager
+from rotation import rotation_policy, stamp_decision
+from result_cache import result_cache, make_key, is_cacheable
+from single_flight import single_flight
+from http_engine import http_search, build_url
+from captcha_solver import captcha_solver, CaptchaStats
+from timings import BatchTimer
+from traffic_archive import install_traffic_shim, collect_traffic
+from html_archive import html_archive
+from parse_pool import parse_pool
+from fanout import fanout_coordinator, LambdaInvoker
+from retry_policy import retry_policy
+from jobs import job_store
+from tab_pool import tab_pool
+from admission import admission, AdmissionRejected
+from throttle import engine_throttle, search_engine
+from block_detector import block_detector, BLOCK_CHECK_SCRIPT
+from botocore.config import Config as BotoConfig
 
 load_dotenv()
 
 app = Flask(__name__)
 PLATFORM = os.getenv("platform", "DEPLOY")
 
-# Default config file path - users don't need to specify this
-DEFAULT_CONFIG_PATH = 'config.yaml'
+# Default config file path - users don't need to specify this (SERP_CONFIG_PATH swaps it, e.g. for benchmarks)
+DEFAULT_CONFIG_PATH = os.getenv('SERP_CONFIG_PATH', 'config.yaml')
+
+# Parsed configs: path -> (mtime, config)
+_config_cache = {}
 
 
 class TwoCaptchaGJ:
     
     @staticmethod
-    def twocaptcha_solver(site_key, data_s, url):
-        try:
-            logger.debug(f"Starting 2captcha solver - {os.getenv('TWOCAPTCHA_API_KEY')}")
-            initial_time = time.time()
-            solver = TwoCaptcha(os.getenv("TWOCAPTCHA_API_KEY"))  # Replace with your 2captcha API key
-            
-            # Start the captcha solving process
-            captcha_data = solver.recaptcha(
-                sitekey=site_key,
-                url=url,
-                datas=data_s,
-                version='v2',
-                action='verify',
-                score=0.9
-            )
-            captcha_id = captcha_data['captchaId']
-            logger.debug(f"Captcha solving process started with ID: {captcha_id}")
-            
-            # Poll for the result
-            max_attempts = 30
-            attempt = 0
-            while attempt < max_attempts:
-                try:
-                    result = solver.get_result(captcha_id)
-                    if result:
-                        total_time = time.time() - initial_time
-                        logger.debug(f"Captcha solved in {total_time:.2f} seconds")
-                        return result
-                except Exception as e:
-                    if "CAPTCHA_NOT_READY" in str(e):
-                        logger.debug(f"Captcha solving attempt {attempt + 1} not ready, retrying...")
-                    else:
-                        logger.error(f"Error getting captcha result: {e}")
-                        return None
-                
-                attempt += 1
-                time.sleep(5)  # Wait 5 seconds before checking again
-            
-            logger.error("Failed to solve captcha after maximum attempts")
-            return None
-        except Exception as ex:
-            logger.error(f"Error in 2captcha solver: {ex}")
-            return None
+    def twocaptcha_solver(site_key, data_s, url, stats=None):
+        """Start a solve on the shared captcha worker pool; returns a Future with the token"""
+        logger.debug("Starting 2captcha solver")
+        return captcha_solver.submit(site_key, data_s, url, stats)
 
     @staticmethod
-    def solve_captcha(driver):
+    def solve_captcha(driver, stats=None, deadline=None):
         try:
             try:
                 recaptcha_div = driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
                 site_key = recaptcha_div.get_attribute("data-sitekey")
                 data_s = recaptcha_div.get_attribute("data-s")
-                captcha_response_code = TwoCaptchaGJ.twocaptcha_solver(site_key, data_s, driver.current_url)
+                pending = TwoCaptchaGJ.twocaptcha_solver(site_key, data_s, driver.current_url, stats)
+                # Only this page waits for the token; no browser lock is held meanwhile
+                captcha_response_code = captcha_solver.wait(pending, deadline)
                 logger.debug(captcha_response_code)
 
                 if captcha_response_code:
@@ -104,11 +91,34 @@ class TwoCaptchaGJ:
             logger.error(ex)
 
 
+# Bootstrap navigation per engine, overridable in the `bootstrap` section of config.yaml
+DEFAULT_BOOTSTRAP_ENGINES = {
+    "bing": {"url": "https://www.bing.com/search?q=botxbyte+company+in+rajkot", "ready_selector": ""},
+    "google": {"url": "https://www.google.com/search?q=botxbyte+company+in+rajkot", "ready_selector": "div#search"},
+}
+
+# Network.setBlockedURLs only matches URLs, so resource types map to extensions
+BLOCKED_RESOURCE_PATTERNS = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*"],
+    "font": ["*.woff*", "*.ttf*", "*.otf*"],
+    "stylesheet": ["*.css*"],
+    "media": ["*.mp4*", "*.webm*", "*.mp3*"],
+}
+
+
 def load_yaml_config(config_path=DEFAULT_CONFIG_PATH):
-    """Load YAML configuration file from backend"""
+    """
+    Load YAML configuration file from backend. The parsed config is cached by file
+    mtime and shared between requests, so callers must treat it as read-only
+    """
     try:
+        mtime = os.path.getmtime(config_path)
+        cached = _config_cache.get(config_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
         with open(config_path, 'r', encoding='utf-8') as file:
             config = yaml.safe_load(file)
+        _config_cache[config_path] = (mtime, config)
         logger.debug(f"Successfully loaded YAML config from {config_path}")
         return config
     except FileNotFoundError:
@@ -119,87 +129,531 @@ def load_yaml_config(config_path=DEFAULT_CONFIG_PATH):
         raise
 
 
-def Gen_search(queries, cc, qft, batch_id=None, search_type="news", serpOptions=None):
+def bootstrap_settings(config, search_type):
     """
-    Perform search using backend configuration
-    Users only need to provide queries, cc, qft, and batch_id
+    Return (url, ready_selector, blocked_urls) for the navigation that sets up
+    the origin of the in-page fetch calls
     """
-    # Load YAML configuration from backend (users don't specify config_path)
+    bootstrap = config.get("bootstrap") or {}
+    engine_key = search_engine(search_type)
+    engine = dict(DEFAULT_BOOTSTRAP_ENGINES[engine_key])
+    engine.update((bootstrap.get("engines") or {}).get(engine_key) or {})
+
+    blocked_urls = []
+    if bootstrap.get("block_resources", True):
+        for resource_type in bootstrap.get("blocked_resource_types", []):
+            blocked_urls.extend(BLOCKED_RESOURCE_PATTERNS.get(resource_type, []))
+        blocked_urls.extend(bootstrap.get("blocked_url_patterns", []))
+    return engine["url"], engine.get("ready_selector") or None, blocked_urls
+
+
+def set_blocked_urls(driver, blocked_urls):
+    """Block subresources by URL pattern through CDP; a no-op on drivers without CDP"""
     try:
-        config = load_yaml_config()
-    except Exception as e:
-        logger.error(f"Failed to load configuration: {e}")
-        return {
-            'success': False,
-            'error': f'Configuration error: {str(e)}',
-            'batch_id': batch_id
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_urls})
+        return True
+    except Exception as ex:
+        logger.debug(f"Resource blocking unavailable: {ex}")
+        return False
+
+
+def bootstrap_origin(driver, initial_url, search_type, blocked_urls, captcha_stats=None, ready_selector=None,
+                     timer=None, deadline=None):
+    """Navigate to the origin page with subresources blocked; returns (error or None, bootstrap_ms)"""
+    bootstrap_started = time.time()
+    # Images, fonts, CSS and trackers are useless on the bootstrap page
+    blocking = bool(blocked_urls) and set_blocked_urls(driver, blocked_urls)
+    try:
+        origin_error = prepare_origin_page(driver, initial_url, search_type, captcha_stats, ready_selector,
+                                           timer, deadline)
+    finally:
+        if blocking:
+            # Lift the block so the extractors' own fetches are untouched
+            set_blocked_urls(driver, [])
+    bootstrap_ms = round((time.time() - bootstrap_started) * 1000)
+    if timer is not None:
+        timer.add('bootstrap', bootstrap_ms)
+    logger.debug(f"Origin page ready in {bootstrap_ms}ms")
+    return origin_error, bootstrap_ms
+
+
+def prepare_origin_page(driver, initial_url, search_type, captcha_stats=None, ready_selector=None, timer=None,
+                        deadline=None):
+    """
+    Navigate to the origin page used for in-page fetch calls, solve a CAPTCHA
+    if one is shown and wait for the page to settle.
+    Returns an error message, or None when the page is ready
+    """
+    driver.get(initial_url)
+
+    # Check and solve CAPTCHA
+    max_captcha_attempts = 5
+    captcha_attempt = 0
+    captcha_solved = False
+
+    while captcha_attempt < max_captcha_attempts:
+        if deadline is not None and time.time() >= deadline:
+            return "Invocation deadline reached before the CAPTCHA was solved."
+        try:
+            recaptcha_div = driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
+            logger.info(f"CAPTCHA detected. Attempt {captcha_attempt + 1} to solve.")
+            solve_started = time.time()
+            TwoCaptchaGJ.solve_captcha(driver, captcha_stats, deadline)
+            if timer is not None:
+                timer.add('captcha', (time.time() - solve_started) * 1000)
+            # Wait for CAPTCHA processing, but no longer than the page needs
+            try:
+                WebDriverWait(driver, 5).until(
+                    lambda d: not d.find_elements(by=By.CSS_SELECTOR, value="div#recaptcha")
+                )
+                captcha_solved = True
+                logger.info("CAPTCHA solved successfully.")
+                break
+            except TimeoutException:
+                pass
+        except Exception as ex:
+            # CAPTCHA not present
+            captcha_solved = True
+            break
+        captcha_attempt += 1
+
+    if not captcha_solved:
+        logger.error("Failed to solve CAPTCHA after multiple attempts.")
+        return "CAPTCHA could not be solved after multiple attempts."
+
+    # Wait for the engine's ready marker (div#search on a Google results page)
+    if ready_selector:
+        try:
+            ready_timeout = 40 if deadline is None else max(1, min(40, deadline - time.time()))
+            WebDriverWait(driver, ready_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+            )
+        except Exception as e:
+            logger.warning("Timeout or failure waiting for search results to load.")
+            return "Search results container did not load or page failed to appear."
+    else:
+        # Otherwise wait for the document to be ready
+        try:
+            WebDriverWait(driver, 5).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+            time.sleep(2)  # Give it a moment for dynamic content to load
+        except Exception as e:
+            logger.warning(f"Page readiness check failed: {e}")
+            # Continue anyway as this is not critical
+
+    return None
+
+
+# Extractor file and config.yaml section per search type
+EXTRACTOR_FILES = {
+    "bing-images": ('bing-img-yaml.js', 'bing_images'),
+    "bing-web": ('bing-web-yaml.js', 'bing_web'),
+    "google-news": ('google-news-yaml.js', 'google_news'),
+    "google-images": ('google-image-yaml.js', 'google_images'),
+    "google-web": ('google-web-yaml.js', 'google_web'),
+    "news": ('bing-news-yaml.js', 'bing_news'),
+}
+
+# Compiled bundles: JS file -> (file mtime, config object, bundle source, bundle version)
+_compiled_extractors = {}
+
+# In-page entry point of each extractor; `queries`, `options` and the installed `config` are in scope
+EXTRACTOR_ENTRY_POINTS = {
+    'bing-img-yaml.js': "fetchImagesWithConfig(queries, options.cc, config)",
+    'bing-web-yaml.js': "fetchWebWithConfig(queries, options.cc, config)",
+    'bing-news-yaml.js': "fetchSearchesWithConfig(queries, options.cc, options.qft, config)",
+    'google-news-yaml.js': "fetchSearchesWithConfig(queries, 10000, options.serpOptions, config)",
+    'google-image-yaml.js': "fetchSearchesWithConfig(queries, 40000, options.serpOptions, config)",
+    'google-web-yaml.js': "fetchWebWithConfig(queries, 40000, config)",
+    'fetch-only.js': "fetchRawSerps(queries)",
+}
+
+# Hybrid engine: the page only fetches, parse_pool applies the selectors
+HYBRID_FETCH_FILE = 'fetch-only.js'
+
+# Start a whole batch inside the page: a bounded pool of workers runs the installed
+# extractor one query at a time, with a random start delay, and parks each result as it settles
+BATCH_START_SCRIPT = """
+const extractor = (window.__serpExtractors || {})[arguments[0]];
+if (!extractor || extractor.version !== arguments[1]) {
+    return { __serp_missing: true };
+}
+const queries = arguments[2];
+const options = arguments[3];
+// Extractors attach the raw SERP to their results while this is set
+window.__serpKeepHtml = !!options.keepHtml;
+const concurrency = Math.max(1, arguments[4]);
+const jitterMs = arguments[5];
+const timeoutMs = arguments[6];
+// Invocation deadline (ms from now, 0 for none) and the least time worth starting a query with
+const deadlineAt = arguments[7] > 0 ? Date.now() + arguments[7] : 0;
+const minBudgetMs = arguments[8] || 0;
+const batches = window.__serpBatches = window.__serpBatches || {};
+const token = 'b' + Date.now().toString(36) + Math.random().toString(36).slice(2);
+const batch = batches[token] = { settled: [], pending: queries.length, waiter: null };
+
+const settle = (index, result) => {
+    batch.settled.push({ index: index, result: result });
+    batch.pending -= 1;
+    if (batch.waiter) {
+        const waiter = batch.waiter;
+        batch.waiter = null;
+        waiter();
+    }
+};
+
+const remainingMs = () => deadlineAt ? deadlineAt - Date.now() : Infinity;
+const unprocessed = (label, error) => ({ success: false, unprocessed: true, error: error, query: label });
+
+const runOne = (index) => {
+    const queryObj = queries[index];
+    const label = (queryObj && queryObj.query) || queryObj;
+    if (remainingMs() < minBudgetMs) {
+        settle(index, unprocessed(label, 'Deadline reached before the query started'));
+        return Promise.resolve();
+    }
+    const delay = jitterMs > 0 ? Math.random() * jitterMs : 0;
+    return new Promise(resolve => setTimeout(resolve, delay))
+        .then(() => {
+            const budgetMs = Math.min(timeoutMs, remainingMs());
+            if (budgetMs < minBudgetMs) {
+                return unprocessed(label, 'Deadline reached before the query started');
+            }
+            return Promise.race([
+                Promise.resolve().then(() => extractor.run([queryObj], options)).then(results => results[0]),
+                new Promise(resolve => setTimeout(() => resolve(budgetMs < timeoutMs
+                    ? unprocessed(label, 'Deadline reached while the query was running')
+                    : { success: false, error: 'Timeout waiting for results', query: label }), budgetMs))
+            ]);
+        })
+        .catch(error => ({
+            success: false,
+            error: error.message + ' - Stack: ' + error.stack,
+            query: label
+        }))
+        .then(result => settle(index, result));
+};
+
+let next = 0;
+const worker = () => next < queries.length ? runOne(next++).then(worker) : null;
+for (let i = 0; i < Math.min(concurrency, queries.length); i++) {
+    worker();
+}
+return token;
+"""
+
+# Long-poll a running batch: resolves as soon as at least one more query has settled
+BATCH_DRAIN_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const token = arguments[0];
+// Optional longest wait in ms; pooled tabs poll with 0 so they never hold the shared driver
+const waitMs = typeof arguments[1] === 'number' ? arguments[1] : -1;
+const batch = (window.__serpBatches || {})[token];
+if (!batch) {
+    done({ __serp_missing: true });
+    return;
+}
+const flush = () => {
+    const settled = batch.settled.splice(0);
+    const finished = batch.pending === 0;
+    if (finished) {
+        delete window.__serpBatches[token];
+    }
+    done({ settled: settled, finished: finished });
+};
+if (batch.settled.length || batch.pending === 0) {
+    flush();
+} else {
+    let flushed = false;
+    const once = () => {
+        if (!flushed) {
+            flushed = true;
+            batch.waiter = null;
+            flush();
         }
+    };
+    batch.waiter = once;
+    if (waitMs >= 0) {
+        setTimeout(once, waitMs);
+    }
+}
+"""
 
-    # Set up the webdriver (make sure you have the appropriate driver installed)
-    if PLATFORM == "LOCAL":
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("C:/Users/i/Downloads/chromedriver-win64/chromedriver.exe")
+
+def build_extractor_bundle(js_file, js_code, config_json):
+    """
+    Wrap an extractor file and its compiled config so it can be installed in the
+    page once; each bundle gets its own scope, so extractors never clash.
+    Every bundle carries the block-page check its extractor runs before parsing
+    """
+    return f"""
+    window.__serpExtractors = window.__serpExtractors || {{}};
+    window.__serpExtractors[{json.dumps(js_file)}] = (function () {{
+        const config = {config_json};
+        {BLOCK_CHECK_SCRIPT}
+        {js_code}
+        return {{
+            run: function (queries, options) {{
+                return {EXTRACTOR_ENTRY_POINTS[js_file]};
+            }}
+        }};
+    }})();
+    """
+
+
+def compile_extractor(js_file, section, config):
+    """
+    Return (bundle_source, bundle_version) for an extractor file and its config section.
+    Rebuilt only when the file changes or a new config has been loaded
+    """
+    js_mtime = os.path.getmtime(js_file)
+    cached = _compiled_extractors.get(js_file)
+    if cached and cached[0] == js_mtime and cached[1] is config:
+        return cached[2], cached[3]
+
+    with open(js_file, 'r', encoding="utf-8") as file:
+        js_code = file.read()
+    # Convert Python config to JSON for JavaScript
+    config_json = json.dumps({
+        section: config.get(section, {}),
+        "processing": config.get("processing", {}),
+        "error_handling": config.get("error_handling", {}),
+        "block_detection": block_detector.rules("google" if section.startswith("google") else "bing"),
+    })
+    bundle_source = build_extractor_bundle(js_file, js_code, config_json)
+    bundle_version = hashlib.sha1(bundle_source.encode('utf-8')).hexdigest()
+    _compiled_extractors[js_file] = (js_mtime, config, bundle_source, bundle_version)
+    logger.debug(f"Compiled {js_file} extractor bundle")
+    return bundle_source, bundle_version
+
+
+def install_extractor(browser, js_file, bundle_version, bundle_source):
+    """Install the extractor bundle unless this page already has the current version"""
+    if browser.installed.get(js_file) == bundle_version:
+        return
+    browser.driver.execute_script(
+        bundle_source + f"window.__serpExtractors[{json.dumps(js_file)}].version = arguments[0];",
+        bundle_version
+    )
+    browser.installed[js_file] = bundle_version
+    logger.debug(f"Installed {js_file} extractor bundle ({len(bundle_source)} bytes)")
+
+
+def warm_pool_tab(tab, search_type):
+    """Ready a pooled tab on the origin of a search type, so its first query skips navigation"""
+    config = load_yaml_config()
+    initial_url, ready_selector, blocked_urls = bootstrap_settings(config, search_type)
+    # Each driver command locks the browser on its own, so other tabs keep running meanwhile
+    origin_error, _ = bootstrap_origin(tab.driver, initial_url, search_type, blocked_urls,
+                                       ready_selector=ready_selector)
+    if not origin_error:
+        tab.origin = initial_url
+    return origin_error
+
+
+def run_extractor_batch(browser, js_file, bundle_version, bundle_source, queries, options,
+                        concurrency, jitter_ms, query_timeout, timer=None, deadline=None, min_budget=0,
+                        poll_ms=None):
+    """
+    Hand every query to the page at once and yield (index, result) pairs as they settle.
+    Queries still outstanding when the page stops answering are yielded as errors.
+    With a deadline (epoch seconds) the page starts no query with less than min_budget
+    seconds left and cuts running ones off at the deadline; both come back unprocessed.
+    poll_ms polls the page at that interval instead of long-polling it (pooled tabs)
+    """
+    driver = browser.driver
+    token = None
+    injection_started = time.time()
+    for attempt in range(2):
+        install_extractor(browser, js_file, bundle_version, bundle_source)
+        deadline_ms = max(1, int((deadline - time.time()) * 1000)) if deadline is not None else 0
+        token = driver.execute_script(
+            BATCH_START_SCRIPT, js_file, bundle_version, queries, options,
+            int(concurrency), int(jitter_ms), int(query_timeout * 1000), deadline_ms, int(min_budget * 1000)
+        )
+        if isinstance(token, dict) and token.get('__serp_missing'):
+            # The page navigated or reloaded since the install
+            browser.installed.pop(js_file, None)
+            token = None
+            continue
+        break
+    if timer is not None:
+        timer.add('script_injection', (time.time() - injection_started) * 1000)
+
+    outstanding = set(range(len(queries)))
+    if token is None:
+        error = f'{js_file} extractor could not be installed in the page'
     else:
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("/opt/chromedriver")
-
-        options.binary_location = '/opt/chrome/chrome'
-        options.add_argument("--headless=new")
-        options.add_argument('--no-sandbox')
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1280x1696")
-        options.add_argument("--single-process")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-dev-tools")
-        options.add_argument("--no-zygote")
-        options.add_argument(f"--user-data-dir={mkdtemp()}")
-        options.add_argument(f"--data-path={mkdtemp()}")
-        options.add_argument(f"--disk-cache-dir={mkdtemp()}")
-        options.add_argument("--remote-debugging-port=9222")
+        error = None
+        # Every drain returns within one query deadline plus its start jitter
+        driver.set_script_timeout(query_timeout + jitter_ms / 1000.0 + 5)
+        give_up = time.time() + query_timeout + jitter_ms / 1000.0 + 5
+        while outstanding:
+            try:
+                if poll_ms is None:
+                    drained = driver.execute_async_script(BATCH_DRAIN_SCRIPT, token)
+                else:
+                    drained = driver.execute_async_script(BATCH_DRAIN_SCRIPT, token, 0)
+            except TimeoutException:
+                error = 'Timeout waiting for results'
+                break
+            if not isinstance(drained, dict) or drained.get('__serp_missing'):
+                error = 'Page navigated away while the batch was running'
+                break
+            for item in drained.get('settled', []):
+                index = item.get('index')
+                if index in outstanding:
+                    outstanding.discard(index)
+                    yield index, item.get('result')
+            if drained.get('finished'):
+                break
+            if poll_ms is not None and not drained.get('settled'):
+                if time.time() >= give_up:
+                    error = 'Timeout waiting for results'
+                    break
+                time.sleep(poll_ms / 1000.0)
+
+    past_deadline = deadline is not None and time.time() >= deadline
+    for index in sorted(outstanding):
+        result = {'success': False, 'error': error or 'No result returned from the page'}
+        if past_deadline:
+            result['unprocessed'] = True
+        yield index, result
+
+
+def finalize_result(fetch_results, query_string, query_id, batch_id):
+    """Attach batch and query identifiers to a raw extractor result"""
+    if fetch_results and isinstance(fetch_results, dict):
+        # Add batch_id and query_id to the results
+        fetch_results['batch_id'] = batch_id
+        fetch_results['query_id'] = query_id
+
+        # Ensure we have the required fields
+        if 'query' not in fetch_results:
+            fetch_results['query'] = query_string
+        return fetch_results
+
+    # If no results or invalid format, create error structure
+    return {
+        'batch_id': batch_id,
+        'query_id': query_id,
+        'success': False,
+        'title': f"{query_string} - Search News",
+        'query': query_string,
+        'news_results': [],
+        'error': 'Invalid or no results returned'
+    }
+
+
+def without_raw_html(fetch_results):
+    """Deep copy of a result minus the raw SERP, which only the HTML archive of the fetching batch needs"""
+    if not isinstance(fetch_results, dict):
+        return copy.deepcopy(fetch_results)
+    return copy.deepcopy({k: v for k, v in fetch_results.items() if k != 'raw_html'})
+
+
+def unprocessed_results(queries, batch_id, reason):
+    """Results for queries the invocation deadline left no time for, to be resubmitted"""
+    results = []
+    for query_obj in queries:
+        query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+        results.append({
+            'success': False,
+            'unprocessed': True,
+            'error': reason,
+            'query': query_string,
+            'query_id': query_obj.get('query_id') if isinstance(query_obj, dict) else None,
+            'batch_id': batch_id,
+        })
+    return results
+
+
+def http_engine_search(queries, cc, qft, batch_id, search_type, serpOptions, config, timer, traffic=None,
+                       keep_html=False, deadline=None, on_result=None):
+    """Run the batch through the browserless HTTP engine"""
+    logger.debug(f"Processing batch_id: {batch_id} with http engine")
+    all_results = [None] * len(queries)
+
+    def finish(i, fetch_results):
+        query_obj = queries[i]
+        query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+        query_id = query_obj.get('query_id') if isinstance(query_obj, dict) else None
+        query_timings = timer.take_query_timings(fetch_results)
+        fetch_results = finalize_result(fetch_results, query_string, query_id, batch_id)
+        fetch_results['engine'] = 'http'
+        fetch_results['timings'] = query_timings
+        all_results[i] = fetch_results
+        if on_result is not None:
+            on_result(i, fetch_results)
+
+    with timer.span('http_fetch'):
+        http_search(queries, search_type, cc, qft, serpOptions or {}, config, traffic, keep_html, deadline, finish)
+
+    return all_results
 
+
+def browser_search(queries, cc, qft, batch_id, search_type, serpOptions, query_timeout, config, timer,
+                   traffic=None, keep_html=False, hybrid=False, deadline=None, on_result=None, use_pool=True):
+    """
+    Run the batch through the in-page extractors of a warm or cold Chrome, or of the
+    browser pool when it is enabled and use_pool is left on.
+    With hybrid=True the page only fetches and the SERPs are parsed on parse_pool
+    while the rest of the batch is still fetching.
+    on_result(index, result) is called as each query's result is ready.
+    Returns one result per query, or a single error dict when the batch could not start
+    """
+    browser_manager.configure(config.get("browser"))
+    captcha_solver.configure(config.get("captcha"))
+    tab_pool.configure(config.get("browser_pool"))
+    captcha_stats = CaptchaStats(captcha_solver.settings['cost_per_solve'])
+    # In server mode every query leases a tab of the shared pool; record/replay needs a page of its own
+    pooled = use_pool and tab_pool.enabled and traffic is None
     try:
-        driver = webdriver.Chrome(options=options, service=service)
+        with timer.span('driver_startup'):
+            if pooled:
+                tab_pool.start(warm_pool_tab)
+                browser, warm = None, True
+            else:
+                browser, warm = browser_manager.acquire()
     except Exception as e:
         logger.error(f"Failed to initialize Chrome driver: {e}")
         return {
             'success': False,
             'error': f'Driver initialization failed: {str(e)}',
-            'batch_id': batch_id
+            'batch_id': batch_id,
+            'browser': 'cold'
         }
+    driver = browser.driver if browser is not None else None
+    browser_state = 'pooled' if pooled else 'warm' if warm else 'cold'
+    browser_healthy = True
 
-    # Choose JS file and config section
-    js_file_mapping = {
-        "bing-images": ('bing-img-yaml.js', { "bing_images": config.get("bing_images", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-        "bing-web": ('bing-web-yaml.js', { "bing_web": config.get("bing_web", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-        "google-news": ('google-news-yaml.js', { "google_news": config.get("google_news", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-        "google-images": ('google-image-yaml.js', { "google_images": config.get("google_images", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-        "google-web": ('google-web-yaml.js', { "google_web": config.get("google_web", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-        "news": ('bing-news-yaml.js', { "bing_news": config.get("bing_news", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }),
-    }
-    
-    # Get JS file and config for the search type, default to news
-    js_file, config_section = js_file_mapping.get(search_type, js_file_mapping["news"])
+    # Choose JS file and config section, default to news
+    js_file, section = EXTRACTOR_FILES.get(search_type, EXTRACTOR_FILES["news"])
+    if hybrid:
+        parse_pool.configure(config.get("hybrid"))
+        parse_config = {
+            section: config.get(section, {}),
+            "processing": config.get("processing", {}),
+            "error_handling": config.get("error_handling", {}),
+        }
+        js_file = HYBRID_FETCH_FILE
     
     # Determine initial URL based on search type
-    if search_type in ["google-news", "google-web", "google-images"]:
-        initial_url = "https://www.google.com/search?q=botxbyte+company+in+rajkot"
-    else:
-        initial_url = "https://www.bing.com/search?q=botxbyte+company+in+rajkot"
+    initial_url, ready_selector, blocked_urls = bootstrap_settings(config, search_type)
 
     try:
-        driver.get(initial_url)
-        
-        # Load JavaScript file
+        # Load the JavaScript file, compiled with its config section into a bundle
         try:
-            with open(js_file, 'r', encoding="utf-8") as file:
-                js_code = file.read()
+            bundle_source, bundle_version = compile_extractor(js_file, section, config)
         except FileNotFoundError:
             logger.error(f"{js_file} file not found")
-            driver.quit()
             return {
                 'success': False,
                 'error': f'{js_file} file not found',
-                'batch_id': batch_id
+                'batch_id': batch_id,
+                'browser': browser_state
             }
 
         # Log batch processing information
@@ -222,294 +676,438 @@ def Gen_search(queries, cc, qft, batch_id=None, search_type="news", serpOptions=
             query_strings = []
             query_ids = []
 
-        # Check and solve CAPTCHA
-        max_captcha_attempts = 5
-        captcha_attempt = 0
-        captcha_solved = False
-
-        while captcha_attempt < max_captcha_attempts:
-            try:
-                recaptcha_div = driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
-                logger.info(f"CAPTCHA detected. Attempt {captcha_attempt + 1} to solve.")             
-                TwoCaptchaGJ.solve_captcha(driver)
-                time.sleep(5)  # Wait for CAPTCHA processing
-                # Check if CAPTCHA is still present
-                if not driver.find_elements(by=By.CSS_SELECTOR, value="div#recaptcha"):
-                    captcha_solved = True
-                    logger.info("CAPTCHA solved successfully.")
-                    break
-            except Exception as ex:
-                # CAPTCHA not present
-                captcha_solved = True
-                break
-            captcha_attempt += 1
-
-        if not captcha_solved:
-            logger.error("Failed to solve CAPTCHA after multiple attempts.")
-            driver.quit()
-            return {
-                "error": True,
-                "message": "CAPTCHA could not be solved after multiple attempts.",                
-                "queries": queries,
-                "batch_id": batch_id
-            }
-
-        # Wait for search results container to load (different selectors for different search types)
-        if search_type in ["google-news", "google-web", "google-images"]:
-            try:
-                WebDriverWait(driver, 40).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'div#search'))
-                )
-            except Exception as e:
-                logger.warning("Timeout or failure waiting for search results to load.")
-                driver.quit()
+        # A warm browser that is still on this origin skips navigation entirely;
+        # pooled tabs are readied on their origin by the pool
+        bootstrap_ms = 0
+        if not pooled and browser.origin != initial_url:
+            browser.origin = None
+            browser.installed = {}
+            origin_error, bootstrap_ms = bootstrap_origin(driver, initial_url, search_type, blocked_urls,
+                                                          captcha_stats, ready_selector, timer, deadline)
+            if origin_error and deadline is not None and time.time() >= deadline:
+                # Out of time rather than broken; the queries can simply be resubmitted
+                return unprocessed_results(queries, batch_id, f'Deadline reached during bootstrap: {origin_error}')
+            if origin_error:
+                browser_healthy = False
                 return {
                     "error": True,
-                    "message": "Search results container did not load or page failed to appear.",
+                    "message": origin_error,
                     "queries": queries,
-                    "batch_id": batch_id
+                    "batch_id": batch_id,
+                    "browser": browser_state,
+                    "captcha": captcha_stats.as_dict(),
+                    "bootstrap_ms": bootstrap_ms
                 }
-        else:
-            # For Bing News, wait for page to be ready
-            try:
-                WebDriverWait(driver, 5).until(
-                    lambda d: d.execute_script("return document.readyState") == "complete"
-                )
-                time.sleep(2)  # Give it a moment for dynamic content to load
-            except Exception as e:
-                logger.warning(f"Page readiness check failed: {e}")
-                # Continue anyway as this is not critical   
+            browser.origin = initial_url
+        elif not pooled:
+            logger.debug(f"Reusing origin page {initial_url}")
+            logger.debug(f"Page title: {driver.title}")
 
-        logger.debug(f"Page title: {driver.title}")
+        # Per-query deadline: payload override, then config.yaml
+        if query_timeout is None:
+            query_timeout = (config.get("execution") or {}).get("query_timeout_seconds", 60)
+        query_timeout = float(query_timeout)
 
-        # Convert Python config to JSON for JavaScript
-        config_json = json.dumps(config_section)
-        all_results = []
-        
-        for i, query_obj in enumerate(queries):
+        run_options = {'cc': cc, 'qft': qft, 'serpOptions': serpOptions if serpOptions else {}, 'keepHtml': keep_html}
+        execution_settings = config.get("execution") or {}
+        concurrency = execution_settings.get("concurrency", 4)
+        jitter_ms = execution_settings.get("jitter_ms", 250)
+        min_budget = float(execution_settings.get("min_query_budget_seconds", 5))
+        all_results = [None] * len(queries)
+        batch_started = time.time()
+
+        def finish(i, fetch_results):
+            query_obj = queries[i]
             query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
             query_id = query_obj.get('query_id') if isinstance(query_obj, dict) else None
-            driver.execute_script("window.fetchResults = null;")
-            
-            try:
-                if search_type == "bing-images":
-                    driver.execute_script(f"""
-                    const config = {config_json};
-                    {js_code}
-                    fetchImagesWithConfig([arguments[0]], arguments[1], config).then(results => {{
-                        window.fetchResults = results[0];
-                    }}).catch(error => {{
-                        console.error('Error in fetchImagesWithConfig:', error);
-                        window.fetchResults = {{ success: false, error: error.message, query: arguments[0].query || arguments[0] }};
-                    }});
-                    """, query_obj, cc)
-                elif search_type == "bing-web":
-                    driver.execute_script(f"""
-                    const config = {config_json};
-                    {js_code}
-                    fetchWebWithConfig([arguments[0]], arguments[1], config).then(results => {{
-                        window.fetchResults = results[0];
-                    }}).catch(error => {{
-                        console.error('Error in fetchWebWithConfig:', error);
-                        window.fetchResults = {{ success: false, error: error.message, query: arguments[0].query || arguments[0] }};
-                    }});
-                    """, query_obj, cc)
-                elif search_type == "bing-news":
-                    driver.execute_script(f"""
-                    const config = {config_json};
-                    {js_code}
-                    fetchSearchesWithConfig([arguments[0]], arguments[1], arguments[2], config).then(results => {{
-                        window.fetchResults = results[0];
-                    }}).catch(error => {{
-                        console.error('Error in bing-news fetchSearchesWithConfig:', error);
-                        window.fetchResults = {{ success: false, error: error.message, query: arguments[0].query || arguments[0] }};
-                    }});
-                    """, query_obj, cc, qft)
-                elif search_type == "google-news":
-                    # For Google News, check if the function exists first
-                    driver.execute_script(f"""
-                        try {{
-                            const config = {config_json};
-                            {js_code}
-                            window.fetchResults = null;
-
-                            if (typeof fetchSearchesWithConfig !== 'function') {{
-                                window.fetchResults = {{
-                                    success: false,
-                                    error: 'fetchSearchesWithConfig not defined after JS load',
-                                    query: arguments[0].query || arguments[0]
-                                }};
-                            }} else {{
-                                fetchSearchesWithConfig([arguments[0]], 10000, arguments[1], config).then(results => {{
-                                    window.fetchResults = results[0];
-                                }}).catch(error => {{
-                                    window.fetchResults = {{
-                                        success: false,
-                                        error: error.message + ' - Stack: ' + error.stack,
-                                        query: arguments[0].query || arguments[0]
-                                    }};
-                                }});
-                            }}
-                        }} catch (syncError) {{
-                            window.fetchResults = {{
-                                success: false,
-                                error: 'Synchronous execution error: ' + syncError.message,
-                                query: arguments[0].query || arguments[0]
-                            }};
-                        }}
-                        """, query_obj, serpOptions if serpOptions else {})
-                elif search_type == "google-images":
-                    # For Google Images, check if the function exists first
-                    driver.execute_script(f"""
-                        try {{
-                            const config = {config_json};
-                            {js_code}
-                            window.fetchResults = null;
-
-                            if (typeof fetchImagesWithConfig !== 'function') {{
-                                window.fetchResults = {{
-                                    success: false,
-                                    error: 'fetchImagesWithConfig not defined after JS load',
-                                    query: arguments[0].query || arguments[0]
-                                }};
-                            }} else {{
-                                fetchImagesWithConfig([arguments[0]], arguments[1], config).then(results => {{
-                                    window.fetchResults = results[0];
-                                }}).catch(error => {{
-                                    window.fetchResults = {{
-                                        success: false,
-                                        error: error.message + ' - Stack: ' + error.stack,
-                                        query: arguments[0].query || arguments[0]
-                                    }};
-                                }});
-                            }}
-                        }} catch (syncError) {{
-                            window.fetchResults = {{
-                                success: false,
-                                error: 'Synchronous execution error: ' + syncError.message,
-                                query: arguments[0].query || arguments[0]
-                            }};
-                        }}
-                        """, query_obj, serpOptions if serpOptions else {})
-                elif search_type == "google-web":
-                    # For Google Web, check if the function exists first
-                    driver.execute_script(f"""
-                        try {{
-                            const config = {config_json};
-                            {js_code}
-                            window.fetchResults = null;
-
-                            if (typeof fetchWebWithConfig !== 'function') {{
-                                window.fetchResults = {{
-                                    success: false,
-                                    error: 'fetchWebWithConfig not defined after JS load',
-                                    query: arguments[0].query || arguments[0]
-                                }};
-                            }} else {{
-                                fetchWebWithConfig([arguments[0]], 40000, config).then(results => {{
-                                    window.fetchResults = results[0];
-                                }}).catch(error => {{
-                                    window.fetchResults = {{
-                                        success: false,
-                                        error: error.message + ' - Stack: ' + error.stack,
-                                        query: arguments[0].query || arguments[0]
-                                    }};
-                                }});
-                            }}
-                        }} catch (syncError) {{
-                            window.fetchResults = {{
-                                success: false,
-                                error: 'Synchronous execution error: ' + syncError.message,
-                                query: arguments[0].query || arguments[0]
-                            }};
-                        }}
-                        """, query_obj)
-                else:
-                    # Default to bing-news
-                    driver.execute_script(f"""
-                    const config = {config_json};
-                    {js_code}
-                    fetchSearchesWithConfig([arguments[0]], arguments[1], arguments[2], config).then(results => {{
-                        window.fetchResults = results[0];
-                    }}).catch(error => {{
-                        console.error('Error in default fetchSearchesWithConfig:', error);
-                        window.fetchResults = {{ success: false, error: error.message, query: arguments[0].query || arguments[0] }};
-                    }});
-                    """, query_obj, cc, qft)
-            except Exception as js_error:
-                logger.error(f"JavaScript execution error: {js_error}")
-                fetch_results = {
-                    'success': False,
-                    'error': f'JavaScript execution failed: {str(js_error)}',
-                    'query': query_string,
-                    'batch_id': batch_id,
-                    'query_id': query_id
-                }
-                all_results.append(fetch_results)
-                continue
-
-            # Wait until the results are fetched
-            max_wait_time = 60
-            fetch_results = None
-            for j in range(max_wait_time):
-                fetch_results = driver.execute_script("return window.fetchResults;")
-                if fetch_results is not None:
-                    break
-                time.sleep(1)
-            
-            # Handle timeout
-            if fetch_results is None:
-                logger.error(f"Timeout waiting for results for query: {query_string}")
-                fetch_results = {
-                    'success': False,
-                    'error': 'Timeout waiting for results',
-                    'query': query_string,
-                    'batch_id': batch_id,
-                    'query_id': query_id
-                }
-            
+            wait_ms = round((time.time() - batch_started) * 1000)
+
             # Log the fetched results
             logger.debug(f"Results for query {i+1}: {fetch_results}")
-            
+
             # Create result structure for this query
-            if fetch_results and isinstance(fetch_results, dict):
-                # Add batch_id and query_id to the results
-                fetch_results['batch_id'] = batch_id
-                fetch_results['query_id'] = query_id
-                
-                # Ensure we have the required fields
-                if 'query' not in fetch_results:
-                    fetch_results['query'] = query_string
+            query_timings = timer.take_query_timings(fetch_results, wait_ms)
+            fetch_results = finalize_result(fetch_results, query_string, query_id, batch_id)
+            fetch_results['timings'] = query_timings
+
+            fetch_results['browser'] = browser_state
+            fetch_results['wait_ms'] = wait_ms
+            fetch_results['bootstrap_ms'] = bootstrap_ms
+            if hybrid:
+                fetch_results['engine'] = 'hybrid'
+            if captcha_stats.submitted:
+                fetch_results['captcha'] = captcha_stats.as_dict()
+            if browser is not None:
+                browser.query_count += 1
+            all_results[i] = fetch_results
+            if on_result is not None:
+                on_result(i, fetch_results)
+
+        # Hybrid pages fetch by URL; the same builders as the http engine keep both engines in step
+        page_queries = queries
+        if hybrid:
+            page_queries = []
+            for query_obj in queries:
+                query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+                page_queries.append({'query': query_string,
+                                     'url': build_url(search_type, query_string, cc, qft, serpOptions)})
+        parsing = {}
+
+        def bootstrap_tab(tab):
+            origin_error, _ = bootstrap_origin(tab.driver, initial_url, search_type, blocked_urls, captcha_stats,
+                                               ready_selector, timer, deadline)
+            return origin_error
+
+        def run_on_tab(tab, i):
+            # One query per leased tab; the tab polls so its Chrome can serve the other tabs meanwhile
+            tab.query_count += 1
+            for _, result in run_extractor_batch(tab, js_file, bundle_version, bundle_source, [page_queries[i]],
+                                                 run_options, 1, jitter_ms, query_timeout, timer, deadline,
+                                                 min_budget, int(tab_pool.settings['poll_ms'])):
+                return result
+
+        try:
+            if traffic is not None:
+                install_traffic_shim(driver, traffic)
+            if pooled:
+                settled = tab_pool.run_batch(object(), initial_url, len(page_queries), bootstrap_tab, run_on_tab)
             else:
-                # If no results or invalid format, create error structure
-                fetch_results = {
-                    'batch_id': batch_id,
-                    'query_id': query_id,
+                settled = run_extractor_batch(
+                    browser, js_file, bundle_version, bundle_source, page_queries, run_options,
+                    concurrency, jitter_ms, query_timeout, timer, deadline, min_budget
+                )
+            for i, fetch_results in settled:
+                if (hybrid and isinstance(fetch_results, dict) and fetch_results.get('raw_html') is not None
+                        and not fetch_results.get('page_type')):
+                    # Parse while the page keeps fetching the rest of the batch
+                    html = fetch_results.pop('raw_html')
+                    future = parse_pool.submit(search_type, html, queries[i], parse_config, cc, qft,
+                                               serpOptions or {})
+                    parsing[i] = (future, fetch_results.get('timings') or {}, html)
+                    continue
+                finish(i, fetch_results)
+
+            if parsing:
+                with timer.span('parse_wait'):
+                    for i, (future, fetch_timings, html) in parsing.items():
+                        try:
+                            fetch_results, extract_ms = future.result()
+                        except Exception as parse_error:
+                            logger.error(f"Parse error: {parse_error}")
+                            fetch_results, extract_ms = {'success': False, 'error': f'Parse failed: {parse_error}'}, 0
+                        if isinstance(fetch_results, dict):
+                            if fetch_results.get('success') is True:
+                                fetch_results['timings'] = dict(fetch_timings, extract_ms=extract_ms)
+                            if keep_html:
+                                fetch_results['raw_html'] = html
+                        finish(i, fetch_results)
+        except Exception as js_error:
+            logger.error(f"JavaScript execution error: {js_error}")
+            for i, query_obj in enumerate(queries):
+                if all_results[i] is not None:
+                    continue
+                query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+                all_results[i] = {
                     'success': False,
-                    'title': f"{query_string} - Search News",
+                    'error': f'JavaScript execution failed: {str(js_error)}',
                     'query': query_string,
-                    'news_results': [],
-                    'error': 'Invalid or no results returned'
+                    'batch_id': batch_id,
+                    'query_id': query_obj.get('query_id') if isinstance(query_obj, dict) else None,
+                    'browser': browser_state
                 }
-            
-            all_results.append(fetch_results)
+        finally:
+            if traffic is not None:
+                try:
+                    collect_traffic(driver, traffic)
+                except Exception as ex:
+                    logger.error(f"Could not collect recorded traffic: {ex}")
 
         logger.debug("Exit")
         
     except Exception as e:
         logger.error(f"Unexpected error during search execution: {e}")
+        browser_healthy = False
         return {
             'success': False,
             'error': f'Search execution failed: {str(e)}',
-            'batch_id': batch_id
+            'batch_id': batch_id,
+            'browser': browser_state
         }
     finally:
-        # Close the browser
+        # Keep the browser warm for the next request unless something went wrong
+        if browser is not None:
+            browser_manager.release(browser, healthy=browser_healthy)
+
+    return all_results
+
+
+def Gen_search(queries, cc, qft, batch_id=None, search_type="news", serpOptions=None, engine="browser",
+               query_timeout=None, use_cache=True, include_timings=False, timer=None, traffic=None,
+               archive_html=None, deadline=None, on_result=None, use_pool=True):
+    """
+    Perform search using backend configuration
+    Users only need to provide queries, cc, qft, and batch_id.
+    Pass a BatchTimer to add phases of your own (e.g. serialization) and emit it yourself.
+    Pass a TrafficArchive to record the batch's SERP responses, or to replay them offline.
+    archive_html stores the raw SERPs for re-extraction (default: html_archive.enabled in config.yaml)
+    deadline (epoch seconds) stops launching queries in time to return before it; the ones
+    left over are marked `unprocessed` and listed in `unprocessed_query_ids` on every result.
+    on_result(position, result) receives each query's result as soon as it is final.
+    use_pool=False keeps the batch off the browser pool (fan-out worker processes)
+    """
+    own_timer = timer is None
+    if own_timer:
+        timer = BatchTimer()
+
+    def emit(i, result):
+        # A copy shaped like the final result, so the batch can keep working on its own
+        if isinstance(result, dict):
+            result = {k: v for k, v in result.items() if k != 'raw_html'}
+            query_timings = result.pop('timings', None)
+            if include_timings:
+                result['timings'] = timer.as_dict(query_timings or {})
+        on_result(i, result)
+
+    results = search_batch(queries, cc, qft, batch_id, search_type, serpOptions, engine, query_timeout,
+                           use_cache, timer, traffic, archive_html, deadline, emit if on_result else None)
+
+    if traffic is not None and traffic.recording:
         try:
-            driver.quit()
-        except Exception as e:
-            logger.error(f"Error closing driver: {e}")
-    
+            traffic.save(search_type=search_type, engine=engine, cc=cc, qft=qft, serpOptions=serpOptions,
+                         queries=queries)
+        except Exception as ex:
+            logger.error(f"Could not save traffic archive {traffic.path}: {ex}")
+
+    result_list = results if isinstance(results, list) else [results]
+    unprocessed_ids = [result.get('query_id') for result in result_list
+                       if isinstance(result, dict) and result.get('unprocessed')]
+    if unprocessed_ids:
+        logger.warning(f"{len(unprocessed_ids)} queries left unprocessed, to be resubmitted")
+
+    # Per-query timings ride on each result; keep them only if the caller asked
+    for result in result_list:
+        if not isinstance(result, dict):
+            continue
+        query_timings = result.pop('timings', None)
+        if include_timings:
+            result['timings'] = timer.as_dict(query_timings or {})
+        if unprocessed_ids:
+            result['unprocessed_query_ids'] = unprocessed_ids
+
+    if own_timer:
+        emit_batch_metrics(timer, search_type, engine)
+    return results
+
+
+def emit_batch_metrics(timer, search_type, engine):
+    """Emit the batch timings as a CloudWatch EMF line"""
+    try:
+        metrics_settings = load_yaml_config().get("metrics")
+    except Exception:
+        metrics_settings = None
+    try:
+        timer.emit(search_type, engine, metrics_settings)
+    except Exception as ex:
+        logger.warning(f"Could not emit batch metrics: {ex}")
+
+
+def search_batch(queries, cc, qft, batch_id, search_type, serpOptions, engine, query_timeout, use_cache, timer,
+                 traffic=None, archive_html=None, deadline=None, on_result=None):
+    """
+    Serve a batch from the cache, in-flight fetches and the selected engine.
+    on_result(position, result) is called once per query as soon as its result is final
+    """
+    # Load YAML configuration from backend (users don't specify config_path)
+    try:
+        with timer.span('config_load'):
+            config = load_yaml_config()
+    except Exception as e:
+        logger.error(f"Failed to load configuration: {e}")
+        return {
+            'success': False,
+            'error': f'Configuration error: {str(e)}',
+            'batch_id': batch_id
+        }
+
+    # Serve repeated SERPs from the cache and only fetch the rest
+    result_cache.configure(config.get("cache"))
+    # Recorded and replayed batches must really fetch, and must not share results with live requests
+    use_cache = use_cache and result_cache.enabled and traffic is None
+    ttl = result_cache.ttl_for(search_type)
+    all_results = [None] * len(queries)
+    cache_keys = [None] * len(queries)
+    pending = []
+    for i, query_obj in enumerate(queries):
+        query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+        cache_keys[i] = make_key(search_type, query_string, cc, qft, serpOptions, engine)
+        if traffic is not None:
+            cache_keys[i] = f"{traffic.mode}:{traffic.path}:{cache_keys[i]}"
+        cached = result_cache.get(cache_keys[i], ttl) if use_cache else None
+        if cached is None:
+            pending.append(i)
+            continue
+        fetch_results, age = cached
+        query_id = query_obj.get('query_id') if isinstance(query_obj, dict) else None
+        fetch_results = finalize_result(fetch_results, query_string, query_id, batch_id)
+        fetch_results['cache'] = {'status': 'hit', 'age_seconds': round(age, 1)}
+        all_results[i] = fetch_results
+        if on_result is not None:
+            on_result(i, fetch_results)
+    logger.debug(f"Cache hits: {len(queries) - len(pending)}/{len(queries)}")
+
+    # Stop launching queries a safety margin before the invocation deadline
+    execution_settings = config.get("execution") or {}
+    min_budget = float(execution_settings.get("min_query_budget_seconds", 5))
+    if deadline is not None:
+        deadline -= float(execution_settings.get("deadline_margin_seconds", 10))
+
+    # Raw SERPs go to the HTML archive so a broken selector can be repaired by re-extraction
+    html_archive.configure(config.get("html_archive"))
+    keep_html = html_archive.enabled if archive_html is None else bool(archive_html)
+
+    # Transient per-query failures are retried with backoff (error_handling section)
+    retry_policy.configure(config.get("error_handling"))
+
+    # Block pages are labelled from status and raw HTML before any parsing
+    block_detector.configure(config.get("block_detection"))
+
+    # Fetches are paced per search engine and egress identity, and stop while its circuit is open
+    engine_throttle.configure(config.get("throttle"))
+    site = search_engine(search_type)
+
+    def run_engine(batch_queries, on_fetched=None):
+        fetched = []
+        while len(fetched) < len(batch_queries):
+            start = len(fetched)
+            granted, reason = engine_throttle.acquire(site, len(batch_queries) - start,
+                                                      None if deadline is None else deadline - min_budget)
+            if granted:
+                chunk_fetched = None
+                if on_fetched is not None:
+                    chunk_fetched = lambda j, result, start=start: on_fetched(start + j, result)
+                chunk = run_engine_chunk(batch_queries[start:start + granted], chunk_fetched)
+                if isinstance(chunk, list):
+                    engine_throttle.record(site, chunk)
+                    for result in chunk:
+                        if isinstance(result, dict) and result.get('page_type'):
+                            timer.count(f"page_{result['page_type']}")
+                    fetched.extend(chunk)
+                    continue
+                if start == 0:
+                    # The batch could not start at all
+                    return chunk
+                reason = chunk.get('error', 'Batch failed') if isinstance(chunk, dict) else 'Batch failed'
+            # No capacity (or no browser) for the rest: it comes back to be resubmitted later
+            leftovers = unprocessed_results(batch_queries[start:], batch_id, reason)
+            for j, result in enumerate(leftovers, start):
+                if on_fetched is not None:
+                    on_fetched(j, result)
+            fetched.extend(leftovers)
+        return fetched
+
+    def run_engine_chunk(batch_queries, on_fetched=None):
+        # Cheap queries can skip the browser entirely
+        if engine == "http":
+            return http_engine_search(batch_queries, cc, qft, batch_id, search_type, serpOptions, config, timer,
+                                      traffic, keep_html, deadline, on_fetched)
+        # "hybrid": Chrome fetches, the parse pool extracts
+        return browser_search(batch_queries, cc, qft, batch_id, search_type, serpOptions, query_timeout,
+                              config, timer, traffic, keep_html, hybrid=engine == "hybrid", deadline=deadline,
+                              on_result=on_fetched, use_pool=use_pool)
+
+    def backoff(seconds):
+        with timer.span('retry_backoff'):
+            time.sleep(seconds)
+
+    def fetch_serps(keys):
+        batch_queries = [queries[groups[key][0]] for key in keys]
+        if deadline is not None and deadline - time.time() < min_budget:
+            # Not even a browser start fits in what is left of the invocation
+            return unprocessed_results(batch_queries, batch_id, 'Deadline reached before the batch started')
+
+        def on_fetched(j, fetch_results):
+            # A result that will not be retried is final: share it while the rest of the batch runs
+            if not (retry_policy.max_retries and retry_policy.should_retry(fetch_results)):
+                retry_policy.stamp(fetch_results, 1)
+                settle(keys[j], fetch_results)
+
+        fetched = run_engine(batch_queries, on_fetched)
+        if isinstance(fetched, list):
+            # Only the failed query_ids go back to the engine, never the whole batch
+            fetched = retry_policy.run(batch_queries, fetched, run_engine, deadline, min_budget, backoff)
+        if keep_html and isinstance(fetched, list):
+            with timer.span('html_archive'):
+                html_archive.archive_results(fetched, batch_queries, {
+                    'search_type': search_type, 'engine': engine, 'cc': cc, 'qft': qft,
+                    'serpOptions': serpOptions or {}, 'batch_id': batch_id,
+                })
+        return fetched
+
+    def fan_out(key, fetch_results, status):
+        # Every query_id asking for this SERP gets its own copy
+        for n, i in enumerate(groups[key]):
+            query_obj = queries[i]
+            query_string = query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+            query_id = query_obj.get('query_id') if isinstance(query_obj, dict) else None
+            result = fetch_results if n == 0 else without_raw_html(fetch_results)
+            result = finalize_result(result, query_string, query_id, batch_id)
+            if isinstance(result, dict):
+                result['cache'] = {'status': status if n == 0 else 'coalesced', 'age_seconds': 0}
+            all_results[i] = result
+            if on_result is not None:
+                on_result(i, result)
+
+    def store(key, fetch_results):
+        if use_cache:
+            result_cache.put(key, fetch_results)
+        fan_out(key, fetch_results, 'miss' if use_cache else 'bypass')
+
+    settled = set()
+
+    def settle(key, fetch_results):
+        # Called as soon as a SERP is final, then again for the whole batch; only the first counts
+        if key in settled:
+            return
+        settled.add(key)
+        store(key, fetch_results)
+        if key in leading:
+            shared = without_raw_html(fetch_results) if is_cacheable(fetch_results) else None
+            single_flight.complete(key, shared)
+
+    # Fetch each distinct SERP once, sharing it with duplicate query_ids in this batch
+    # and with concurrent requests that are already fetching it
+    groups = OrderedDict()
+    for i in pending:
+        groups.setdefault(cache_keys[i], []).append(i)
+    leading, following = single_flight.claim(list(groups))
+    try:
+        if leading:
+            fetched = fetch_serps(leading)
+            if isinstance(fetched, dict):
+                # The batch could not start; there is nothing per query to merge
+                return fetched
+            for key, fetch_results in zip(leading, fetched):
+                settle(key, fetch_results)
+    finally:
+        single_flight.release(leading)
+
+    coalesce_timeout = execution_settings.get("coalesce_timeout_seconds", 300)
+    refetch = []
+    for key, flight in following.items():
+        wait_timeout = coalesce_timeout if deadline is None else max(0, min(coalesce_timeout, deadline - time.time()))
+        fetch_results = flight.wait(wait_timeout)
+        if fetch_results is None:
+            # The other request failed or gave up on this SERP; fetch it ourselves
+            refetch.append(key)
+            continue
+        fan_out(key, fetch_results, 'coalesced')
+    if refetch:
+        fetched = fetch_serps(refetch)
+        if isinstance(fetched, dict):
+            return fetched
+        for key, fetch_results in zip(refetch, fetched):
+            settle(key, fetch_results)
+
     # Return all results
     if len(all_results) == 1:
         return all_results[0]  # Return single result directly
@@ -517,6 +1115,39 @@ def Gen_search(queries, cc, qft, batch_id=None, search_type="news", serpOptions=
         return all_results  # Return array of results for multiple queries
 
 
+def search_payload(payload, on_result=None):
+    """
+    Search a request payload in this process: a local fan-out shard, or a background job
+    (on_result(position, result) then streams each query's result as it completes).
+    `browser_pool: {enabled: false}` in the payload keeps it off the browser pool
+    """
+    use_pool = (payload.get('browser_pool') or {}).get('enabled', True) is not False
+    return Gen_search(payload.get('queries', []), payload.get('cc', 'US'), payload.get('qft', ''),
+                      payload.get('batch_id'), payload.get('search_type', 'news'), payload.get('serpOptions'),
+                      payload.get('engine', 'browser'), payload.get('query_timeout'),
+                      payload.get('cache', True) is not False, bool(payload.get('timings', False)),
+                      archive_html=payload.get('archive_html'), on_result=on_result, use_pool=use_pool)
+
+
+def fanout_search(payload, function_name=None, lambda_client=None, deadline=None):
+    """
+    Split a large batch across parallel workers: invocations of this Lambda, or local
+    processes when there is no function to invoke. Results come back in query order
+    """
+    config = load_yaml_config()
+    fanout_coordinator.configure(config.get("fanout"))
+    if deadline is not None:
+        deadline -= float((config.get("execution") or {}).get("deadline_margin_seconds", 10))
+    if fanout_coordinator.mode(function_name) == 'lambda':
+        if not function_name or lambda_client is None:
+            raise ValueError('Lambda fan-out needs the function name and a Lambda client')
+        invoke = LambdaInvoker(lambda_client(), function_name)
+        return fanout_coordinator.run(payload, invoke, deadline=deadline)
+    # Spawned workers see platform=LOCAL too, but must not start a browser pool of their own
+    shard_payload = dict(payload, browser_pool={'enabled': False})
+    return fanout_coordinator.run(shard_payload, search_payload, processes=True, deadline=deadline)
+
+
 def lambda_handler(event=None, context=None):
     # Handle None context gracefully
     function_name = os.getenv('AWS_LAMBDA_FUNCTION_NAME')
@@ -533,33 +1164,27 @@ def lambda_handler(event=None, context=None):
             'body': json.dumps('Error: AWS credentials are not set.')
         }
 
-    try:
-        # Create a boto3 client
-        client = boto3.client(
+    def lambda_client(**kwargs):
+        return boto3.client(
             'lambda',
             region_name=default_region,
             aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
+            aws_secret_access_key=secret_access_key,
+            **kwargs
         )
 
-        if function_name:
-            input_params = {
-                'FunctionName': function_name,
-                'Environment': {
-                    'Variables': {
-                        'MY_AWS_ACCESS_KEY_ID': access_key_id,
-                        'MY_AWS_SECRET_ACCESS_KEY': secret_access_key,
-                        'ENV_VARIABLE': str(random.random()),
-                        'TWOCAPTCHA_API_KEY': os.getenv('TWOCAPTCHA_API_KEY', '')
-                    }
-                }
-            }
-            response = client.update_function_configuration(**input_params)
-    except Exception as ex:
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f'Error updating environment variables: {str(ex)}')
-        }
+    def worker_client():
+        # Workers can run up to the Lambda maximum; failed shards are retried by the coordinator, not botocore
+        return lambda_client(config=BotoConfig(
+            read_timeout=900, connect_timeout=10, retries={'max_attempts': 0},
+            max_pool_connections=max(10, int(fanout_coordinator.settings['max_parallel']))
+        ))
+
+    rotation_variables = {
+        'MY_AWS_ACCESS_KEY_ID': access_key_id,
+        'MY_AWS_SECRET_ACCESS_KEY': secret_access_key,
+        'TWOCAPTCHA_API_KEY': os.getenv('TWOCAPTCHA_API_KEY', '')
+    }
 
     # Validate event body
     if not event or 'body' not in event:
@@ -583,6 +1208,11 @@ def lambda_handler(event=None, context=None):
     batch_id = request_data.get("batch_id")
     serpOptions = request_data.get("serpOptions", {})
     search_type = request_data.get("search_type", "news")
+    engine = request_data.get("engine", "browser")
+    query_timeout = request_data.get("query_timeout")
+    use_cache = request_data.get("cache", True) is not False
+    include_timings = bool(request_data.get("timings", False))
+    archive_html = request_data.get("archive_html")
     
     if not queries or not isinstance(queries, list):
         return {
@@ -594,14 +1224,74 @@ def lambda_handler(event=None, context=None):
     logger.debug("Batch ID: {}", batch_id)
     logger.debug("Search Type: {}", search_type)
     
+    # Budget the batch against the time this invocation has left
+    deadline = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000
+
+    # Large batches are sharded across parallel invocations of this function
+    try:
+        fanout_coordinator.configure(load_yaml_config().get("fanout"))
+    except Exception as ex:
+        logger.warning(f"Using default fan-out settings: {ex}")
+    if fanout_coordinator.wants(request_data):
+        payload = dict(request_data, cc=cc, qft=qft, search_type=search_type, engine=engine,
+                       serpOptions=serpOptions)
+        try:
+            results = fanout_search(payload, function_name, worker_client, deadline)
+        except Exception as ex:
+            logger.error(f"Fan-out failed: {ex}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps(f'Error: fan-out failed: {str(ex)}')
+            }
+        return {
+            'statusCode': 200,
+            'body': json.dumps(results)
+        }
+
     # Call Gen_search without config_path parameter
-    results = Gen_search(queries, cc, qft, batch_id, search_type, serpOptions)
+    timer = BatchTimer()
+    results = Gen_search(queries, cc, qft, batch_id, search_type, serpOptions, engine, query_timeout, use_cache,
+                         include_timings, timer, archive_html=archive_html, deadline=deadline)
+
+    # Rotate the container only when the policy asks for it; the call ends before the handler returns
+    try:
+        rotation_policy.configure(load_yaml_config().get("rotation"))
+    except Exception as ex:
+        logger.warning(f"Using default rotation settings: {ex}")
+    decision = rotation_policy.after_request(results, function_name, lambda_client, rotation_variables)
+    logger.debug("Rotation decision: {}", decision)
+    stamp_decision(results, decision)
+    with timer.span('serialization'):
+        body = json.dumps(results)
+    emit_batch_metrics(timer, search_type, engine)
     return {
         'statusCode': 200,
-        'body': json.dumps(results)
+        'body': body
     }
 
 
+@app.route('/captcha/pingback', methods=['GET', 'POST'])
+def captcha_pingback():
+    """2captcha pingback: wakes up the job waiting for this captcha id"""
+    captcha_id = request.values.get('id')
+    code = request.values.get('code')
+    if not captcha_id or not code:
+        return jsonify({'error': 'id and code are required'}), 400
+    delivered = captcha_solver.deliver(captcha_id, code)
+    return jsonify({'delivered': delivered})
+
+
+def batch_browsers(engine, fanout=False):
+    """Chromes a batch launches, for admission: none for HTTP or on the browser pool, one per worker when fanned out"""
+    if engine == 'http':
+        return 0
+    if fanout:
+        return int(fanout_coordinator.settings['max_parallel'])
+    return 0 if tab_pool.enabled else 1
+
+
 @app.route('/', methods=['POST'])
 def search_endpoint():
     try:
@@ -615,14 +1305,137 @@ def search_endpoint():
         batch_id = data.get('batch_id')
         search_type = data.get('search_type', 'news')
         serpOptions = data.get('serpOptions')
-        
-        results = Gen_search(queries, cc, qft, batch_id, search_type, serpOptions)
-        return jsonify(results)
+        engine = data.get('engine', 'browser')
+        query_timeout = data.get('query_timeout')
+        use_cache = data.get('cache', True) is not False
+        include_timings = bool(data.get('timings', False))
+        archive_html = data.get('archive_html')
+
+        config = load_yaml_config()
+        fanout_coordinator.configure(config.get("fanout"))
+        tab_pool.configure(config.get("browser_pool"))
+        admission.configure(config.get("admission"))
+        fanout = fanout_coordinator.wants(data)
+
+        timer = BatchTimer()
+        with timer.span('admission_wait'):
+            ticket = admission.acquire(len(queries) if isinstance(queries, list) else 0,
+                                       batch_browsers(engine, fanout))
+        started = time.time()
+        try:
+            if fanout:
+                payload = dict(data, cc=cc, qft=qft, search_type=search_type, engine=engine, serpOptions=serpOptions)
+                response = jsonify(fanout_search(payload))
+            else:
+                results = Gen_search(queries, cc, qft, batch_id, search_type, serpOptions, engine, query_timeout,
+                                     use_cache, include_timings, timer, archive_html=archive_html)
+                with timer.span('serialization'):
+                    response = jsonify(results)
+                emit_batch_metrics(timer, search_type, engine)
+        finally:
+            admission.release(ticket, time.time() - started)
+        response.headers['X-Queue-Wait-Ms'] = str(ticket.wait_ms)
+        return response
+    except AdmissionRejected as e:
+        response = jsonify({'error': f'Server busy: {e.reason}', 'retry_after': e.retry_after,
+                            'queue_depth': admission.stats()['queue_depth']})
+        return response, 429, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         logger.error(f"Error in search endpoint: {e}")
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 
+@app.route('/admission', methods=['GET'])
+def admission_endpoint():
+    """Admission queue depth, wait times and what is running against the limits"""
+    return jsonify(admission.stats())
+
+
+def job_payload(data):
+    """Validated search payload for a job, with the same defaults as the / endpoint"""
+    queries = data.get('queries')
+    if not queries or not isinstance(queries, list):
+        raise ValueError('queries parameter is missing or not a list')
+    return dict(data, cc=data.get('cc', 'US'), qft=data.get('qft', 'interval="3"'),
+                search_type=data.get('search_type', 'news'), engine=data.get('engine', 'browser'))
+
+
+def admitted_search_payload(payload, on_result=None):
+    """
+    search_payload for a job, run under the same admission limits as the / endpoint.
+    The job waits in the admission queue; when it is turned away every query gets the error
+    """
+    config = load_yaml_config()
+    tab_pool.configure(config.get("browser_pool"))
+    admission.configure(config.get("admission"))
+    queries = payload.get('queries') or []
+    try:
+        with admission.admit(len(queries), batch_browsers(payload.get('engine', 'browser'))):
+            return search_payload(payload, on_result)
+    except AdmissionRejected as e:
+        return {'success': False, 'error': f'Server busy: {e.reason}', 'retry_after': e.retry_after}
+
+
+def submit_job(data):
+    job_store.configure(load_yaml_config().get("jobs"))
+    return job_store.submit(job_payload(data), admitted_search_payload)
+
+
+def ndjson_response(job, offset=0, follow=False):
+    return Response(stream_with_context(job_store.results(job, offset, follow)), mimetype='application/x-ndjson',
+                    headers={'X-Job-Id': job.job_id})
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job_endpoint():
+    """Queue a batch and return its job id at once"""
+    try:
+        job = submit_job(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    return jsonify(job.as_dict()), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.as_dict())
+
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results_endpoint(job_id):
+    """The job's results so far as NDJSON, from ?offset= on; ?follow=1 streams until the job finishes"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    follow = request.args.get('follow', '').lower() in ('1', 'true', 'yes')
+    return ndjson_response(job, max(0, offset), follow)
+
+
+@app.route('/stream', methods=['POST'])
+def stream_endpoint():
+    """Run a batch and stream one NDJSON line per query as each one completes"""
+    try:
+        job = submit_job(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in stream endpoint: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    return ndjson_response(job, follow=True)
+
+
 if __name__ == '__main__':
     if PLATFORM == "LOCAL":
+        # Bring the browser pool up in the background; early requests wait for their tabs
+        tab_pool.configure(load_yaml_config().get("browser_pool"))
+        # Only in the reloader's serving child, not in the process that watches the files
+        if tab_pool.enabled and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            threading.Thread(target=tab_pool.start, args=(warm_pool_tab,), daemon=True).start()
         app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
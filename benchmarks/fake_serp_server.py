@@ -0,0 +1,254 @@
+"""
+Local stand-in for Bing, Google and 2captcha, used by serp_benchmark.py.
+
+Serves recorded SERPs over HTTPS with tunable latency, error and CAPTCHA rates.
+Recordings are plain saved pages laid out by kind:
+
+    recordings/
+        bing_news/*.html     bing_web/*.html     bing_images/*.html
+        google_news/*.html   google_web/*.html   google_images/*.html
+
+A query always gets the same recording of its kind. The server also answers
+2captcha's in.php/res.php, so CAPTCHA pages can be solved end to end. Run it
+on its own to poke at it:
+
+    python benchmarks/fake_serp_server.py recordings/ --port 8443 --latency-ms 150 --captcha-rate 0.05
+"""
+import os
+import ssl
+import sys
+import glob
+import json
+import time
+import random
+import zlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+KINDS = ('bing_news', 'bing_web', 'bing_images', 'google_news', 'google_web', 'google_images')
+
+# Cookie the CAPTCHA page sets when it is submitted; exempts the next page load
+EXEMPTION_COOKIE = 'GOOGLE_ABUSE_EXEMPTION'
+
+CAPTCHA_PAGE = """<!DOCTYPE html>
+<html><head><title>Sorry...</title></head><body>
+<div id="captcha-form">
+  <p>Our systems have detected unusual traffic from your computer network.</p>
+  <div id="recaptcha" class="g-recaptcha" data-sitekey="fake-site-key" data-s="fake-data-s"></div>
+  <textarea id="g-recaptcha-response" name="g-recaptcha-response" style="display:none"></textarea>
+</div>
+<script>
+function submitCallback() {
+    document.cookie = "%s=1; path=/";
+    location.reload();
+}
+</script>
+</body></html>
+""" % EXEMPTION_COOKIE
+
+
+def classify(host, path, query):
+    """Map a request onto a recording kind, or None for anything that is not a SERP"""
+    host = (host or '').split(':')[0].lower()
+    if not path.endswith('/search'):
+        return None
+    if 'bing.' in host:
+        if path.startswith('/news/'):
+            return 'bing_news'
+        if path.startswith('/images/'):
+            return 'bing_images'
+        return 'bing_web'
+    if 'google.' in host:
+        tbm = (query.get('tbm') or [''])[0]
+        return {'nws': 'google_news', 'isch': 'google_images'}.get(tbm, 'google_web')
+    return None
+
+
+def load_recordings(directory):
+    recordings = {}
+    for kind in KINDS:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(directory, kind, '*.html'))):
+            with open(path, 'rb') as file:
+                pages.append(file.read())
+        if pages:
+            recordings[kind] = pages
+    return recordings
+
+
+def make_certificate(directory):
+    """Self-signed certificate valid for the mapped hosts and 127.0.0.1; returns (cert, key)"""
+    cert = os.path.join(directory, 'fake-serp.pem')
+    key = os.path.join(directory, 'fake-serp.key')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+        '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+        '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost,DNS:www.bing.com,DNS:www.google.com',
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+class FakeSerpServer:
+    """Threaded HTTPS server for recorded SERPs, injected faults and a fake 2captcha"""
+
+    def __init__(self, recordings_dir, port=0, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 captcha_rate=0.0, captcha_solve_ms=1000, seed=None):
+        self.recordings = load_recordings(recordings_dir)
+        if not self.recordings:
+            raise ValueError(f"No recordings under {recordings_dir} (expected <kind>/*.html for {', '.join(KINDS)})")
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+        self.captcha_solve_ms = captcha_solve_ms
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.cert_dir = tempfile.mkdtemp(prefix='fake-serp-')
+        self.cert_path, self.key_path = make_certificate(self.cert_dir)
+        self._captchas = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def roll(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        with self._lock:
+            ms = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def new_captcha(self):
+        with self._lock:
+            captcha_id = str(len(self._captchas) + 1)
+            self._captchas[captcha_id] = time.time() + self.captcha_solve_ms / 1000
+        return captcha_id
+
+    def captcha_ready(self, captcha_id):
+        with self._lock:
+            ready_at = self._captchas.get(captcha_id)
+        return ready_at is not None and time.time() >= ready_at
+
+    def page_for(self, kind, query):
+        pages = self.recordings.get(kind)
+        if not pages:
+            return None
+        return pages[zlib.crc32(query.encode('utf-8')) % len(pages)]
+
+    def start(self):
+        server = self
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cert_path, self.key_path)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                if urlsplit(self.path).path == '/in.php':
+                    server.count('captcha_submitted')
+                    payload = {'status': 1, 'request': server.new_captcha()}
+                    return self.send_body(200, json.dumps(payload).encode(), 'application/json')
+                self.send_body(404, b'')
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == '/res.php':
+                    captcha_id = (query.get('id') or [''])[0]
+                    if server.captcha_ready(captcha_id):
+                        payload = {'status': 1, 'request': f'fake-token-{captcha_id}'}
+                    else:
+                        payload = {'status': 0, 'request': 'CAPCHA_NOT_READY'}
+                    return self.send_body(200, json.dumps(payload).encode(), 'application/json')
+
+                kind = classify(self.headers.get('Host'), parts.path, query)
+                if kind is None:
+                    server.count('other')
+                    return self.send_body(404, b'')
+
+                server.delay()
+                exempt = f'{EXEMPTION_COOKIE}=1' in (self.headers.get('Cookie') or '')
+                if server.roll(server.error_rate):
+                    server.count(f'{kind}:error')
+                    return self.send_body(503, b'Service Unavailable')
+                if not exempt and server.roll(server.captcha_rate):
+                    server.count(f'{kind}:captcha')
+                    status = 429 if kind.startswith('google') else 200
+                    return self.send_body(status, CAPTCHA_PAGE.encode())
+
+                page = server.page_for(kind, (query.get('q') or [''])[0])
+                if page is None:
+                    server.count(f'{kind}:missing')
+                    return self.send_body(404, f'No recording for {kind}'.encode())
+                server.count(f'{kind}:ok')
+                headers = {'Set-Cookie': f'{EXEMPTION_COOKIE}=; Max-Age=0; Path=/'} if exempt else None
+                self.send_body(200, page, headers=headers)
+
+        httpd = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        httpd.daemon_threads = True
+        httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+        self.port = httpd.server_address[1]
+        self._httpd = httpd
+        threading.Thread(target=httpd.serve_forever, name='fake-serp', daemon=True).start()
+        return self.port
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-solve-ms', type=float, default=1000)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = FakeSerpServer(args.recordings, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                            args.captcha_rate, args.captcha_solve_ms, args.seed)
+    port = server.start()
+    print(f"Serving {', '.join(sorted(server.recordings))} on https://127.0.0.1:{port} (cert {server.cert_path})")
+    print(f"Chrome: --host-resolver-rules=\"MAP www.bing.com 127.0.0.1:{port}, "
+          f"MAP www.google.com 127.0.0.1:{port}\" --ignore-certificate-errors")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.stop()
+        print(dict(server.stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
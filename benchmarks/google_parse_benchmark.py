@@ -0,0 +1,126 @@
+"""
+Micro-benchmark for the in-page Google extractors on saved SERPs.
+
+Runs an extractor in Chrome against saved HTML files, with `fetch` stubbed to
+serve them, and reports the extraction time per SERP. Pass --baseline with a
+git ref to time that revision of the same file side by side, e.g.
+
+    python benchmarks/google_parse_benchmark.py google-web saved_serps/ --baseline HEAD~1
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from browser_manager import build_chrome_driver  # noqa: E402
+from app import load_yaml_config, EXTRACTOR_ENTRY_POINTS, DEFAULT_CONFIG_PATH  # noqa: E402
+
+EXTRACTORS = {
+    'google-web': ('google-web-yaml.js', 'google_web'),
+    'google-news': ('google-news-yaml.js', 'google_news'),
+    'google-images': ('google-image-yaml.js', 'google_images'),
+}
+
+# Serves the saved SERP for every fetch, then times `rounds` runs of the extractor
+BENCHMARK_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const html = arguments[0];
+const rounds = arguments[1];
+window.fetch = () => Promise.resolve({ ok: true, status: 200, text: () => Promise.resolve(html) });
+const timings = [];
+(async () => {
+    for (let i = 0; i < rounds; i++) {
+        const started = performance.now();
+        await window.__benchmarkExtractor.run(['benchmark'], { cc: 'US', qft: '', serpOptions: {} });
+        timings.push(performance.now() - started);
+    }
+    done(timings);
+})().catch(error => done({ error: error.message }));
+"""
+
+
+def load_source(js_file, ref=None):
+    if ref is None:
+        with open(os.path.join(ROOT, js_file), 'r', encoding='utf-8') as file:
+            return file.read()
+    return subprocess.check_output(['git', 'show', f'{ref}:{js_file}'], text=True, cwd=ROOT)
+
+
+def install(driver, js_file, js_code, config_json):
+    driver.execute_script(f"""
+    window.__benchmarkExtractor = (function () {{
+        const config = {config_json};
+        {js_code}
+        return {{
+            run: function (queries, options) {{
+                return {EXTRACTOR_ENTRY_POINTS[js_file]};
+            }}
+        }};
+    }})();
+    """)
+
+
+def time_revision(driver, js_file, js_code, config_json, serps, rounds):
+    install(driver, js_file, js_code, config_json)
+    medians = []
+    for html in serps:
+        timings = driver.execute_async_script(BENCHMARK_SCRIPT, html, rounds)
+        if isinstance(timings, dict):
+            raise RuntimeError(timings['error'])
+        medians.append(statistics.median(timings))
+    return medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('search_type', choices=sorted(EXTRACTORS))
+    parser.add_argument('serp_dir', help='directory of saved SERP .html files')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--baseline', help='git ref of the extractor to compare against')
+    parser.add_argument('--config', default=os.path.join(ROOT, DEFAULT_CONFIG_PATH))
+    args = parser.parse_args()
+
+    js_file, section = EXTRACTORS[args.search_type]
+    config = load_yaml_config(args.config)
+    config_json = json.dumps({
+        section: config.get(section, {}),
+        "processing": config.get("processing", {}),
+        "error_handling": config.get("error_handling", {}),
+    })
+
+    paths = sorted(glob.glob(os.path.join(args.serp_dir, '*.html')))
+    if not paths:
+        parser.error(f'no .html files in {args.serp_dir}')
+    serps = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            serps.append(file.read())
+
+    driver = build_chrome_driver()
+    try:
+        driver.get('data:text/html,<html></html>')
+        driver.set_script_timeout(600)
+        revisions = [('current', load_source(js_file))]
+        if args.baseline:
+            revisions.insert(0, (args.baseline, load_source(js_file, args.baseline)))
+        results = {name: time_revision(driver, js_file, code, config_json, serps, args.rounds)
+                   for name, code in revisions}
+    finally:
+        driver.quit()
+
+    names = [name for name, _ in revisions]
+    print(f"{'serp':40} {'KB':>7} " + ' '.join(f'{name:>12}' for name in names))
+    for i, path in enumerate(paths):
+        row = ' '.join(f'{results[name][i]:>10.2f}ms' for name in names)
+        print(f'{os.path.basename(path)[:40]:40} {len(serps[i]) / 1024:>7.0f} {row}')
+    print(f"{'median':40} {'':>7} " + ' '.join(f'{statistics.median(results[name]):>10.2f}ms' for name in names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Offline throughput and latency benchmark for Gen_search and the Flask endpoint.
+
+Starts fake_serp_server.py on localhost and points www.bing.com and www.google.com
+at it (Chrome host-resolver rules for the browser engine, a requests adapter for
+the http engine). Then it runs batches of each size per search type, engine and
+entry point, and reports queries/sec, per-query p50/p95/p99 (fetch + extract),
+browser startup and bootstrap cost, and peak RSS of this process plus Chrome.
+
+    python benchmarks/serp_benchmark.py recordings/ --sizes 1 10 50 200 --latency-ms 120 \\
+        --error-rate 0.02 --captcha-rate 0.01 --json current.json
+
+Pass --baseline with an earlier --json file to exit 1 when throughput or p95
+regresses by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+import yaml
+from requests.adapters import HTTPAdapter
+
+try:
+    import psutil
+except ImportError:  # peak RSS falls back to this process only
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_serp_server import FakeSerpServer  # noqa: E402
+
+SEARCH_TYPES = ('news', 'bing-web', 'bing-images', 'google-news', 'google-web', 'google-images')
+MAPPED_HOSTS = ('www.bing.com', 'www.google.com')
+
+
+class LocalAdapter(HTTPAdapter):
+    """Sends requests for a mapped host to the fake server, keeping the Host header"""
+
+    def __init__(self, port, **kwargs):
+        self.port = port
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.headers['Host'] = parts.netloc
+        request.url = urlunsplit(('https', f'127.0.0.1:{self.port}', parts.path, parts.query, ''))
+        return super().send(request, **kwargs)
+
+
+class RssSampler:
+    """Peak RSS of this process and all of its children (chromedriver, Chrome) while running"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        if psutil is None:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        total = 0
+        root = psutil.Process()
+        for process in [root] + root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.sample())
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def write_benchmark_config(port, directory):
+    """config.yaml with the CAPTCHA solver pointed at the fake server and EMF lines off"""
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+    captcha = config.setdefault('captcha', {})
+    captcha.update({
+        'base_url': f'https://127.0.0.1:{port}',
+        'initial_delay_seconds': 0.5,
+        'poll_interval_seconds': 0.25,
+        'max_poll_interval_seconds': 1,
+        'timeout_seconds': 30,
+        'pingback_url': '',
+    })
+    config.setdefault('metrics', {})['emf'] = False
+    path = os.path.join(directory, 'config.yaml')
+    with open(path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(config, file, sort_keys=False)
+    return path
+
+
+def point_at_fake_server(server):
+    """Environment that must be in place before app and browser_manager are imported"""
+    os.environ['SERP_CONFIG_PATH'] = write_benchmark_config(server.port, server.cert_dir)
+    os.environ['REQUESTS_CA_BUNDLE'] = server.cert_path
+    os.environ.setdefault('TWOCAPTCHA_API_KEY', 'benchmark')
+    rules = ', '.join(f'MAP {host} 127.0.0.1:{server.port}' for host in MAPPED_HOSTS)
+    os.environ['CHROME_EXTRA_ARGS'] = shlex.join([
+        f'--host-resolver-rules={rules}, MAP * ~NOTFOUND, EXCLUDE localhost',
+        '--ignore-certificate-errors',
+    ])
+
+
+def run_batch(app_module, mode, engine, search_type, queries):
+    """Run one batch through Gen_search or the Flask endpoint; returns (results, seconds)"""
+    started = time.perf_counter()
+    if mode == 'gen_search':
+        results = app_module.Gen_search(queries, 'US', '', None, search_type, {}, engine,
+                                        use_cache=False, include_timings=True)
+    else:
+        payload = {'queries': queries, 'cc': 'US', 'search_type': search_type, 'engine': engine,
+                   'cache': False, 'timings': True}
+        with app_module.app.test_client() as client:
+            results = client.post('/', json=payload).get_json()
+    elapsed = time.perf_counter() - started
+    if isinstance(results, dict):
+        results = [results]
+    return results or [], elapsed
+
+
+def summarize(results, elapsed, is_block_signal):
+    latencies, phases = [], {}
+    ok = errors = blocked = 0
+    for result in results:
+        if not isinstance(result, dict):
+            errors += 1
+            continue
+        timings = result.get('timings') or {}
+        phases = timings.get('phases') or phases
+        if result.get('success') is True:
+            ok += 1
+            query = timings.get('query') or {}
+            if 'fetch_ms' in query or 'extract_ms' in query:
+                latencies.append(query.get('fetch_ms', 0) + query.get('extract_ms', 0))
+        elif is_block_signal(result):
+            blocked += 1
+        else:
+            errors += 1
+    return {
+        'queries': len(results),
+        'ok': ok,
+        'errors': errors,
+        'blocked': blocked,
+        'seconds': round(elapsed, 3),
+        'qps': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'startup_ms': round(phases.get('driver_startup', 0) + phases.get('bootstrap', 0), 1),
+        'captcha_ms': phases.get('captcha', 0),
+    }
+
+
+def compare(rows, baseline_path, tolerance):
+    """Return a list of regressions against an earlier --json report"""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {row['key']: row for row in json.load(file)['rows']}
+    regressions = []
+    for row in rows:
+        base = baseline.get(row['key'])
+        if not base:
+            continue
+        if base.get('qps') and row['qps'] is not None and row['qps'] < base['qps'] * (1 - tolerance):
+            regressions.append(f"{row['key']}: qps {base['qps']} -> {row['qps']}")
+        if base.get('p95_ms') and row['p95_ms'] is not None and row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{row['key']}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+    return regressions
+
+
+def fmt(value, suffix=''):
+    return '-' if value is None else f'{value}{suffix}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings', help='directory of recorded SERPs, see fake_serp_server.py')
+    parser.add_argument('--engines', nargs='+', default=['browser', 'http'], choices=['browser', 'hybrid', 'http'])
+    parser.add_argument('--modes', nargs='+', default=['gen_search', 'endpoint'], choices=['gen_search', 'endpoint'])
+    parser.add_argument('--search-types', nargs='+', default=list(SEARCH_TYPES), choices=SEARCH_TYPES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 50, 200])
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-solve-ms', type=float, default=1000)
+    parser.add_argument('--cold', action='store_true', help='start a new browser for every batch')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='earlier --json report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    server = FakeSerpServer(args.recordings, 0, args.latency_ms, args.jitter_ms, args.error_rate,
+                            args.captcha_rate, args.captcha_solve_ms, args.seed)
+    server.start()
+    point_at_fake_server(server)
+    os.chdir(ROOT)  # extractor JS files are read relative to the repo root
+
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    import app as app_module
+    import http_engine
+    from browser_manager import browser_manager
+    from rotation import is_block_signal
+
+    session = http_engine.get_session(dict(http_engine.DEFAULT_HTTP_SETTINGS))
+    for host in MAPPED_HOSTS:
+        session.mount(f'https://{host}', LocalAdapter(server.port))
+
+    rows = []
+    header = (f"{'engine':8} {'mode':10} {'search_type':14} {'size':>5} {'ok':>4} {'err':>4} {'blk':>4} "
+              f"{'q/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'startup':>9} {'rss':>7}")
+    print(header)
+    try:
+        for engine in args.engines:
+            for mode in args.modes:
+                for search_type in args.search_types:
+                    for size in args.sizes:
+                        if engine == 'browser' and (args.cold or not rows):
+                            browser_manager.shutdown()
+                        queries = [{'query': f'benchmark {search_type} {size} {i}', 'query_id': i}
+                                   for i in range(size)]
+                        with RssSampler() as rss:
+                            results, elapsed = run_batch(app_module, mode, engine, search_type, queries)
+                        row = summarize(results, elapsed, is_block_signal)
+                        row.update({
+                            'key': f'{engine}/{mode}/{search_type}/{size}',
+                            'engine': engine, 'mode': mode, 'search_type': search_type, 'size': size,
+                            'peak_rss_mb': round(rss.peak_mb, 1),
+                        })
+                        rows.append(row)
+                        print(f"{engine:8} {mode:10} {search_type:14} {size:>5} {row['ok']:>4} {row['errors']:>4} "
+                              f"{row['blocked']:>4} {fmt(row['qps']):>8} {fmt(row['p50_ms']):>7} "
+                              f"{fmt(row['p95_ms']):>7} {fmt(row['p99_ms']):>7} {row['startup_ms']:>7}ms "
+                              f"{row['peak_rss_mb']:>5.0f}MB", flush=True)
+    finally:
+        browser_manager.shutdown()
+        server.stop()
+
+    report = {
+        'settings': {k: v for k, v in vars(args).items() if k not in ('json', 'baseline')},
+        'server': dict(server.stats),
+        'rows': rows,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    print(f"fake server: {json.dumps(dict(sorted(server.stats.items())))}")
+
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Record a batch's SERP traffic once, then replay it offline through Gen_search.
+
+    python benchmarks/traffic_replay.py record slow-batch.jsonl.gz queries.txt --search-type google-web
+    python benchmarks/traffic_replay.py replay slow-batch.jsonl.gz --timing fast --rounds 10
+
+`record` runs the queries (one per line) live and saves every SERP response.
+`replay` serves those responses back with their original latency, or at once with
+--timing fast, and reports per-round wall time and the batch's phase timings.
+The search type, engine, cc, qft and queries come from the archive header.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+from traffic_archive import TrafficArchive  # noqa: E402
+
+
+def run(archive, queries, search_type, engine, cc, qft, serp_options):
+    started = time.perf_counter()
+    results = app.Gen_search(queries, cc, qft, None, search_type, serp_options, engine,
+                             use_cache=False, include_timings=True, traffic=archive)
+    elapsed = time.perf_counter() - started
+    if isinstance(results, dict):
+        results = [results]
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('archive')
+    parser.add_argument('queries', nargs='?', help='file with one query per line (record only)')
+    parser.add_argument('--search-type', default='news')
+    parser.add_argument('--engine', default='browser', choices=['browser', 'http'])
+    parser.add_argument('--cc', default='US')
+    parser.add_argument('--qft', default='')
+    parser.add_argument('--timing', default='original', choices=['original', 'fast'])
+    parser.add_argument('--rounds', type=int, default=1)
+    args = parser.parse_args()
+    args.archive = os.path.abspath(args.archive)
+    args.queries = args.queries and os.path.abspath(args.queries)
+    os.chdir(ROOT)  # config.yaml and the extractor JS files are read relative to the repo root
+
+    if args.mode == 'record':
+        if not args.queries:
+            parser.error('record needs a queries file')
+        with open(args.queries, 'r', encoding='utf-8') as file:
+            queries = [{'query': line.strip(), 'query_id': i} for i, line in enumerate(file) if line.strip()]
+        results, elapsed = run(TrafficArchive('record', args.archive), queries, args.search_type, args.engine,
+                               args.cc, args.qft, {})
+        ok = sum(1 for r in results if isinstance(r, dict) and r.get('success') is True)
+        print(f"recorded {len(queries)} queries ({ok} ok) in {elapsed:.2f}s to {args.archive}")
+        return
+
+    meta = TrafficArchive('replay', args.archive).meta
+    walls = []
+    for round_number in range(args.rounds):
+        archive = TrafficArchive('replay', args.archive, args.timing)
+        results, elapsed = run(archive, meta.get('queries', []), meta.get('search_type', 'news'),
+                               meta.get('engine', 'browser'), meta.get('cc', 'US'), meta.get('qft', ''),
+                               meta.get('serpOptions') or {})
+        walls.append(elapsed)
+        ok = sum(1 for r in results if isinstance(r, dict) and r.get('success') is True)
+        phases = next((r['timings']['phases'] for r in results if isinstance(r, dict) and r.get('timings')), {})
+        print(f"round {round_number + 1}: {len(results)} queries, {ok} ok, {elapsed * 1000:.0f}ms {json.dumps(phases)}")
+    if len(walls) > 1:
+        print(f"median {statistics.median(walls) * 1000:.0f}ms over {len(walls)} rounds")
+
+
+if __name__ == '__main__':
+    main()
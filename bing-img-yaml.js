@@ -1,3 +1,29 @@
+// Execution plans compiled once per config object: fields grouped by selector, regexes prebuilt
+const compiledImagePlans = new WeakMap();
+
+function compileImagePlan(config) {
+    let plan = compiledImagePlans.get(config);
+    if (plan) return plan;
+
+    const selectors = [];
+    const fields = Object.entries(config.bing_images.fields).map(([field, conf]) => {
+        if (!conf.selector) return [field, conf, null];
+        let slot = selectors.indexOf(conf.selector);
+        if (slot === -1) {
+            slot = selectors.push(conf.selector) - 1;
+        }
+        return [field, conf, slot];
+    });
+
+    plan = {
+        selectors,
+        fields,
+        resultCountRegex: new RegExp(config.bing_images.global.result_count.regex)
+    };
+    compiledImagePlans.set(config, plan);
+    return plan;
+}
+
 async function fetchImagesWithConfig(queries, cc, config) {
     async function processQuery(queryObj, cc) {
         // Extract query string from object or use as string
@@ -6,29 +32,46 @@ async function fetchImagesWithConfig(queries, cc, config) {
         
         const params = new URLSearchParams({ q: query, cc: cc });
         const url = `https://www.bing.com/images/search?${params.toString()}`;
+        const fetchStarted = performance.now();
         const res = await fetch(url);
         const html = await res.text();
+        const fetchMs = performance.now() - fetchStarted;
+        const blocked = blockedPage(res, html, query);
+        if (blocked) {
+            return { ...blocked, query_id: queryId };
+        }
         const parser = new DOMParser();
         const doc = parser.parseFromString(html, 'text/html');
+        const plan = compileImagePlan(config);
         const items = doc.querySelectorAll(config.bing_images.container);
         const results = [];
         
         items.forEach((item, idx) => {
+            // One lookup per distinct selector and one JSON parse of `m` per card
+            const elements = plan.selectors.map(selector => item.querySelector(selector));
+            const metas = plan.selectors.map(() => undefined);
+            const readMeta = (slot) => {
+                if (metas[slot] === undefined) {
+                    try {
+                        const meta = elements[slot].getAttribute('m');
+                        metas[slot] = { data: meta ? JSON.parse(meta.replace(/&quot;/g, '"')) : {} };
+                    } catch {
+                        metas[slot] = { failed: true };
+                    }
+                }
+                return metas[slot];
+            };
+
             const data = {};
-            for (const [field, conf] of Object.entries(config.bing_images.fields)) {
+            for (const [field, conf, slot] of plan.fields) {
                 let value = conf.fallback || 'N/A';
                 
-                if (conf.selector) {
-                    const el = item.querySelector(conf.selector);
+                if (slot !== null) {
+                    const el = elements[slot];
                     if (el) {
                         if (conf.attribute === 'm' && conf.parse_json) {
-                            try {
-                                const meta = el.getAttribute('m');
-                                const metaData = meta ? JSON.parse(meta.replace(/&quot;/g, '"')) : {};
-                                value = metaData?.[conf.json_key] || conf.fallback;
-                            } catch { 
-                                value = conf.fallback; 
-                            }
+                            const meta = readMeta(slot);
+                            value = meta.failed ? conf.fallback : (meta.data?.[conf.json_key] || conf.fallback);
                         } else if (conf.parse_domain) {
                             try {
                                 const href = el.getAttribute(conf.attribute);
@@ -53,7 +96,7 @@ async function fetchImagesWithConfig(queries, cc, config) {
             (titleElement.getAttribute(config.bing_images.global.page_title.attribute) || titleElement.textContent) : 
             config.bing_images.global.page_title.fallback;
         
-        const resultCountMatch = html.match(new RegExp(config.bing_images.global.result_count.regex));
+        const resultCountMatch = html.match(plan.resultCountRegex);
         const result_count = resultCountMatch ? 
             resultCountMatch[1].replace(/,/g, '') : 
             config.bing_images.global.result_count.fallback;
@@ -64,7 +107,9 @@ async function fetchImagesWithConfig(queries, cc, config) {
             query_id: queryId,
             title, 
             result_count, 
-            image_results: results 
+            image_results: results,
+            timings: { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) },
+            ...(window.__serpKeepHtml && { raw_html: html })
         };
     }
     
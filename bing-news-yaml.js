@@ -12,8 +12,18 @@ function safeExtract(element, selector, attribute = 'textContent', fallback = 'N
             targetElement = element.querySelector(selector);
         }
         
+        return safeExtractFrom(targetElement, selector, attribute, fallback);
+    } catch (error) {
+        console.warn(`Error extracting ${selector}:`, error);
+        return fallback;
+    }
+}
+
+// Same as safeExtract for an element that was already looked up
+function safeExtractFrom(targetElement, selector, attribute = 'textContent', fallback = 'N/A') {
+    try {
         if (!targetElement) return fallback;
-        
+
         if (attribute === 'textContent') {
             return targetElement.textContent.trim();
         } else if (attribute === 'innerHTML') {
@@ -27,6 +37,31 @@ function safeExtract(element, selector, attribute = 'textContent', fallback = 'N
     }
 }
 
+// Relative time patterns, built once rather than for every time string
+const RELATIVE_TIME_PATTERNS = [
+    // Hours patterns
+    { pattern: /(\d+)\s*h(?:our)?s?\s*ago/i, type: 'hours' },
+    { pattern: /(\d+)\s*h$/i, type: 'hours' },
+    { pattern: /(\d+)\s*hr?s?\s*ago/i, type: 'hours' },
+    
+    // Minutes patterns
+    { pattern: /(\d+)\s*m(?:in)?(?:ute)?s?\s*ago/i, type: 'minutes' },
+    { pattern: /(\d+)\s*m$/i, type: 'minutes' },
+    { pattern: /(\d+)\s*min?s?\s*ago/i, type: 'minutes' },
+    
+    // Days patterns
+    { pattern: /(\d+)\s*d(?:ay)?s?\s*ago/i, type: 'days' },
+    { pattern: /(\d+)\s*d$/i, type: 'days' },
+    
+    // Special cases
+    { pattern: /just\s+now/i, type: 'minutes', value: 0 },
+    { pattern: /a\s+few\s+minutes?\s+ago/i, type: 'minutes', value: 2 },
+    { pattern: /an?\s+hour\s+ago/i, type: 'hours', value: 1 },
+    { pattern: /a\s+day\s+ago/i, type: 'days', value: 1 },
+    { pattern: /yesterday/i, type: 'days', value: 1 },
+    { pattern: /today/i, type: 'hours', value: 0 }
+];
+
 // Enhanced time conversion function with better pattern matching
 function convertRelativeTimeToUTC(timeString, timePatterns) {
     if (!timeString || timeString === 'N/A') {
@@ -38,33 +73,8 @@ function convertRelativeTimeToUTC(timeString, timePatterns) {
     
     console.log(`Converting time string: "${timeString}" (cleaned: "${cleanTimeString}")`);
     
-    // Enhanced patterns with multiple variations
-    const enhancedPatterns = [
-        // Hours patterns
-        { pattern: /(\d+)\s*h(?:our)?s?\s*ago/i, type: 'hours' },
-        { pattern: /(\d+)\s*h$/i, type: 'hours' },
-        { pattern: /(\d+)\s*hr?s?\s*ago/i, type: 'hours' },
-        
-        // Minutes patterns
-        { pattern: /(\d+)\s*m(?:in)?(?:ute)?s?\s*ago/i, type: 'minutes' },
-        { pattern: /(\d+)\s*m$/i, type: 'minutes' },
-        { pattern: /(\d+)\s*min?s?\s*ago/i, type: 'minutes' },
-        
-        // Days patterns
-        { pattern: /(\d+)\s*d(?:ay)?s?\s*ago/i, type: 'days' },
-        { pattern: /(\d+)\s*d$/i, type: 'days' },
-        
-        // Special cases
-        { pattern: /just\s+now/i, type: 'minutes', value: 0 },
-        { pattern: /a\s+few\s+minutes?\s+ago/i, type: 'minutes', value: 2 },
-        { pattern: /an?\s+hour\s+ago/i, type: 'hours', value: 1 },
-        { pattern: /a\s+day\s+ago/i, type: 'days', value: 1 },
-        { pattern: /yesterday/i, type: 'days', value: 1 },
-        { pattern: /today/i, type: 'hours', value: 0 }
-    ];
-    
     // Try enhanced patterns first
-    for (const pattern of enhancedPatterns) {
+    for (const pattern of RELATIVE_TIME_PATTERNS) {
         const match = cleanTimeString.match(pattern.pattern);
         if (match) {
             const value = pattern.value !== undefined ? pattern.value : parseInt(match[1]);
@@ -92,7 +102,7 @@ function convertRelativeTimeToUTC(timeString, timePatterns) {
     if (timePatterns && Array.isArray(timePatterns)) {
         for (const pattern of timePatterns) {
             try {
-                const regex = new RegExp(pattern.pattern, 'i'); // Add case insensitive flag
+                const regex = pattern.regex || new RegExp(pattern.pattern, 'i'); // Add case insensitive flag
                 const match = cleanTimeString.match(regex);
                 if (match) {
                     const value = parseInt(match[1]);
@@ -124,9 +134,59 @@ function convertRelativeTimeToUTC(timeString, timePatterns) {
     return 'N/A';
 }
 
+// Execution plans compiled once per config object: fields grouped by selector, regexes prebuilt
+const compiledNewsPlans = new WeakMap();
+
+function compileNewsPlan(config) {
+    let plan = compiledNewsPlans.get(config);
+    if (plan) return plan;
+
+    const selectors = [];
+    const fields = Object.entries(config.bing_news.fields).map(([fieldName, fieldConfig]) => {
+        if (fieldConfig.selector === null) return [fieldName, fieldConfig, null];
+        let slot = selectors.indexOf(fieldConfig.selector);
+        if (slot === -1) {
+            slot = selectors.push(fieldConfig.selector) - 1;
+        }
+        return [fieldName, fieldConfig, slot];
+    });
+
+    const configPatterns = config.processing && config.processing.time_patterns ? config.processing.time_patterns : null;
+    const timePatterns = configPatterns && Array.isArray(configPatterns) ? configPatterns.map(pattern => {
+        try {
+            return { ...pattern, regex: new RegExp(pattern.pattern, 'i') };
+        } catch (error) {
+            console.warn(`Error with pattern ${pattern.pattern}:`, error);
+            return null;
+        }
+    }).filter(Boolean) : configPatterns;
+
+    const globalRegexes = {};
+    Object.entries(config.bing_news.global).forEach(([key, globalFieldConfig]) => {
+        if (globalFieldConfig.regex) {
+            globalRegexes[key] = new RegExp(globalFieldConfig.regex);
+        }
+    });
+
+    plan = { selectors, fields, timePatterns, globalRegexes };
+    compiledNewsPlans.set(config, plan);
+    return plan;
+}
+
+// Look up a selector on a card, treating an invalid selector like a missing element
+function safeQuery(element, selector) {
+    try {
+        return element.querySelector(selector);
+    } catch (error) {
+        console.warn(`Error extracting ${selector}:`, error);
+        return null;
+    }
+}
+
 // Extract Bing news using configuration
 function extractBingNewsWithConfig(root, config) {
     const newsConfig = config.bing_news;
+    const plan = compileNewsPlan(config);
     const newsCards = root.querySelectorAll(newsConfig.container);
     const extractedNews = [];
 
@@ -134,9 +194,11 @@ function extractBingNewsWithConfig(root, config) {
 
     newsCards.forEach((card, index) => {
         const news = { position: index + 1 };
+        // One lookup per distinct selector on this card
+        const elements = plan.selectors.map(selector => safeQuery(card, selector));
 
         // Extract each field based on config
-        Object.entries(newsConfig.fields).forEach(([fieldName, fieldConfig]) => {
+        plan.fields.forEach(([fieldName, fieldConfig, slot]) => {
             if (fieldConfig.selector === null && fieldConfig.attribute) {
                 // Handle container attributes (like domain_url)
                 let value = card.getAttribute(fieldConfig.attribute);
@@ -158,11 +220,16 @@ function extractBingNewsWithConfig(root, config) {
                 }
             } else {
                 // Regular selector-based extraction
-                const extractedValue = safeExtract(
+                const extractedValue = slot === null ? safeExtract(
                     card, 
                     fieldConfig.selector, 
                     fieldConfig.attribute, 
                     fieldConfig.fallback
+                ) : safeExtractFrom(
+                    elements[slot],
+                    fieldConfig.selector,
+                    fieldConfig.attribute,
+                    fieldConfig.fallback
                 );
                 news[fieldName] = extractedValue;
                 
@@ -175,7 +242,7 @@ function extractBingNewsWithConfig(root, config) {
 
         // Convert relative time to UTC if configured and time exists
         if (news.time && news.time !== 'N/A') {
-            const timePatterns = config.processing && config.processing.time_patterns ? config.processing.time_patterns : null;
+            const timePatterns = plan.timePatterns;
             news.dateUTC = convertRelativeTimeToUTC(news.time, timePatterns);
         } else {
             news.dateUTC = 'N/A';
@@ -191,13 +258,14 @@ function extractBingNewsWithConfig(root, config) {
 // Extract global data (page title, result count)
 function extractGlobalData(root, config) {
     const globalConfig = config.bing_news.global;
+    const plan = compileNewsPlan(config);
     const globalData = {};
     
     Object.entries(globalConfig).forEach(([key, globalFieldConfig]) => {
         if (globalFieldConfig.regex) {
             // Use regex extraction for result count
             const bodyText = root.querySelector('body')?.innerHTML || '';
-            const match = bodyText.match(new RegExp(globalFieldConfig.regex));
+            const match = bodyText.match(plan.globalRegexes[key]);
             globalData[key] = match ? match[1].replace(/,/g, '') : globalFieldConfig.fallback;
         } else {
             // Regular selector extraction
@@ -226,8 +294,14 @@ async function processQueryWithConfig(queryObj, cc, qft, config) {
         const url = `https://www.bing.com/news/search?${params.toString()}`;
         console.log(`Fetching URL: ${url}`);
         
+        const fetchStarted = performance.now();
         const res = await fetch(url);
         const html = await res.text();
+        const fetchMs = performance.now() - fetchStarted;
+        const blocked = blockedPage(res, html, query);
+        if (blocked) {
+            return blocked;
+        }
         
         const dom = new DOMParser().parseFromString(html, 'text/html');
         
@@ -263,7 +337,9 @@ async function processQueryWithConfig(queryObj, cc, qft, config) {
             query,
             title: globalData.page_title,
             news_results: newsResults,
-            result_count: globalData.result_count
+            result_count: globalData.result_count,
+            timings: { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) },
+            ...(window.__serpKeepHtml && { raw_html: html })
         };
     } catch (error) {
         console.error(`Error processing query "${query}":`, error);
@@ -1,16 +1,19 @@
 // Utility function to extract value based on config
 function extractValue(element, fieldConfig, index = 0) {
     if (!element || !fieldConfig) return fieldConfig?.fallback || 'N/A';
+
+    const targetElement = fieldConfig.selector ? safeQuery(element, fieldConfig.selector) : element;
+    return extractValueFrom(element, targetElement, fieldConfig, index);
+}
+
+// Same as extractValue for a target element that was already looked up
+function extractValueFrom(element, targetElement, fieldConfig, index = 0) {
+    if (!element || !fieldConfig) return fieldConfig?.fallback || 'N/A';
     
     const { selector, attribute, fallback, parse_json, json_key, parse_domain } = fieldConfig;
     
     try {
-        let targetElement = element;
-        
-        if (selector) {
-            targetElement = element.querySelector(selector);
-            if (!targetElement) return fallback || 'N/A';
-        }
+        if (!targetElement) return fallback || 'N/A';
         
         let value = fallback || 'N/A';
         
@@ -85,20 +88,74 @@ function extractValue(element, fieldConfig, index = 0) {
     }
 }
 
+// Look up a selector on an element, treating an invalid selector like a missing element
+function safeQuery(element, selector) {
+    try {
+        return element.querySelector(selector);
+    } catch (error) {
+        console.error('Error extracting value:', error);
+        return null;
+    }
+}
+
+// Execution plans compiled once per section config object: fields grouped by selector
+const compiledSectionPlans = new WeakMap();
+
+function compileSectionPlan(sectionConfig) {
+    let plan = compiledSectionPlans.get(sectionConfig);
+    if (plan) return plan;
+
+    const selectors = [];
+    const fields = Object.keys(sectionConfig.fields).map(fieldName => {
+        const fieldConfig = sectionConfig.fields[fieldName];
+        if (!fieldConfig?.selector) return [fieldName, fieldConfig, null];
+        let slot = selectors.indexOf(fieldConfig.selector);
+        if (slot === -1) {
+            slot = selectors.push(fieldConfig.selector) - 1;
+        }
+        return [fieldName, fieldConfig, slot];
+    });
+
+    plan = { selectors, fields };
+    compiledSectionPlans.set(sectionConfig, plan);
+    return plan;
+}
+
+// Regexes of the global config, built once per config object
+const compiledGlobalRegexes = new WeakMap();
+
+function compileGlobalRegexes(globalConfig) {
+    let regexes = compiledGlobalRegexes.get(globalConfig);
+    if (regexes) return regexes;
+
+    regexes = {};
+    Object.keys(globalConfig).forEach(key => {
+        if (globalConfig[key].regex) {
+            regexes[key] = new RegExp(globalConfig[key].regex);
+        }
+    });
+    compiledGlobalRegexes.set(globalConfig, regexes);
+    return regexes;
+}
+
 // Extract data for a specific section
 function extractSectionData(doc, sectionConfig) {
     if (!sectionConfig) return [];
     
-    const { container, fields } = sectionConfig;
+    const { container } = sectionConfig;
+    const plan = compileSectionPlan(sectionConfig);
     const elements = doc.querySelectorAll(container);
     const results = [];
     
     elements.forEach((element, index) => {
         const item = {};
+        // One lookup per distinct selector on this element
+        const targets = plan.selectors.map(selector => safeQuery(element, selector));
         
-        Object.keys(fields).forEach(fieldName => {
-            const fieldConfig = fields[fieldName];
-            item[fieldName] = extractValue(element, fieldConfig, index);
+        plan.fields.forEach(([fieldName, fieldConfig, slot]) => {
+            item[fieldName] = slot === null ?
+                extractValue(element, fieldConfig, index) :
+                extractValueFrom(element, targets[slot], fieldConfig, index);
         });
         
         results.push(item);
@@ -110,13 +167,13 @@ function extractSectionData(doc, sectionConfig) {
 // Extract global data (page-level information)
 function extractGlobalData(html, doc, globalConfig) {
     const globalData = {};
+    const regexes = compileGlobalRegexes(globalConfig);
     
     Object.keys(globalConfig).forEach(key => {
         const config = globalConfig[key];
         
         if (config.regex) {
-            const regex = new RegExp(config.regex);
-            const match = regex.exec(html);
+            const match = regexes[key].exec(html);
             globalData[key] = match ? match[1].replace(/,/g, '') : config.fallback || 'N/A';
         } else if (config.selector) {
             const element = doc.querySelector(config.selector);
@@ -135,8 +192,14 @@ async function processWebQuery(query, cc, config) {
             cc: cc
         });
         const url = `https://www.bing.com/search?${params.toString()}`;
+        const fetchStarted = performance.now();
         const res = await fetch(url);
         const html = await res.text();
+        const fetchMs = performance.now() - fetchStarted;
+        const blocked = blockedPage(res, html, typeof query === 'object' ? query.query : query);
+        if (blocked) {
+            return blocked;
+        }
         const doc = new DOMParser().parseFromString(html, 'text/html');
 
         const webConfig = config.bing_web;
@@ -173,7 +236,12 @@ async function processWebQuery(query, cc, config) {
             )
         );
 
-        return { success: true, ...filteredData };
+        return {
+            success: true,
+            ...filteredData,
+            timings: { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) },
+            ...(window.__serpKeepHtml && { raw_html: html })
+        };
     } catch (error) {
         console.error('Error processing web query:', error);
         return { 
@@ -0,0 +1,167 @@
+import re
+from functools import lru_cache
+
+# Block-page rules per search engine, overridable from the `block_detection` section of config.yaml.
+# Each label matches on the final URL, the first scan_chars of the HTML or the HTTP status
+DEFAULT_BLOCK_SETTINGS = {
+    'enabled': True,
+    'scan_chars': 30000,     # block pages are small; real SERPs are never scanned past this
+    'engines': {
+        'google': {
+            'captcha': {'urls': [r'/sorry/'], 'html': [r'id="captcha-form"', r'id="recaptcha"'], 'statuses': []},
+            'consent': {'urls': [r'consent\.google\.'], 'html': [r'action="https://consent\.google\.[^"]*"'],
+                        'statuses': []},
+            'throttled': {'urls': [], 'html': [], 'statuses': [429]},
+            'min_chars': 1000,
+        },
+        'bing': {
+            'captcha': {'urls': [r'/challenge/', r'^[^?]*captcha'], 'html': [r'id="b_captcha"', r'class="captcha'],
+                        'statuses': []},
+            'consent': {'urls': [], 'html': [], 'statuses': []},
+            'throttled': {'urls': [], 'html': [], 'statuses': [429]},
+            'min_chars': 500,
+        },
+    },
+}
+
+# Checked in this order; anything shorter than min_chars is 'empty', the rest 'ok'
+PAGE_TYPES = ('captcha', 'consent', 'throttled')
+
+# Errors of block-page results; "block page" is one of rotation.BLOCK_MARKERS
+PAGE_ERRORS = {
+    'captcha': 'Block page: CAPTCHA challenge',
+    'consent': 'Block page: consent wall',
+    'throttled': 'Block page: throttled',
+    'empty': 'Block page: empty response',
+}
+
+# Same check inside the extractor bundles, before DOMParser; `config` is the bundle's config
+BLOCK_CHECK_SCRIPT = """
+const serpBlockRules = config.block_detection || null;
+const serpBlockPatterns = serpBlockRules ? Object.fromEntries(serpBlockRules.order.map(label => [label, {
+    urls: serpBlockRules[label].urls.map(pattern => new RegExp(pattern, 'i')),
+    html: serpBlockRules[label].html.map(pattern => new RegExp(pattern, 'i')),
+}])) : null;
+
+function classifyPage(status, url, html) {
+    if (!serpBlockRules) {
+        return 'ok';
+    }
+    const head = html.slice(0, serpBlockRules.scan_chars);
+    for (const label of serpBlockRules.order) {
+        const patterns = serpBlockPatterns[label];
+        if (serpBlockRules[label].statuses.includes(status)
+            || patterns.urls.some(re => re.test(url || ''))
+            || patterns.html.some(re => re.test(head))) {
+            return label;
+        }
+    }
+    return html.trim().length < serpBlockRules.min_chars ? 'empty' : 'ok';
+}
+
+// The result for a CAPTCHA, consent, rate-limit or empty page, or null when the page is worth parsing
+function blockedPage(response, html, query) {
+    const pageType = classifyPage(response.status, response.url, html);
+    if (pageType === 'ok') {
+        return null;
+    }
+    return {
+        success: false,
+        query: query,
+        page_type: pageType,
+        http_status: response.status,
+        error: serpBlockRules.messages[pageType],
+        ...(window.__serpKeepHtml && { raw_html: html })
+    };
+}
+
+class BlockedPageError extends Error {
+    constructor(result) {
+        super(result.error);
+        this.result = result;
+    }
+}
+"""
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+class BlockDetector:
+    """
+    Labels a fetched SERP as ok, captcha, consent, throttled or empty from its status,
+    final URL and first bytes, so block pages never reach the extractors. Block-page
+    results carry `page_type` and an error the retry, rotation and throttle logic count as a block
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_BLOCK_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+
+    def configure(self, settings=None):
+        """Apply the `block_detection` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key not in self.settings or value is None:
+                continue
+            if key == 'engines':
+                engines = dict(DEFAULT_BLOCK_SETTINGS['engines'])
+                for engine, rules in value.items():
+                    engines[engine] = {**engines.get(engine, {}), **(rules or {})}
+                value = engines
+            self.settings[key] = value
+
+    @property
+    def enabled(self):
+        return bool(self.settings['enabled'])
+
+    def rules(self, engine):
+        """The engine's rules with every list present, as the in-page check expects them; None when disabled"""
+        if not self.enabled:
+            return None
+        engine_rules = self.settings['engines'].get(engine) or {}
+        rules = {
+            'order': list(PAGE_TYPES),
+            'scan_chars': int(self.settings['scan_chars']),
+            'min_chars': int(engine_rules.get('min_chars', 0) or 0),
+            'messages': PAGE_ERRORS,
+        }
+        for label in PAGE_TYPES:
+            label_rules = engine_rules.get(label) or {}
+            rules[label] = {
+                'urls': list(label_rules.get('urls') or []),
+                'html': list(label_rules.get('html') or []),
+                'statuses': [int(status) for status in label_rules.get('statuses') or []],
+            }
+        return rules
+
+    def classify(self, engine, status, url, html_text):
+        rules = self.rules(engine)
+        if rules is None:
+            return 'ok'
+        head = (html_text or '')[:rules['scan_chars']]
+        for label in PAGE_TYPES:
+            label_rules = rules[label]
+            if (status in label_rules['statuses']
+                    or any(_compile(p).search(url or '') for p in label_rules['urls'])
+                    or any(_compile(p).search(head) for p in label_rules['html'])):
+                return label
+        return 'empty' if len((html_text or '').strip()) < rules['min_chars'] else 'ok'
+
+    def blocked_result(self, engine, status, url, html_text, query, query_id=None):
+        """The result for a block page, or None when the page should be parsed"""
+        page_type = self.classify(engine, status, url, html_text)
+        if page_type == 'ok':
+            return None
+        return {
+            'success': False,
+            'query': query,
+            'query_id': query_id,
+            'page_type': page_type,
+            'http_status': status,
+            'error': PAGE_ERRORS[page_type],
+        }
+
+
+block_detector = BlockDetector()
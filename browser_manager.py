@@ -0,0 +1,192 @@
+import os
+import time
+import shlex
+import atexit
+import socket
+import threading
+from tempfile import mkdtemp
+from selenium import webdriver
+from loguru import logger
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+PLATFORM = os.getenv("platform", "DEPLOY")
+
+# Extra Chrome switches, shell-quoted, e.g. the host mapping used by benchmarks/serp_benchmark.py
+CHROME_EXTRA_ARGS_ENV = "CHROME_EXTRA_ARGS"
+
+# Recycling limits, overridable from the `browser` section of config.yaml
+DEFAULT_BROWSER_SETTINGS = {
+    'max_queries': int(os.getenv('BROWSER_MAX_QUERIES', 500)),
+    'max_age_seconds': int(os.getenv('BROWSER_MAX_AGE_SECONDS', 1800)),
+    'max_rss_mb': int(os.getenv('BROWSER_MAX_RSS_MB', 1200)),
+    'max_idle': int(os.getenv('BROWSER_MAX_IDLE', 1)),
+}
+
+
+def free_port():
+    """A TCP port nothing is listening on, so concurrent Chromes never share a debugging port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_chrome_driver(extra_args=()):
+    """Start a new Chrome driver for the current platform"""
+    if PLATFORM == "LOCAL":
+        options = webdriver.ChromeOptions()
+        service = webdriver.ChromeService("C:/Users/i/Downloads/chromedriver-win64/chromedriver.exe")
+    else:
+        options = webdriver.ChromeOptions()
+        service = webdriver.ChromeService("/opt/chromedriver")
+
+        options.binary_location = '/opt/chrome/chrome'
+        options.add_argument("--headless=new")
+        options.add_argument('--no-sandbox')
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1280x1696")
+        options.add_argument("--single-process")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-dev-tools")
+        options.add_argument("--no-zygote")
+        options.add_argument(f"--user-data-dir={mkdtemp()}")
+        options.add_argument(f"--data-path={mkdtemp()}")
+        options.add_argument(f"--disk-cache-dir={mkdtemp()}")
+        options.add_argument(f"--remote-debugging-port={free_port()}")
+
+    for argument in list(extra_args) + shlex.split(os.getenv(CHROME_EXTRA_ARGS_ENV, "")):
+        options.add_argument(argument)
+
+    return webdriver.Chrome(options=options, service=service)
+
+
+class ManagedBrowser:
+    """A Chrome driver plus the bookkeeping needed to decide when to recycle it"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.time()
+        self.query_count = 0
+        # URL of the page currently loaded as the origin for in-page fetches
+        self.origin = None
+        # Extractor bundles installed in that page: JS file -> bundle version
+        self.installed = {}
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    def rss_mb(self):
+        """Resident memory of chromedriver and its Chrome children, or None if unknown"""
+        if psutil is None:
+            return None
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+            total = 0
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total / (1024 * 1024)
+        except Exception as ex:
+            logger.debug(f"Could not read browser RSS: {ex}")
+            return None
+
+    def is_healthy(self):
+        """Cheap round-trip to make sure Chrome and chromedriver still respond"""
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception as ex:
+            logger.warning(f"Browser health check failed: {ex}")
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.error(f"Error closing driver: {e}")
+
+
+class BrowserManager:
+    """
+    Keeps healthy Chrome drivers alive between warm Lambda invocations
+    and Flask requests instead of starting a new browser per batch
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_BROWSER_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def configure(self, settings=None):
+        """Apply limits from the `browser` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = int(value)
+
+    def recycle_reason(self, browser):
+        """Return why a browser should be retired, or None if it can be reused"""
+        if browser.query_count >= self.settings['max_queries']:
+            return f"query count {browser.query_count} reached limit {self.settings['max_queries']}"
+        if browser.age >= self.settings['max_age_seconds']:
+            return f"age {browser.age:.0f}s reached limit {self.settings['max_age_seconds']}s"
+        rss = browser.rss_mb()
+        if rss is not None and rss >= self.settings['max_rss_mb']:
+            return f"RSS {rss:.0f}MB reached limit {self.settings['max_rss_mb']}MB"
+        return None
+
+    def acquire(self):
+        """
+        Return (browser, warm). Idle browsers are health-checked before reuse;
+        a new Chrome is started when none is available
+        """
+        while True:
+            with self._lock:
+                browser = self._idle.pop() if self._idle else None
+            if browser is None:
+                break
+            reason = self.recycle_reason(browser)
+            if reason:
+                logger.info(f"Recycling browser: {reason}")
+                browser.quit()
+                continue
+            if not browser.is_healthy():
+                browser.quit()
+                continue
+            logger.debug(f"Reusing warm browser (queries={browser.query_count}, age={browser.age:.0f}s)")
+            return browser, True
+
+        logger.debug("Starting cold browser")
+        return ManagedBrowser(build_chrome_driver()), False
+
+    def release(self, browser, healthy=True):
+        """Hand a browser back for reuse, or quit it if it is unhealthy or expired"""
+        if not healthy:
+            browser.quit()
+            return
+        reason = self.recycle_reason(browser)
+        if reason:
+            logger.info(f"Recycling browser: {reason}")
+            browser.quit()
+            return
+        with self._lock:
+            if len(self._idle) < self.settings['max_idle']:
+                self._idle.append(browser)
+                return
+        browser.quit()
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for browser in idle:
+            browser.quit()
+
+
+browser_manager = BrowserManager()
+atexit.register(browser_manager.shutdown)
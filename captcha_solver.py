@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait as wait_futures
+import requests
+from loguru import logger
+
+# Solver settings, overridable from the `captcha` section of config.yaml
+DEFAULT_CAPTCHA_SETTINGS = {
+    'base_url': os.getenv('TWOCAPTCHA_BASE_URL', 'https://2captcha.com'),
+    'initial_delay_seconds': 5.0,   # reCAPTCHA is never ready sooner than this
+    'poll_interval_seconds': 2.0,
+    'max_poll_interval_seconds': 10.0,
+    'backoff': 1.5,
+    'timeout_seconds': 150.0,
+    'max_workers': 4,
+    'cost_per_solve': 0.003,        # USD, used for the per-batch cost report
+    'pingback_url': os.getenv('TWOCAPTCHA_PINGBACK_URL', ''),
+}
+
+NOT_READY = 'CAPCHA_NOT_READY'
+
+
+class CaptchaError(Exception):
+    pass
+
+
+class CaptchaStats:
+    """Solve latency and cost for one batch"""
+
+    def __init__(self, cost_per_solve=0.0):
+        self.cost_per_solve = cost_per_solve
+        self.submitted = 0
+        self.solved = 0
+        self.failed = 0
+        self.solve_ms = []
+        self._lock = threading.Lock()
+
+    def mark_submitted(self):
+        with self._lock:
+            self.submitted += 1
+
+    def record(self, solved, elapsed):
+        with self._lock:
+            if solved:
+                self.solved += 1
+            else:
+                self.failed += 1
+            self.solve_ms.append(round(elapsed * 1000))
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'solved': self.solved,
+                'failed': self.failed,
+                'solve_ms': list(self.solve_ms),
+                'cost': round(self.submitted * self.cost_per_solve, 5),
+            }
+
+
+class CaptchaSolver:
+    """
+    Non-blocking 2captcha client. `submit` returns a Future right away; a small
+    worker pool polls with backoff, and a pingback can resolve the job earlier
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_CAPTCHA_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def configure(self, settings=None):
+        """Apply the `captcha` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value not in (None, ''):
+                self.settings[key] = value
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=int(self.settings['max_workers']),
+                    thread_name_prefix='captcha'
+                )
+            return self._executor
+
+    def _api_key(self):
+        api_key = os.getenv('TWOCAPTCHA_API_KEY')
+        if not api_key:
+            raise CaptchaError('TWOCAPTCHA_API_KEY is not set')
+        return api_key
+
+    def _submit_job(self, site_key, data_s, url):
+        params = {
+            'key': self._api_key(),
+            'method': 'userrecaptcha',
+            'googlekey': site_key,
+            'pageurl': url,
+            'json': 1,
+        }
+        if data_s:
+            params['data-s'] = data_s
+        if self.settings['pingback_url']:
+            params['pingback'] = self.settings['pingback_url']
+        response = requests.post(f"{self.settings['base_url'].rstrip('/')}/in.php", data=params, timeout=30)
+        payload = response.json()
+        if payload.get('status') != 1:
+            raise CaptchaError(f"Submit failed: {payload.get('request')}")
+        return str(payload['request'])
+
+    def _fetch_result(self, captcha_id):
+        response = requests.get(
+            f"{self.settings['base_url'].rstrip('/')}/res.php",
+            params={'key': self._api_key(), 'action': 'get', 'id': captcha_id, 'json': 1},
+            timeout=30
+        )
+        payload = response.json()
+        if payload.get('status') == 1:
+            return payload['request']
+        if payload.get('request') == NOT_READY:
+            return None
+        raise CaptchaError(f"Result failed: {payload.get('request')}")
+
+    def _poll(self, captcha_id, future, started):
+        """Backoff polling; returns early if a pingback resolved the job or it was cancelled"""
+        delay = float(self.settings['initial_delay_seconds'])
+        interval = float(self.settings['poll_interval_seconds'])
+        deadline = started + float(self.settings['timeout_seconds'])
+        while not future.done():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise CaptchaError(f"Captcha {captcha_id} not solved in {self.settings['timeout_seconds']}s")
+            # Sleep on the future itself so a pingback or cancel wakes us up immediately
+            wait_futures([future], timeout=min(delay, remaining))
+            if future.done():
+                break
+            token = self._fetch_result(captcha_id)
+            if token:
+                return token
+            logger.debug(f"Captcha {captcha_id} not ready, next poll in {interval:.1f}s")
+            delay = interval
+            interval = min(interval * float(self.settings['backoff']), float(self.settings['max_poll_interval_seconds']))
+        return None
+
+    def submit(self, site_key, data_s, url, stats=None):
+        """Start solving a reCAPTCHA and return a Future with the response token"""
+        future = Future()
+        if stats is not None:
+            stats.mark_submitted()
+
+        def run():
+            started = time.time()
+            captcha_id = None
+            token = error = None
+            try:
+                captcha_id = self._submit_job(site_key, data_s, url)
+                logger.debug(f"Captcha solving process started with ID: {captcha_id}")
+                with self._lock:
+                    self._pending[captcha_id] = future
+                token = self._poll(captcha_id, future, started)
+            except Exception as ex:
+                logger.error(f"Error in 2captcha solver: {ex}")
+                error = ex
+            finally:
+                if captcha_id is not None:
+                    with self._lock:
+                        self._pending.pop(captcha_id, None)
+            elapsed = time.time() - started
+            # Polled here, or already delivered by a pingback
+            solved = bool(token) or (future.done() and not future.cancelled() and future.exception() is None)
+            if solved:
+                logger.debug(f"Captcha solved in {elapsed:.2f} seconds")
+            # Recorded before the waiter wakes up, so the batch report counts this solve
+            if stats is not None:
+                stats.record(solved, elapsed)
+            try:
+                if token:
+                    future.set_result(token)
+                elif error is not None:
+                    future.set_exception(error)
+            except InvalidStateError:
+                # Resolved by a pingback or cancelled by the waiter meanwhile
+                pass
+
+        self._pool().submit(run)
+        return future
+
+    def deliver(self, captcha_id, token):
+        """Resolve a pending job from a 2captcha pingback; returns False for unknown ids"""
+        with self._lock:
+            future = self._pending.get(str(captcha_id))
+        if future is None or future.done():
+            return False
+        future.set_result(token)
+        return True
+
+    def wait(self, future, deadline=None):
+        """
+        The token of a submitted solve, or None when it failed or did not come within
+        timeout_seconds or before the deadline (epoch seconds). A job given up on is
+        cancelled, so its worker stops polling
+        """
+        timeout = float(self.settings['timeout_seconds']) + 5
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - time.time()))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Gave up waiting for a captcha token after {timeout:.1f}s")
+            return None
+        except Exception:
+            return None
+
+captcha_solver = CaptchaSolver()
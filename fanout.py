@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from loguru import logger
+
+# Fan-out settings, overridable from the `fanout` section of config.yaml
+DEFAULT_FANOUT_SETTINGS = {
+    'mode': os.getenv('FANOUT_MODE', 'auto'),           # auto | lambda | local
+    'max_parallel': int(os.getenv('FANOUT_MAX_PARALLEL', 8)),
+    'max_shard_size': 50,
+    'shard_budget_seconds': 300,   # estimated work per shard, well inside one worker's timeout
+    'max_retries': 2,              # extra rounds for failed shards and unprocessed queries
+    'auto_threshold': 0,           # fan out batches larger than this without "fanout": true (0 disables)
+    'query_cost_seconds': {'browser': 6.0, 'hybrid': 4.0, 'http': 1.0},
+}
+
+
+def query_string(query_obj):
+    return query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj else str(query_obj)
+
+
+def shard_size(engine, settings):
+    """Distinct SERPs per shard: the shard budget over the engine's estimated cost per query"""
+    costs = settings['query_cost_seconds'] or {}
+    cost = float(costs.get(engine, costs.get('browser', 6.0)) or 1.0)
+    return max(1, min(int(settings['max_shard_size']), int(float(settings['shard_budget_seconds']) // cost)))
+
+
+def shard_positions(queries, positions, engine, settings):
+    """
+    Split batch positions into shards. Repeats of a query stay in one shard so the
+    worker fetches that SERP once and shares it; only distinct queries count towards the size
+    """
+    groups = OrderedDict()
+    for position in positions:
+        groups.setdefault(query_string(queries[position]), []).append(position)
+    size = shard_size(engine, settings)
+    grouped = list(groups.values())
+    return [sorted(p for group in grouped[start:start + size] for p in group)
+            for start in range(0, len(grouped), size)]
+
+
+def shard_results(response, count):
+    """A worker's results as a list of `count` dicts, or None when the shard failed as a whole"""
+    if isinstance(response, dict) and count == 1 and 'query' in response:
+        response = [response]
+    if not isinstance(response, list) or len(response) != count:
+        return None
+    return response
+
+
+def failed_result(query_obj, batch_id, error):
+    return {
+        'success': False,
+        'error': error,
+        'query': query_string(query_obj),
+        'query_id': query_obj.get('query_id') if isinstance(query_obj, dict) else None,
+        'batch_id': batch_id,
+    }
+
+
+class LambdaInvoker:
+    """Runs a shard on another invocation of this function and returns its parsed results"""
+
+    def __init__(self, client, function_name):
+        self.client = client
+        self.function_name = function_name
+
+    def __call__(self, payload):
+        response = self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'body': json.dumps(payload)}).encode('utf-8'),
+        )
+        body = json.loads(response['Payload'].read() or b'null')
+        if response.get('FunctionError'):
+            raise RuntimeError(f"Worker failed: {(body or {}).get('errorMessage', response['FunctionError'])}")
+        if not isinstance(body, dict) or body.get('statusCode') != 200:
+            raise RuntimeError(f"Worker returned {body.get('statusCode') if isinstance(body, dict) else body}: "
+                               f"{body.get('body') if isinstance(body, dict) else ''}")
+        return json.loads(body['body'])
+
+
+class FanoutCoordinator:
+    """
+    Splits a large batch into shards sized by engine cost, runs them on parallel
+    workers (Lambda invocations or local processes), retries failed shards and
+    merges the results back into the order of the original queries
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_FANOUT_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+
+    def configure(self, settings=None):
+        """Apply the `fanout` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    def wants(self, payload):
+        """True when a request should be coordinated rather than searched in this process"""
+        if payload.get('fanout') is not None:
+            return bool(payload['fanout'])
+        threshold = int(self.settings['auto_threshold'] or 0)
+        return threshold > 0 and len(payload.get('queries') or []) > threshold
+
+    def mode(self, function_name):
+        if self.settings['mode'] in ('lambda', 'local'):
+            return self.settings['mode']
+        return 'lambda' if function_name else 'local'
+
+    def run(self, payload, invoke, processes=False, deadline=None):
+        """
+        Search payload['queries'] in shards. invoke(shard_payload) returns a worker's results;
+        processes=True runs it on a process pool (it must then be picklable), otherwise on threads.
+        Shards still running at the deadline (epoch seconds) come back unprocessed
+        """
+        queries = payload.get('queries') or []
+        engine = payload.get('engine', 'browser')
+        batch_id = payload.get('batch_id')
+        results = [None] * len(queries)
+        attempts = [0] * len(queries)
+        pending = list(range(len(queries)))
+        errors = {}
+        workers = max(1, int(self.settings['max_parallel']))
+
+        if processes:
+            # spawn: each worker owns its Chrome; forking a process with live drivers is unsafe
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for attempt in range(int(self.settings['max_retries']) + 1):
+                if not pending:
+                    break
+                if deadline is not None and time.time() >= deadline:
+                    break
+                shards = shard_positions(queries, pending, engine, self.settings)
+                pending_failed = []
+                logger.info(f"Fan-out round {attempt + 1}: {len(pending)} queries in {len(shards)} shards")
+                futures = {}
+                for index, positions in enumerate(shards):
+                    shard_payload = dict(payload, queries=[queries[p] for p in positions], fanout=False)
+                    try:
+                        futures[executor.submit(invoke, shard_payload)] = (index, positions)
+                    except Exception as ex:
+                        # e.g. a broken process pool; the shard counts as a failed attempt
+                        logger.error(f"Could not start shard {index}: {ex}")
+                        for p in positions:
+                            attempts[p] += 1
+                            errors[p] = str(ex)
+                        pending_failed.extend(positions)
+                timeout = None if deadline is None else max(0, deadline - time.time())
+                done, not_done = wait(futures, timeout=timeout)
+
+                pending = pending_failed
+                for future in not_done:
+                    future.cancel()
+                for future, (index, positions) in futures.items():
+                    for p in positions:
+                        attempts[p] += 1
+                    if future not in done:
+                        for p in positions:
+                            errors[p] = None
+                        continue
+                    try:
+                        shard = shard_results(future.result(), len(positions))
+                        if shard is None:
+                            raise RuntimeError('Worker returned no per-query results')
+                    except Exception as ex:
+                        logger.error(f"Shard {index} failed: {ex}")
+                        for p in positions:
+                            errors[p] = str(ex)
+                        pending.extend(positions)
+                        continue
+                    for p, result in zip(positions, shard):
+                        if isinstance(result, dict):
+                            result.pop('unprocessed_query_ids', None)
+                            result['fanout'] = {'shard': index, 'attempts': attempts[p]}
+                        results[p] = result
+                        # A worker that ran out of time hands its leftovers back for another round
+                        if isinstance(result, dict) and result.get('unprocessed'):
+                            pending.append(p)
+                pending.sort()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for p, query_obj in enumerate(queries):
+            if results[p] is not None:
+                continue
+            if errors.get(p) is None:
+                # Never ran, or still running when the deadline came
+                results[p] = failed_result(query_obj, batch_id, 'Deadline reached before the shard finished')
+                results[p]['unprocessed'] = True
+            else:
+                results[p] = failed_result(query_obj, batch_id,
+                                           f"Shard failed after {attempts[p]} attempts: {errors[p]}")
+            results[p]['fanout'] = {'shard': None, 'attempts': attempts[p]}
+
+        unprocessed_ids = [r.get('query_id') for r in results if isinstance(r, dict) and r.get('unprocessed')]
+        if unprocessed_ids:
+            for result in results:
+                if isinstance(result, dict):
+                    result['unprocessed_query_ids'] = unprocessed_ids
+        return results
+
+
+fanout_coordinator = FanoutCoordinator()
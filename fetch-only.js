@@ -0,0 +1,23 @@
+// Hybrid engine: the page only fetches each SERP and hands the raw HTML back;
+// the config.yaml selectors are applied in Python (parse_pool.py)
+async function fetchRawSerps(queries) {
+    return await Promise.all(queries.map(async (queryObj) => {
+        const fetchStarted = performance.now();
+        try {
+            const res = await fetch(queryObj.url);
+            const html = await res.text();
+            const fetchMs = Math.round(performance.now() - fetchStarted);
+            // Block pages are never shipped to the parse pool
+            const blocked = blockedPage(res, html, queryObj.query);
+            if (blocked) {
+                return blocked;
+            }
+            if (!res.ok) {
+                return { success: false, query: queryObj.query, error: `HTTP error! status: ${res.status}` };
+            }
+            return { success: true, query: queryObj.query, raw_html: html, timings: { fetch_ms: fetchMs } };
+        } catch (error) {
+            return { success: false, query: queryObj.query, error: error.message };
+        }
+    }));
+}
@@ -36,10 +36,15 @@ async function fetchSearchHTML(query, userAgent = "Mozilla/5.0 (Windows NT 10.0;
                 'User-Agent': userAgent
             }
         });
+        const html = await response.text();
+        const blocked = blockedPage(response, html, query);
+        if (blocked) {
+            throw new BlockedPageError(blocked);
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return await response.text();
+        return html;
     } catch (error) {
         console.error('Error fetching search HTML:', error);
         throw error;
@@ -56,33 +61,59 @@ function getUuleParameter(locationName) {
     return `w+CAIQICI${btoa(lengthByte + locationName)}`;
 }
 
+// Scan the raw HTML once for the last <title> and the first result count match.
+// Both markers are lookaheads, so the scan stops at each one without consuming it
+// and a count inside a <title> span is still found
+function scanRawHtml(html, countRegex) {
+    const scan = { title: '', resultCount: null };
+    const scanner = new RegExp('(?=<title>(.*?)<\\/title>)' + (countRegex ? `|(?=(?:${countRegex}))` : ''), 'g');
+    // Re-run at a stop to read the count groups with their own numbering
+    const countAt = countRegex ? new RegExp(countRegex, 'y') : null;
+    let titleEnd = 0;
+    let match;
+    while ((match = scanner.exec(html)) !== null) {
+        const at = match.index;
+        // Title matches do not overlap, like a plain /<title>(.*?)<\/title>/g loop
+        if (match[1] !== undefined && at >= titleEnd) {
+            scan.title = match[1].trim();
+            titleEnd = at + '<title></title>'.length + match[1].length;
+        }
+        if (countAt && scan.resultCount === null) {
+            countAt.lastIndex = at;
+            const countMatch = countAt.exec(html);
+            if (countMatch) {
+                scan.resultCount = countMatch[1];
+            }
+        }
+        scanner.lastIndex = at + 1;
+    }
+    return scan;
+}
+
 // Extract <title> content from HTML using configuration
-function extractTitleWithConfig(html, config) {
+function extractTitleWithConfig(html, config, doc = null, scan = null) {
     const titleConfig = config.google_images?.global?.page_title;
     if (titleConfig?.selector) {
-        const parser = new DOMParser();
-        const doc = parser.parseFromString(html, "text/html");
+        if (!doc) {
+            const parser = new DOMParser();
+            doc = parser.parseFromString(html, "text/html");
+        }
         const element = doc.querySelector(titleConfig.selector);
         return element ? element[titleConfig.attribute || 'textContent'].trim() : titleConfig.fallback || 'N/A';
     }
 
     // Fallback to regex
-    const titleRegex = /<title>(.*?)<\/title>/g;
-    let match, title = "";
-    while ((match = titleRegex.exec(html)) !== null) {
-        title = match[1].trim();
-    }
+    const title = (scan || scanRawHtml(html)).title;
     return title || 'N/A';
 }
 
-// Extract result count from the parsed DOM using configuration
-function extractResultCountWithConfig(html, config) {
+// Extract result count from the raw HTML using configuration
+function extractResultCountWithConfig(html, config, scan = null) {
     const resultCountConfig = config.google_images?.global?.result_count;
     if (resultCountConfig?.regex) {
-        const resultCountRegex = new RegExp(resultCountConfig.regex);
-        const resultCountMatch = resultCountRegex.exec(html);
-        if (resultCountMatch) {
-            return resultCountMatch[1].replace(/,/g, '');
+        const resultCount = (scan || scanRawHtml(html, resultCountConfig.regex)).resultCount;
+        if (resultCount !== null && resultCount !== undefined) {
+            return resultCount.replace(/,/g, '');
         }
     }
 
@@ -127,6 +158,39 @@ function extractDomainFromUrl(url) {
     }
 }
 
+// Execution plans compiled once per config object: fields grouped by selector
+const compiledImagePlans = new WeakMap();
+
+function compileImagePlan(imageConfig) {
+    let plan = compiledImagePlans.get(imageConfig);
+    if (plan) return plan;
+
+    const selectors = [];
+    const fields = Object.entries(imageConfig.fields).map(([fieldName, fieldConfig]) => {
+        // Position never reads its selector
+        if (fieldName === 'position' || !fieldConfig.selector) return [fieldName, fieldConfig, null];
+        let slot = selectors.indexOf(fieldConfig.selector);
+        if (slot === -1) {
+            slot = selectors.push(fieldConfig.selector) - 1;
+        }
+        return [fieldName, fieldConfig, slot];
+    });
+
+    plan = { selectors, fields };
+    compiledImagePlans.set(imageConfig, plan);
+    return plan;
+}
+
+// Look up a selector on a block, treating an invalid selector like a missing element
+function safeQuery(element, selector) {
+    try {
+        return element.querySelector(selector);
+    } catch (error) {
+        console.error(`Error extracting ${selector}:`, error);
+        return null;
+    }
+}
+
 // Image search results extraction using YAML configuration
 function extractImageResultsWithConfig(doc, config) {
     const imageConfig = config.google_images;
@@ -136,25 +200,26 @@ function extractImageResultsWithConfig(doc, config) {
     }
 
     const containerSelector = imageConfig.container;
-    const fieldsConfig = imageConfig.fields;
+    const plan = compileImagePlan(imageConfig);
     const imageBlocks = doc.querySelectorAll(containerSelector);
     const imagesData = [];
 
     imageBlocks.forEach((block, index) => {
         const imageData = {};
+        // One lookup per distinct selector on this block
+        const elements = plan.selectors.map(selector => safeQuery(block, selector));
 
         // Process each field according to configuration
-        Object.entries(fieldsConfig).forEach(([fieldName, fieldConfig]) => {
+        plan.fields.forEach(([fieldName, fieldConfig, slot]) => {
             let value = fieldConfig.fallback || 'N/A';
 
             try {
                 if (fieldName === 'position') {
                     // Position is calculated based on index
                     value = index + 1;
-                } else if (fieldConfig.selector) {
-                    // Find element using selector
-                    const element = block.querySelector(fieldConfig.selector);
-                    value = safeGetElementValue(element, fieldConfig.attribute, fieldConfig.fallback);
+                } else if (slot !== null) {
+                    // Element looked up for this block's selector
+                    value = safeGetElementValue(elements[slot], fieldConfig.attribute, fieldConfig.fallback);
                 } else if (fieldConfig.attribute === 'position') {
                     // Handle position attribute
                     value = index + 1;
@@ -228,17 +293,21 @@ async function processQueryWithConfig(query, serpOptions = {}, config) {
     try {
         const queryString = typeof query === 'object' && query !== null ? query.query : query;
         const queryId = typeof query === 'object' && query !== null ? query.query_id : undefined;
+        const fetchStarted = performance.now();
         const html = await fetchSearchHTML(queryString, undefined, serpOptions);
+        const fetchMs = performance.now() - fetchStarted;
+        // Parse and scan the SERP once; every extractor shares the results
         const parser = new DOMParser();
         const doc = parser.parseFromString(html, "text/html");
+        const scan = scanRawHtml(html, config.google_images?.global?.result_count?.regex);
 
         // Extract all components using configuration
         const rawResult = {
             success: true,
             query: queryString,
             query_id: queryId,
-            title: extractTitleWithConfig(html, config),
-            serp_result_count: extractResultCountWithConfig(html, config),
+            title: extractTitleWithConfig(html, config, doc, scan),
+            serp_result_count: extractResultCountWithConfig(html, config, scan),
             image_results: extractImageResultsWithConfig(doc, config)
         };
 
@@ -257,12 +326,20 @@ async function processQueryWithConfig(query, serpOptions = {}, config) {
                 error: true,
                 query: queryString,
                 query_id: queryId,
-                message: "No meaningful content found in result, Request limit reached out"
+                message: "No meaningful content found in result, Request limit reached out",
+                ...(window.__serpKeepHtml && { raw_html: html })
             };
         }
 
+        if (window.__serpKeepHtml) {
+            cleanedResult.raw_html = html;
+        }
+        cleanedResult.timings = { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) };
         return cleanedResult;
     } catch (error) {
+        if (error instanceof BlockedPageError) {
+            return { ...error.result, query_id: typeof query === 'object' && query !== null ? query.query_id : undefined };
+        }
         return {
             success: false,
             query: typeof query === 'object' && query !== null ? query.query : query,
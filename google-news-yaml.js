@@ -2,13 +2,15 @@
 
 // Utility function to safely get attribute or text content
 function safeGetValue(element, selector, attribute, fallback = 'N/A') {
+    const targetElement = selector ? safeQuery(element, selector) : element;
+    if (selector && !targetElement) return fallback;
+    return safeGetValueFrom(targetElement, selector, attribute, fallback);
+}
+
+// Same as safeGetValue for an element that was already looked up
+function safeGetValueFrom(targetElement, selector, attribute, fallback = 'N/A') {
     try {
-        let targetElement = element;
-        
-        if (selector) {
-            targetElement = element.querySelector(selector);
-            if (!targetElement) return fallback;
-        }
+        if (!targetElement) return fallback;
         
         if (attribute === 'textContent') {
             return targetElement.textContent?.trim() || fallback;
@@ -23,6 +25,52 @@ function safeGetValue(element, selector, attribute, fallback = 'N/A') {
     }
 }
 
+// Look up a selector, treating an invalid selector like a missing element
+function safeQuery(element, selector) {
+    try {
+        return element.querySelector(selector);
+    } catch (error) {
+        console.warn(`Error getting value for selector ${selector}:`, error);
+        return null;
+    }
+}
+
+// Execution plans compiled once per fields config object: one slot per distinct selector
+const compiledFieldPlans = new WeakMap();
+
+function compileFieldPlan(fields) {
+    let plan = compiledFieldPlans.get(fields);
+    if (plan) return plan;
+
+    const selectors = [];
+    const slots = {};
+    Object.entries(fields).forEach(([fieldName, fieldConfig]) => {
+        if (!fieldConfig?.selector) return;
+        let slot = selectors.indexOf(fieldConfig.selector);
+        if (slot === -1) {
+            slot = selectors.push(fieldConfig.selector) - 1;
+        }
+        slots[fieldName] = slot;
+    });
+
+    plan = { selectors, slots };
+    compiledFieldPlans.set(fields, plan);
+    return plan;
+}
+
+// Field reader for one container: every distinct selector is looked up once
+function fieldReader(element, fields) {
+    const plan = compileFieldPlan(fields);
+    const elements = plan.selectors.map(selector => safeQuery(element, selector));
+    return fieldName => {
+        const field = fields[fieldName];
+        if (fieldName in plan.slots) {
+            return safeGetValueFrom(elements[plan.slots[fieldName]], field.selector, field.attribute, field.fallback);
+        }
+        return safeGetValue(element, field.selector, field.attribute, field.fallback);
+    };
+}
+
 // Utility function to extract domain from URL
 function extractDomain(url) {
     try {
@@ -86,10 +134,15 @@ async function fetchSearchHTML(query, userAgent = "Mozilla/5.0 (Windows NT 10.0;
                 'User-Agent': userAgent
             }
         });
+        const html = await response.text();
+        const blocked = blockedPage(response, html, query);
+        if (blocked) {
+            throw new BlockedPageError(blocked);
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return await response.text();
+        return html;
     } catch (error) {
         console.error('Error fetching search HTML:', error);
         throw error;
@@ -104,29 +157,52 @@ function getUuleParameter(locationName) {
     return `w+CAIQICI${btoa(lengthByte + locationName)}`;
 }
 
+// Scan the raw HTML once for the last <title> and the first result count match.
+// Both markers are lookaheads, so the scan stops at each one without consuming it
+// and a count inside a <title> span is still found
+function scanRawHtml(html, countRegex) {
+    const scan = { title: '', resultCount: null };
+    const scanner = new RegExp('(?=<title>(.*?)<\\/title>)' + (countRegex ? `|(?=(?:${countRegex}))` : ''), 'g');
+    // Re-run at a stop to read the count groups with their own numbering
+    const countAt = countRegex ? new RegExp(countRegex, 'y') : null;
+    let titleEnd = 0;
+    let match;
+    while ((match = scanner.exec(html)) !== null) {
+        const at = match.index;
+        // Title matches do not overlap, like a plain /<title>(.*?)<\/title>/g loop
+        if (match[1] !== undefined && at >= titleEnd) {
+            scan.title = match[1].trim();
+            titleEnd = at + '<title></title>'.length + match[1].length;
+        }
+        if (countAt && scan.resultCount === null) {
+            countAt.lastIndex = at;
+            const countMatch = countAt.exec(html);
+            if (countMatch) {
+                scan.resultCount = countMatch[1];
+            }
+        }
+        scanner.lastIndex = at + 1;
+    }
+    return scan;
+}
+
 // Extract title from HTML using config
-function extractTitle(html, config) {
+function extractTitle(html, config, scan = null) {
     const titleConfig = config.google_news?.global?.page_title;
     if (!titleConfig) return 'N/A';
-    
-    const titleRegex = /<title>(.*?)<\/title>/g;
-    let match, title = "";
-    while ((match = titleRegex.exec(html)) !== null) {
-        title = match[1].trim();
-    }
+
+    const title = (scan || scanRawHtml(html)).title;
     return title || titleConfig.fallback;
 }
 
 // Extract result count using config
-function extractResultCount(html, config) {
+function extractResultCount(html, config, scan = null) {
     const countConfig = config.google_news?.global?.result_count;
     if (!countConfig) return -1;
-    
-    const resultCountRegex = new RegExp(countConfig.regex);
-    const resultCountMatch = resultCountRegex.exec(html);
-    
-    if (resultCountMatch) {
-        return resultCountMatch[1].replace(/,/g, '');
+
+    const resultCount = (scan || scanRawHtml(html, countConfig.regex)).resultCount;
+    if (resultCount !== null && resultCount !== undefined) {
+        return resultCount.replace(/,/g, '');
     }
     return countConfig.fallback;
 }
@@ -187,25 +263,26 @@ function extractNewsData(doc, config) {
 
         // Extract fields using config
         const fields = newsConfig.fields;
+        const read = fieldReader(newsItem, fields);
         
         // Link
-        result.link = safeGetValue(newsItem, fields.link.selector, fields.link.attribute, fields.link.fallback);
+        result.link = read('link');
 
         // Title
-        result.title = safeGetValue(newsItem, fields.title.selector, fields.title.attribute, fields.title.fallback);
+        result.title = read('title');
 
         // Snippet
-        result.snippet = safeGetValue(newsItem, fields.snippet.selector, fields.snippet.attribute, fields.snippet.fallback);
+        result.snippet = read('snippet');
 
         // Source
-        result.source = safeGetValue(newsItem, fields.source.selector, fields.source.attribute, fields.source.fallback);
+        result.source = read('source');
 
         // Domain
         result.domain = extractDomain(result.link);
 
         // Date and timestamp handling
-        const timestampSec = safeGetValue(newsItem, fields.timestamp.selector, fields.timestamp.attribute, fields.timestamp.fallback);
-        const readableTime = safeGetValue(newsItem, fields.date.selector, fields.date.attribute, fields.date.fallback);
+        const timestampSec = read('timestamp');
+        const readableTime = read('date');
         
         const dateInfo = convertTimestamp(timestampSec);
         result.date = readableTime;
@@ -214,7 +291,7 @@ function extractNewsData(doc, config) {
         result['date-only'] = dateInfo.dateOnly;
 
         // Thumbnail
-        result.thumbnail = safeGetValue(newsItem, fields.thumbnail.selector, fields.thumbnail.attribute, fields.thumbnail.fallback);
+        result.thumbnail = read('thumbnail');
 
         extractedNews.push(result);
     });
@@ -223,36 +300,25 @@ function extractNewsData(doc, config) {
 }
 
 // Extract top stories using config
-function extractTopStories({ doc = null, htmlContent = '' } = {}, config) {
-    // Parse HTML string if no DOM document provided
-    if (!doc && htmlContent) {
-        const parser = new DOMParser();
-        doc = parser.parseFromString(htmlContent, 'text/html');
-    }
-
-    if (!doc) {
-        console.warn("No valid document or HTML content provided.");
-        return [];
-    }
-
+function extractTopStories(doc, config) {
     const topStoriesConfig = config.google_news?.top_stories;
     if (!topStoriesConfig) return [];
 
     const articles = Array.from(doc.querySelectorAll(topStoriesConfig.container));
     const results = articles.map((article, index) => {
-        const fields = topStoriesConfig.fields;
+        const read = fieldReader(article, topStoriesConfig.fields);
         
-        const timestampSec = safeGetValue(article, fields.timestamp.selector, fields.timestamp.attribute, fields.timestamp.fallback);
+        const timestampSec = read('timestamp');
         const dateInfo = convertTimestamp(timestampSec);
 
         return {
             "#": index + 1,
             "Visible": index < 3 ? "true" : "false",
-            "Title": safeGetValue(article, fields.title.selector, fields.title.attribute, fields.title.fallback),
-            "Source": safeGetValue(article, fields.source.selector, fields.source.attribute, fields.source.fallback),
-            "Date": safeGetValue(article, fields.date.selector, fields.date.attribute, fields.date.fallback),
+            "Title": read('title'),
+            "Source": read('source'),
+            "Date": read('date'),
             "UTC Date": dateInfo.dateUtc,
-            "Link": safeGetValue(article, fields.link.selector, fields.link.attribute, fields.link.fallback)
+            "Link": read('link')
         };
     });
 
@@ -264,20 +330,24 @@ async function processQuery(query, serpOptions = {}, config) {
     try {
         const queryString = typeof query === 'object' && query !== null ? query.query : query;
         const queryId = typeof query === 'object' && query !== null ? query.query_id : undefined;
+        const fetchStarted = performance.now();
         const html = await fetchSearchHTML(queryString, undefined, serpOptions);
+        const fetchMs = performance.now() - fetchStarted;
+        // Parse and scan the SERP once; every extractor shares the results
         const parser = new DOMParser();
         const doc = parser.parseFromString(html, "text/html");
+        const scan = scanRawHtml(html, config.google_news?.global?.result_count?.regex);
 
         const rawResult = {
             success: true,
             query: queryString,
             query_id: queryId,
             serpOptions,
-            title: extractTitle(html, config),
-            serp_result_count: extractResultCount(html, config),
+            title: extractTitle(html, config, scan),
+            serp_result_count: extractResultCount(html, config, scan),
             pagination: extractPagination(doc, config),
             news_results: extractNewsData(doc, config),
-            top_stories: extractTopStories({ doc }, config)
+            top_stories: extractTopStories(doc, config)
         };
 
         const cleanedResult = Object.fromEntries(
@@ -295,12 +365,20 @@ async function processQuery(query, serpOptions = {}, config) {
                 error: true,
                 query,
                 serpOptions,
-                message: "No meaningful content found in result, Request limit reached out"
+                message: "No meaningful content found in result, Request limit reached out",
+                ...(window.__serpKeepHtml && { raw_html: html })
             };
         }
 
+        if (window.__serpKeepHtml) {
+            cleanedResult.raw_html = html;
+        }
+        cleanedResult.timings = { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) };
         return cleanedResult;
     } catch (error) {
+        if (error instanceof BlockedPageError) {
+            return { ...error.result, serpOptions };
+        }
         return {
             success: false,
             query,
@@ -38,10 +38,15 @@ async function fetchSearchHTML(query, userAgent = "Mozilla/5.0 (Windows NT 10.0;
                 'User-Agent': userAgent
             }
         });
+        const html = await response.text();
+        const blocked = blockedPage(response, html, query);
+        if (blocked) {
+            throw new BlockedPageError(blocked);
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return await response.text();
+        return html;
     } catch (error) {
         console.error('Error fetching search HTML:', error);
         throw error;
@@ -190,28 +195,49 @@ function getElementValue(element, config, doc = null) {
     }
 }
 
+// Execution plans compiled once per section config object: fields grouped by selector
+const compiledSectionPlans = new WeakMap();
+
+function compileSectionPlan(sectionConfig) {
+    let plan = compiledSectionPlans.get(sectionConfig);
+    if (plan) return plan;
+
+    const selectors = [];
+    const fields = Object.entries(sectionConfig.fields || {}).map(([fieldName, fieldConfig]) => {
+        if (!fieldConfig.selector) return [fieldName, fieldConfig, null];
+        let slot = selectors.indexOf(fieldConfig.selector);
+        if (slot === -1) {
+            slot = selectors.push(fieldConfig.selector) - 1;
+        }
+        return [fieldName, fieldConfig, slot];
+    });
+
+    plan = { selectors, fields };
+    compiledSectionPlans.set(sectionConfig, plan);
+    return plan;
+}
+
 // Extract data based on configuration
 function extractDataWithConfig(doc, sectionConfig, globalConfig = {}) {
     const results = [];
     
     if (!sectionConfig.container) return results;
     
+    const plan = compileSectionPlan(sectionConfig);
     const containers = doc.querySelectorAll(sectionConfig.container);
     
     containers.forEach((container, index) => {
         const item = {};
+        // One lookup per distinct selector on this container
+        const elements = plan.selectors.map(selector => container.querySelector(selector));
         
         // Add position to each item
         item.position = index + 1;
         
         // Process each field
-        Object.entries(sectionConfig.fields || {}).forEach(([fieldName, fieldConfig]) => {
-            let element = container;
-            
-            // Find the specific element if selector is provided
-            if (fieldConfig.selector) {
-                element = container.querySelector(fieldConfig.selector);
-            }
+        plan.fields.forEach(([fieldName, fieldConfig, slot]) => {
+            // The specific element if a selector is provided
+            let element = slot === null ? container : elements[slot];
             
             // Special handling for position attribute
             if (fieldConfig.attribute === 'position') {
@@ -306,20 +332,19 @@ function extractTopStoriesWithConfig(doc, config) {
     const topStoriesConfig = config.google_web?.top_stories;
     if (!topStoriesConfig) return [];
     
+    const plan = compileSectionPlan(topStoriesConfig);
     const articles = Array.from(doc.querySelectorAll(topStoriesConfig.container));
     const results = articles.map((article, index) => {
         const item = {
             "#": index + 1,
             "Visible": index < 3 ? "true" : "false"
         };
+        // One lookup per distinct selector on this article
+        const elements = plan.selectors.map(selector => article.querySelector(selector));
         
         // Process each field
-        Object.entries(topStoriesConfig.fields || {}).forEach(([fieldName, fieldConfig]) => {
-            let element = article;
-            
-            if (fieldConfig.selector) {
-                element = article.querySelector(fieldConfig.selector);
-            }
+        plan.fields.forEach(([fieldName, fieldConfig, slot]) => {
+            const element = slot === null ? article : elements[slot];
             
             let value = getElementValue(element, fieldConfig, doc);
             
@@ -445,7 +470,7 @@ function extractMovieDataWithConfig(doc, config) {
 }
 
 // Extract page title using config
-function extractTitleWithConfig(html, config) {
+function extractTitleWithConfig(html, config, doc = null) {
     const globalConfig = config.google_web?.global?.page_title;
     if (!globalConfig) {
         // Fallback to regex extraction
@@ -457,8 +482,11 @@ function extractTitleWithConfig(html, config) {
         return title;
     }
     
-    const parser = new DOMParser();
-    const doc = parser.parseFromString(html, "text/html");
+    // Reuse the SERP document the caller already parsed
+    if (!doc) {
+        const parser = new DOMParser();
+        doc = parser.parseFromString(html, "text/html");
+    }
     const element = doc.querySelector(globalConfig.selector);
     
     return getElementValue(element, globalConfig, doc);
@@ -494,7 +522,9 @@ async function processQueryWithConfig(query, config) {
         const queryString = typeof query === 'object' && query.query ? query.query : query;
         const queryId = typeof query === 'object' && query.query_id ? query.query_id : null;
         
+        const fetchStarted = performance.now();
         const html = await fetchSearchHTML(queryString);
+        const fetchMs = performance.now() - fetchStarted;
         const parser = new DOMParser();
         const doc = parser.parseFromString(html, "text/html");
 
@@ -502,7 +532,7 @@ async function processQueryWithConfig(query, config) {
             success: true,
             query: queryString, // Use the extracted query string
             query_id: queryId, // Include query_id if available
-            title: extractTitleWithConfig(html, config),
+            title: extractTitleWithConfig(html, config, doc),
             serp_result_count: extractResultCountWithConfig(doc, config),
             organic_results: extractOrganicResultsWithConfig(doc, config),
             local_results: extractLocalResultsWithConfig(doc, config),
@@ -539,14 +569,22 @@ async function processQueryWithConfig(query, config) {
                 error: true,
                 query: queryString,
                 query_id: queryId,
-                message: "No meaningful content found in result, Request limit reached"
+                message: "No meaningful content found in result, Request limit reached",
+                ...(window.__serpKeepHtml && { raw_html: html })
             };
         }
 
+        if (window.__serpKeepHtml) {
+            cleanedResult.raw_html = html;
+        }
+        cleanedResult.timings = { fetch_ms: Math.round(fetchMs), extract_ms: Math.round(performance.now() - fetchStarted - fetchMs) };
         return cleanedResult;
     } catch (error) {
         const queryString = typeof query === 'object' && query.query ? query.query : query;
         const queryId = typeof query === 'object' && query.query_id ? query.query_id : null;
+        if (error instanceof BlockedPageError) {
+            return { ...error.result, query_id: queryId };
+        }
         
         return {
             success: false,
@@ -0,0 +1,243 @@
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:  # blobs fall back to gzip without zstandard
+    zstandard = None
+
+# Archive settings, overridable from the `html_archive` section of config.yaml
+DEFAULT_HTML_ARCHIVE_SETTINGS = {
+    'enabled': False,
+    'backend': os.getenv('HTML_ARCHIVE_BACKEND', 'local'),   # local | s3
+    'directory': os.getenv('HTML_ARCHIVE_DIR', '/tmp/serp-html'),
+    'bucket': os.getenv('HTML_ARCHIVE_BUCKET', ''),
+    'prefix': os.getenv('HTML_ARCHIVE_PREFIX', 'serp-html/'),
+    'endpoint_url': os.getenv('HTML_ARCHIVE_ENDPOINT_URL', ''),  # any S3-compatible store
+    'compression': 'zstd',                                         # zstd | gzip
+    'level': 3,
+    'max_workers': 8,
+}
+
+EXTENSIONS = {'zstd': '.html.zst', 'gzip': '.html.gz'}
+
+
+def html_key(html):
+    """Content address of a SERP"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def blob_name(key, compression):
+    return f"blobs/{key[:2]}/{key}{EXTENSIONS[compression]}"
+
+
+def compress(html, compression, level=3):
+    data = html.encode('utf-8')
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=int(level)).compress(data)
+    return gzip.compress(data, compresslevel=min(9, max(1, int(level))))
+
+
+def decompress(data, name):
+    if name.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise RuntimeError(f"{name} needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data).decode('utf-8')
+    return gzip.decompress(data).decode('utf-8')
+
+
+class LocalStore:
+    """Blobs and manifests as files under one directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, *name.split('/'))
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def put(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see half a blob
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, name):
+        with open(self._path(name), 'rb') as file:
+            return file.read()
+
+    def list(self, prefix):
+        # Walk the deepest complete directory of the prefix, then match the rest by name
+        root = self._path(prefix.rsplit('/', 1)[0]) if '/' in prefix else self.directory
+        names = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                if filename.endswith('.tmp'):
+                    continue
+                name = os.path.relpath(os.path.join(directory, filename), self.directory).replace(os.sep, '/')
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+
+class S3Store:
+    """Blobs and manifests in an S3 bucket; endpoint_url points it at MinIO or another stand-in"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None):
+        import boto3
+        from botocore.exceptions import ClientError
+        self.ClientError = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None)
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + name)
+            return True
+        except self.ClientError:
+            return False
+
+    def put(self, name, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=data)
+
+    def get(self, name):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + name)['Body'].read()
+
+    def list(self, prefix):
+        names = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for item in page.get('Contents', []):
+                names.append(item['Key'][len(self.prefix):])
+        return sorted(names)
+
+
+class HtmlArchive:
+    """
+    Content-addressed store of raw SERP HTML. Each archived batch also writes a
+    manifest (one JSON line per SERP) with what is needed to extract it again
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_HTML_ARCHIVE_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._store = None
+        self._store_settings = None
+
+    def configure(self, settings=None):
+        """Apply the `html_archive` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    @property
+    def enabled(self):
+        return bool(self.settings['enabled'])
+
+    @property
+    def compression(self):
+        if self.settings['compression'] == 'zstd' and zstandard is None:
+            return 'gzip'
+        return self.settings['compression'] if self.settings['compression'] in EXTENSIONS else 'gzip'
+
+    def store(self):
+        current = (self.settings['backend'], self.settings['directory'], self.settings['bucket'],
+                   self.settings['prefix'], self.settings['endpoint_url'])
+        if self._store is None or self._store_settings != current:
+            if self.settings['backend'] == 's3':
+                if not self.settings['bucket']:
+                    raise ValueError('html_archive.bucket is required for the s3 backend')
+                self._store = S3Store(self.settings['bucket'], self.settings['prefix'], self.settings['endpoint_url'])
+            else:
+                self._store = LocalStore(self.settings['directory'])
+            self._store_settings = current
+        return self._store
+
+    def put_html(self, html):
+        """Store a SERP once and return its key"""
+        key = html_key(html)
+        store = self.store()
+        name = blob_name(key, self.compression)
+        if not store.exists(name):
+            store.put(name, compress(html, self.compression, self.settings['level']))
+        return key
+
+    def get_html(self, key):
+        store = self.store()
+        for compression in EXTENSIONS:
+            name = blob_name(key, compression)
+            if store.exists(name):
+                return decompress(store.get(name), name)
+        raise KeyError(f"No archived HTML for {key}")
+
+    def write_manifest(self, entries, batch_id=None):
+        now = time.gmtime()
+        label = re.sub(r'[^A-Za-z0-9_.-]', '_', str(batch_id or 'batch'))[:64]
+        name = (f"manifests/{time.strftime('%Y-%m-%d', now)}/"
+                f"{time.strftime('%H%M%S', now)}-{label}-{uuid.uuid4().hex[:8]}.jsonl")
+        data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+        self.store().put(name, data)
+        return name
+
+    def manifests(self, prefix=''):
+        """Manifest names, optionally limited to a day (`2026-10-17`) or any longer prefix"""
+        return [name for name in self.store().list(f"manifests/{prefix}") if name.endswith('.jsonl')]
+
+    def read_manifest(self, name):
+        return [json.loads(line) for line in self.store().get(name).decode('utf-8').splitlines() if line.strip()]
+
+    def archive_results(self, results, queries, context):
+        """
+        Move the `raw_html` the engines attached to each result into the archive,
+        stamp `html_archive` on the result and write the batch manifest.
+        `results` and `queries` are parallel lists; context is common manifest data
+        """
+        pending = []
+        for query_obj, result in zip(queries, results):
+            if not isinstance(result, dict):
+                continue
+            html = result.pop('raw_html', None)
+            if html:
+                pending.append((query_obj, result, html))
+        if not pending:
+            return None
+
+        try:
+            workers = max(1, min(int(self.settings['max_workers']), len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                keys = list(executor.map(lambda item: self.put_html(item[2]), pending))
+            entries = []
+            fetched_at = time.time()
+            for (query_obj, result, html), key in zip(pending, keys):
+                is_object = isinstance(query_obj, dict)
+                entries.append(dict(
+                    context,
+                    key=key,
+                    query=query_obj['query'] if is_object and 'query' in query_obj else str(query_obj),
+                    query_id=query_obj.get('query_id') if is_object else None,
+                    success=result.get('success') is True,
+                    fetched_at=fetched_at,
+                ))
+                result['html_archive'] = {'key': key, 'bytes': len(html)}
+            manifest = self.write_manifest(entries, context.get('batch_id'))
+            logger.debug(f"Archived {len(entries)} SERPs in {manifest}")
+            return manifest
+        except Exception as ex:
+            logger.error(f"HTML archive failed: {ex}")
+            return None
+
+
+html_archive = HtmlArchive()
@@ -0,0 +1,1123 @@
+import re
+import json
+import base64
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from urllib.parse import urlencode, urljoin, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from block_detector import block_detector
+from throttle import search_engine
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    from cssselect import HTMLTranslator
+except ImportError:  # the browser engine does not need a Python HTML parser
+    lxml_html = None
+
+# Pages the browser engine fetches from; relative links resolve against them
+BING_ORIGIN = "https://www.bing.com/search?q=botxbyte+company+in+rajkot"
+GOOGLE_ORIGIN = "https://www.google.com/search?q=botxbyte+company+in+rajkot"
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
+)
+
+DEFAULT_HTTP_SETTINGS = {
+    'pool_size': 10,
+    'max_workers': 8,
+    'timeout_seconds': 20,
+    'user_agent': DEFAULT_USER_AGENT,
+}
+
+# Same fallback the JS extractors use when a field has no usable value
+NA = 'N/A'
+
+
+# ---------------------------------------------------------------------------
+# Pooled keep-alive HTTP client
+# ---------------------------------------------------------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(settings):
+    """Module-level requests session so keep-alive connections survive warm invocations"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=int(settings['pool_size']),
+                pool_maxsize=int(settings['pool_size'])
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'User-Agent': settings['user_agent'],
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+            })
+            _session = session
+        return _session
+
+
+def fetch_page(url, settings, traffic=None, timeout=None):
+    """
+    GET a SERP and return (status, final_url, html) whatever the status.
+    A TrafficArchive records the response, or in replay mode serves it instead of the network.
+    timeout overrides settings['timeout_seconds'] (e.g. when the invocation deadline is closer)
+    """
+    if traffic is not None and not traffic.recording:
+        entry = traffic.replay(url)
+        if entry is None:
+            raise RuntimeError("HTTP error! status: 504 (not in traffic archive)")
+        return entry['status'], url, entry['body']
+    started = time.time()
+    timeout = float(settings['timeout_seconds']) if timeout is None else timeout
+    response = get_session(settings).get(url, timeout=timeout)
+    status, text = response.status_code, response.text
+    if traffic is not None:
+        traffic.record(url, 'GET', status, dict(response.headers), text, started * 1000,
+                       (time.time() - started) * 1000)
+    return status, response.url, text
+
+
+def fetch_html(url, settings, traffic=None, timeout=None):
+    """GET a SERP and return its HTML, raising on non-2xx like the JS fetch helpers"""
+    status, _, text = fetch_page(url, settings, traffic, timeout)
+    if status >= 400:
+        raise RuntimeError(f"HTTP error! status: {status}")
+    return text
+
+
+# ---------------------------------------------------------------------------
+# DOM helpers mirroring the browser APIs used by the *-yaml.js extractors
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=512)
+def _compile_selector(selector):
+    # `descendant::` keeps querySelector semantics: the element itself never matches
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix='descendant::'))
+
+
+def query_selector_all(node, selector):
+    if node is None or not selector:
+        return []
+    try:
+        return _compile_selector(selector)(node)
+    except Exception as ex:
+        logger.warning(f"Invalid selector {selector}: {ex}")
+        return []
+
+
+def query_selector(node, selector):
+    matches = query_selector_all(node, selector)
+    return matches[0] if matches else None
+
+
+def parse_document(html_text):
+    if lxml_html is None:
+        raise RuntimeError("lxml and cssselect are required for the http engine")
+    try:
+        return lxml_html.document_fromstring(html_text or '<html></html>')
+    except (etree.ParserError, ValueError):
+        return lxml_html.document_fromstring('<html></html>')
+
+
+def text_content(element):
+    return element.text_content() if element is not None else ''
+
+
+def inner_html(element):
+    if element is None:
+        return ''
+    parts = [element.text or '']
+    parts.extend(etree.tostring(child, encoding='unicode', method='html') for child in element)
+    return ''.join(parts)
+
+
+def closest(element, tag):
+    while element is not None:
+        if isinstance(element.tag, str) and element.tag.lower() == tag:
+            return element
+        element = element.getparent()
+    return None
+
+
+def has_class(element, class_name):
+    return class_name in (element.get('class') or '').split()
+
+
+def url_property(element, attribute, base_url):
+    """Emulate element.href / element.src: resolved URL, '' or None when unsupported"""
+    tags = {
+        'href': ('a', 'area', 'link', 'base'),
+        'src': ('img', 'script', 'iframe', 'source', 'video', 'audio', 'input', 'embed', 'track'),
+    }
+    if element is None or not isinstance(element.tag, str) or element.tag.lower() not in tags[attribute]:
+        return None
+    value = element.get(attribute)
+    if value is None:
+        return ''
+    return urljoin(base_url, value.strip())
+
+
+def url_hostname(url):
+    """new URL(url).hostname, raising ValueError where the URL constructor would throw"""
+    parts = urlsplit(url or '')
+    if not parts.scheme or (parts.scheme in ('http', 'https') and not parts.netloc):
+        raise ValueError(f"Invalid URL: {url}")
+    return parts.hostname or ''
+
+
+def js_parse_int(value):
+    """parseInt(value, 10); None stands in for NaN (serialised as null)"""
+    match = re.match(r'\s*([+-]?\d+)', str(value)) if value is not None else None
+    return int(match.group(1)) if match else None
+
+
+def js_iso_string(moment):
+    moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+
+def iso_from_epoch_seconds(value):
+    """new Date(parseInt(value) * 1000).toISOString(), None when it would throw"""
+    seconds = js_parse_int(value)
+    if seconds is None:
+        return None
+    try:
+        return js_iso_string(datetime.fromtimestamp(seconds, tz=timezone.utc))
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def last_title(html_text):
+    title = ''
+    for match in re.finditer(r'<title>(.*?)</title>', html_text):
+        title = match.group(1).strip()
+    return title
+
+
+def drop_empty(result, drop_empty_objects=False):
+    cleaned = {}
+    for key, value in result.items():
+        if value is None or (isinstance(value, list) and len(value) == 0):
+            continue
+        if drop_empty_objects and isinstance(value, dict) and len(value) == 0:
+            continue
+        cleaned[key] = value
+    return cleaned
+
+
+def query_parts(query_obj):
+    if isinstance(query_obj, dict):
+        return query_obj.get('query'), query_obj.get('query_id')
+    return query_obj, None
+
+
+# ---------------------------------------------------------------------------
+# Bing News (bing-news-yaml.js)
+# ---------------------------------------------------------------------------
+
+RELATIVE_TIME_PATTERNS = [
+    (re.compile(r'(\d+)\s*h(?:our)?s?\s*ago', re.I), 'hours', None),
+    (re.compile(r'(\d+)\s*h$', re.I), 'hours', None),
+    (re.compile(r'(\d+)\s*hr?s?\s*ago', re.I), 'hours', None),
+    (re.compile(r'(\d+)\s*m(?:in)?(?:ute)?s?\s*ago', re.I), 'minutes', None),
+    (re.compile(r'(\d+)\s*m$', re.I), 'minutes', None),
+    (re.compile(r'(\d+)\s*min?s?\s*ago', re.I), 'minutes', None),
+    (re.compile(r'(\d+)\s*d(?:ay)?s?\s*ago', re.I), 'days', None),
+    (re.compile(r'(\d+)\s*d$', re.I), 'days', None),
+    (re.compile(r'just\s+now', re.I), 'minutes', 0),
+    (re.compile(r'a\s+few\s+minutes?\s+ago', re.I), 'minutes', 2),
+    (re.compile(r'an?\s+hour\s+ago', re.I), 'hours', 1),
+    (re.compile(r'a\s+day\s+ago', re.I), 'days', 1),
+    (re.compile(r'yesterday', re.I), 'days', 1),
+    (re.compile(r'today', re.I), 'hours', 0),
+]
+
+
+def convert_relative_time_to_utc(time_string, time_patterns=None, now=None):
+    if not time_string or time_string == NA:
+        return NA
+    now = now or datetime.now(timezone.utc)
+    clean = time_string.lower().strip()
+
+    candidates = list(RELATIVE_TIME_PATTERNS)
+    for pattern in time_patterns or []:
+        try:
+            candidates.append((re.compile(pattern['pattern'], re.I), pattern.get('type'), None))
+        except (re.error, KeyError, TypeError) as ex:
+            logger.warning(f"Error with pattern {pattern}: {ex}")
+
+    for regex, unit, fixed in candidates:
+        match = regex.search(clean)
+        if not match:
+            continue
+        value = fixed if fixed is not None else int(match.group(1))
+        offset = {
+            'hours': timedelta(hours=value),
+            'minutes': timedelta(minutes=value),
+            'days': timedelta(days=value),
+        }.get(unit, timedelta(0))
+        return js_iso_string(now - offset)
+    return NA
+
+
+def bing_safe_extract(element, selector, attribute='textContent', fallback=NA):
+    target = element if selector is None else query_selector(element, selector)
+    if target is None:
+        return fallback
+    if attribute == 'textContent':
+        return text_content(target).strip()
+    if attribute == 'innerHTML':
+        return inner_html(target).strip()
+    return target.get(attribute) or fallback
+
+
+def extract_bing_news(html_text, query_obj, config, cc=None, qft=None):
+    news_config = config['bing_news']
+    processing = config.get('processing') or {}
+    doc = parse_document(html_text)
+    query, _ = query_parts(query_obj)
+
+    news_results = []
+    for index, card in enumerate(query_selector_all(doc, news_config['container'])):
+        news = {'position': index + 1}
+        for field_name, field_config in news_config['fields'].items():
+            if field_config.get('selector') is None and field_config.get('attribute'):
+                value = card.get(field_config['attribute'])
+                if not value and field_config.get('fallback_attribute'):
+                    value = card.get(field_config['fallback_attribute'])
+                news[field_name] = value or field_config.get('fallback')
+                if field_name == 'domain_url' and value and value != NA and processing.get('domain_extraction'):
+                    try:
+                        news['domain'] = url_hostname(value)
+                    except ValueError:
+                        news['domain'] = field_config.get('fallback')
+            else:
+                news[field_name] = bing_safe_extract(
+                    card,
+                    field_config.get('selector'),
+                    field_config.get('attribute', 'textContent'),
+                    field_config.get('fallback', NA)
+                )
+
+        if news.get('time') and news['time'] != NA:
+            news['dateUTC'] = convert_relative_time_to_utc(news['time'], processing.get('time_patterns'))
+        else:
+            news['dateUTC'] = NA
+        news_results.append(news)
+
+    global_data = {}
+    for key, global_config in (news_config.get('global') or {}).items():
+        if global_config.get('regex'):
+            body_html = inner_html(query_selector(doc, 'body'))
+            match = re.search(global_config['regex'], body_html)
+            global_data[key] = match.group(1).replace(',', '') if match else global_config.get('fallback')
+        else:
+            global_data[key] = bing_safe_extract(
+                doc,
+                global_config.get('selector'),
+                global_config.get('attribute', 'textContent'),
+                global_config.get('fallback', NA)
+            )
+
+    return {
+        'success': True,
+        'query': query,
+        'title': global_data.get('page_title'),
+        'news_results': news_results,
+        'result_count': global_data.get('result_count')
+    }
+
+
+# ---------------------------------------------------------------------------
+# Bing Images (bing-img-yaml.js)
+# ---------------------------------------------------------------------------
+
+def extract_bing_images(html_text, query_obj, config, cc=None, qft=None):
+    images_config = config['bing_images']
+    doc = parse_document(html_text)
+    query, query_id = query_parts(query_obj)
+
+    image_results = []
+    for index, item in enumerate(query_selector_all(doc, images_config['container'])):
+        data = {}
+        for field_name, conf in images_config['fields'].items():
+            value = conf.get('fallback') or NA
+            if conf.get('selector'):
+                element = query_selector(item, conf['selector'])
+                if element is not None:
+                    if conf.get('attribute') == 'm' and conf.get('parse_json'):
+                        try:
+                            meta = element.get('m')
+                            meta_data = json.loads(meta.replace('&quot;', '"')) if meta else {}
+                            value = meta_data.get(conf.get('json_key')) or conf.get('fallback')
+                        except (ValueError, AttributeError):
+                            value = conf.get('fallback')
+                    elif conf.get('parse_domain'):
+                        try:
+                            href = element.get(conf.get('attribute'))
+                            value = url_hostname(href) if href else conf.get('fallback')
+                        except ValueError:
+                            value = conf.get('fallback')
+                    else:
+                        value = element.get(conf.get('attribute')) or text_content(element) or conf.get('fallback')
+            data[field_name] = value
+        data['position'] = index + 1
+        image_results.append(data)
+
+    global_config = images_config['global']
+    title_element = query_selector(doc, global_config['page_title']['selector'])
+    if title_element is not None:
+        title = title_element.get(global_config['page_title'].get('attribute')) or text_content(title_element)
+    else:
+        title = global_config['page_title'].get('fallback')
+
+    match = re.search(global_config['result_count']['regex'], html_text)
+    result_count = match.group(1).replace(',', '') if match else global_config['result_count'].get('fallback')
+
+    return {
+        'success': True,
+        'query': query,
+        'query_id': query_id,
+        'title': title,
+        'result_count': result_count,
+        'image_results': image_results
+    }
+
+
+# ---------------------------------------------------------------------------
+# Bing Web (bing-web-yaml.js)
+# ---------------------------------------------------------------------------
+
+BING_WEB_SECTIONS = ['top_stories', 'organic_results', 'pagination', 'related_searches',
+                     'related_questions', 'video_results', 'cast_data']
+
+
+def bing_web_value(element, field_config, index=0, base_url=BING_ORIGIN):
+    if element is None or not field_config:
+        return (field_config or {}).get('fallback') or NA
+
+    selector = field_config.get('selector')
+    attribute = field_config.get('attribute')
+    fallback = field_config.get('fallback')
+    default = fallback or NA
+
+    target = element
+    if selector:
+        target = query_selector(element, selector)
+        if target is None:
+            return default
+
+    value = default
+    if attribute == 'position':
+        value = index + 1
+    elif attribute == 'textContent':
+        value = text_content(target).strip() or default
+    elif attribute == 'href':
+        value = url_property(target, 'href', base_url) or default
+    elif attribute == 'src':
+        src = url_property(target, 'src', base_url) or default
+        if src.startswith('//'):
+            src = 'https:' + src
+        value = src
+    elif attribute == 'data-src-hq':
+        value = target.get('data-src-hq') or url_property(target, 'src', base_url) or default
+    elif attribute == 'closest_a':
+        value = url_property(closest(target, 'a'), 'href', base_url) or default
+    elif attribute == 'class':
+        value = 'next' if has_class(target, 'sb_pagN') else 'page'
+    elif attribute == 'aria-label':
+        match = re.search(r'Page (\d+)', target.get('aria-label') or '')
+        if 'sb_pagN' in (selector or '') or has_class(target, 'sb_pagN'):
+            value = 'Next'
+        else:
+            value = int(match.group(1)) if match else default
+    elif attribute:
+        value = target.get(attribute) or default
+
+    if field_config.get('parse_json') and field_config.get('json_key') and value != default:
+        try:
+            value = json.loads(value).get(field_config['json_key']) or default
+        except (ValueError, TypeError, AttributeError):
+            value = default
+
+    if field_config.get('parse_domain') and value != default:
+        try:
+            value = url_hostname(value)
+        except ValueError:
+            value = default
+
+    if selector == '.b_strong + *':
+        name_element = query_selector(element, '.b_strong')
+        sibling = name_element.getnext() if name_element is not None else None
+        if sibling is not None:
+            value = text_content(sibling).strip() or default
+
+    return value
+
+
+def extract_bing_web(html_text, query_obj, config, cc=None, qft=None):
+    web_config = config['bing_web']
+    doc = parse_document(html_text)
+    query, query_id = query_parts(query_obj)
+
+    result_data = {'query': query, 'query_id': query_id}
+    for key, global_config in (web_config.get('global') or {}).items():
+        if global_config.get('regex'):
+            match = re.search(global_config['regex'], html_text)
+            result_data[key] = match.group(1).replace(',', '') if match else global_config.get('fallback') or NA
+        elif global_config.get('selector'):
+            result_data[key] = bing_web_value(query_selector(doc, global_config['selector']), global_config)
+
+    for section_name in BING_WEB_SECTIONS:
+        section_config = web_config.get(section_name)
+        if not section_config:
+            continue
+        result_data[section_name] = [
+            {field_name: bing_web_value(element, field_config, index)
+             for field_name, field_config in section_config['fields'].items()}
+            for index, element in enumerate(query_selector_all(doc, section_config['container']))
+        ]
+
+    return {'success': True, **drop_empty(result_data, drop_empty_objects=True)}
+
+
+# ---------------------------------------------------------------------------
+# Google helpers shared by google-news/web/image-yaml.js
+# ---------------------------------------------------------------------------
+
+def google_search_url(query, serp_options=None, suffix=''):
+    serp_options = serp_options or {}
+    params = [
+        ('q', query),
+        ('hl', serp_options.get('hl') or 'en'),
+        ('gl', serp_options.get('gl') or 'us'),
+        ('client', serp_options.get('client') or 'safari'),
+    ]
+    location = serp_options.get('location')
+    if location:
+        params.append(('uule', get_uule_parameter(location)))
+    if serp_options.get('sort_by'):
+        params.append(('sort', serp_options['sort_by']))
+    if serp_options.get('time_period'):
+        params.append(('tbs', f"qdr:{serp_options['time_period']}"))
+    if serp_options.get('device'):
+        params.append(('tbm', 'nws-mob' if serp_options['device'] == 'mobile' else 'nws'))
+    return f"https://www.google.com/search?{urlencode(params)}{suffix}"
+
+
+def get_uule_parameter(location_name):
+    length_char = chr(len(location_name.encode('utf-8')))
+    encoded = base64.b64encode((length_char + location_name).encode('latin-1', errors='replace')).decode('ascii')
+    return f"w+CAIQICI{encoded}"
+
+
+# ---------------------------------------------------------------------------
+# Google News (google-news-yaml.js)
+# ---------------------------------------------------------------------------
+
+def google_safe_value(element, selector, attribute, fallback=NA):
+    target = element
+    if selector:
+        target = query_selector(element, selector)
+        if target is None:
+            return fallback
+    if attribute == 'textContent':
+        return text_content(target).strip() or fallback
+    if attribute == 'position':
+        return target.get('position') or fallback
+    return target.get(attribute) or fallback
+
+
+def convert_timestamp(timestamp):
+    if not timestamp:
+        return {'dateUtc': NA, 'timeOnly': NA, 'dateOnly': NA}
+    iso = iso_from_epoch_seconds(timestamp)
+    if iso is None:
+        return {'dateUtc': NA, 'timeOnly': NA, 'dateOnly': NA}
+    date_part, time_part = iso.split('T')
+    return {'dateUtc': iso, 'dateOnly': date_part, 'timeOnly': time_part.replace('Z', '')}
+
+
+def extract_google_news(html_text, query_obj, config, serp_options=None):
+    news_config = config.get('google_news')
+    doc = parse_document(html_text)
+    query, query_id = query_parts(query_obj)
+    serp_options = serp_options or {}
+
+    title_config = (news_config or {}).get('global', {}).get('page_title')
+    title = (last_title(html_text) or title_config.get('fallback')) if title_config else NA
+
+    count_config = (news_config or {}).get('global', {}).get('result_count')
+    if count_config:
+        match = re.search(count_config['regex'], html_text)
+        result_count = match.group(1).replace(',', '') if match else count_config.get('fallback')
+    else:
+        result_count = -1
+
+    pagination = {'pageLinks': [], 'currentPage': None, 'nextPageLink': None}
+    pagination_config = (news_config or {}).get('pagination')
+    if pagination_config:
+        link_config = pagination_config['fields']['link']
+        for cell in query_selector_all(doc, pagination_config['container']):
+            link = query_selector(cell, link_config['selector']) if link_config.get('selector') else None
+            page_number = text_content(cell).strip()
+            if link is not None and page_number:
+                pagination['pageLinks'].append({
+                    'page': js_parse_int(page_number),
+                    'url': google_safe_value(link, None, link_config['attribute'], link_config.get('fallback'))
+                })
+            elif link is None and page_number:
+                pagination['currentPage'] = js_parse_int(page_number)
+        next_config = pagination_config['fields']['next_page']
+        next_anchor = query_selector(doc, next_config['selector'])
+        if next_anchor is not None:
+            pagination['nextPageLink'] = google_safe_value(
+                next_anchor, None, next_config['attribute'], next_config.get('fallback'))
+
+    news_results = []
+    if news_config:
+        fields = news_config['fields']
+
+        def value_of(item, name):
+            field = fields[name]
+            return google_safe_value(item, field.get('selector'), field.get('attribute'), field.get('fallback'))
+
+        for index, item in enumerate(query_selector_all(doc, news_config['container'])):
+            result = {'position': index + 1}
+            result['link'] = value_of(item, 'link')
+            result['title'] = value_of(item, 'title')
+            result['snippet'] = value_of(item, 'snippet')
+            result['source'] = value_of(item, 'source')
+            try:
+                result['domain'] = url_hostname(result['link'])
+            except ValueError:
+                result['domain'] = NA
+            date_info = convert_timestamp(value_of(item, 'timestamp'))
+            result['date'] = value_of(item, 'date')
+            result['date-utc'] = date_info['dateUtc']
+            result['time'] = date_info['timeOnly']
+            result['date-only'] = date_info['dateOnly']
+            result['thumbnail'] = value_of(item, 'thumbnail')
+            news_results.append(result)
+
+    top_stories = []
+    top_config = (news_config or {}).get('top_stories')
+    if top_config:
+        fields = top_config['fields']
+        for index, article in enumerate(query_selector_all(doc, top_config['container'])):
+            def story_value(name):
+                field = fields[name]
+                return google_safe_value(article, field.get('selector'), field.get('attribute'), field.get('fallback'))
+            top_stories.append({
+                '#': index + 1,
+                'Visible': 'true' if index < 3 else 'false',
+                'Title': story_value('title'),
+                'Source': story_value('source'),
+                'Date': story_value('date'),
+                'UTC Date': convert_timestamp(story_value('timestamp'))['dateUtc'],
+                'Link': story_value('link'),
+            })
+
+    raw_result = {
+        'success': True,
+        'query': query,
+        'query_id': query_id,
+        'serpOptions': serp_options,
+        'title': title,
+        'serp_result_count': result_count,
+        'pagination': pagination,
+        'news_results': news_results,
+        'top_stories': top_stories,
+    }
+    cleaned = drop_empty(raw_result)
+    if not cleaned.get('news_results') and not pagination['pageLinks']:
+        return {
+            'error': True,
+            'query': query_obj,
+            'serpOptions': serp_options,
+            'message': "No meaningful content found in result, Request limit reached out"
+        }
+    return cleaned
+
+
+# ---------------------------------------------------------------------------
+# Google Web (google-web-yaml.js)
+# ---------------------------------------------------------------------------
+
+def google_element_value(element, config, doc=None, index=None, base_url=GOOGLE_ORIGIN):
+    attribute = config.get('attribute')
+    fallback = config.get('fallback')
+
+    if attribute == 'position' and index is not None:
+        return index + 1
+
+    if element is None and not config.get('selector'):
+        if attribute == 'visible_from_index':
+            return 'false'
+        if attribute == 'static_text':
+            return config.get('value') or fallback
+        if attribute == 'result_count_from_text':
+            return js_parse_int(fallback)
+        return fallback
+
+    if element is None and config.get('selector'):
+        element = query_selector(doc, config['selector'])
+    if element is None:
+        return fallback
+
+    def hostname_or_fallback(link):
+        try:
+            return url_hostname(link) if link else fallback
+        except ValueError:
+            return fallback
+
+    def parent_link_with_text(text):
+        container = closest_class(element, 'VkpGBb')
+        container = container.getparent() if container is not None else None
+        if container is None:
+            return fallback
+        for link in query_selector_all(container, 'a'):
+            if text_content(link).strip() == text:
+                return url_property(link, 'href', base_url) or fallback
+        return fallback
+
+    if attribute == 'textContent':
+        return text_content(element).strip() or fallback
+    if attribute == 'href':
+        return (url_property(element, 'href', base_url) or '').strip() or fallback
+    if attribute == 'src':
+        return (url_property(element, 'src', base_url) or '').strip() or fallback
+    if attribute in ('data-ts', 'data-cid', 'data-key', 'data-lat', 'data-lng'):
+        return element.get(attribute) or fallback
+    if attribute == 'domain_from_link':
+        link = url_property(query_selector(element, 'a'), 'href', base_url) or url_property(element, 'href', base_url)
+        return hostname_or_fallback(link)
+    if attribute == 'business_type_from_text':
+        parts = [part.strip() for part in text_content(element).split('·')]
+        return parts[-1] or fallback
+    if attribute == 'price_from_text':
+        parts = [part.strip() for part in text_content(element).split('·')]
+        return next((part for part in parts if re.match(r'^[$₹€¥]+[\d\-–\s]*$', part)), None) or fallback
+    if attribute == 'current_page_from_text':
+        page_text = text_content(element).strip()
+        return js_parse_int(page_text) if page_text and query_selector(element, 'a.fl') is None else None
+    if attribute == 'answer_from_multiple':
+        answer_parts = []
+        main_answer = query_selector(element, '.IZ6rdc')
+        if main_answer is not None and text_content(main_answer).strip():
+            answer_parts.append(text_content(main_answer).strip())
+        description = query_selector(element, '.hgKElc')
+        if description is not None and text_content(description).strip():
+            answer_parts.append(text_content(description).strip())
+        for row in query_selector_all(element, '.ztXv9, .webanswers-webanswers_table__webanswers-table tr'):
+            text = re.sub(r'\s+', ' ', text_content(row).strip())
+            if text:
+                answer_parts.append(text)
+        return ' '.join(answer_parts).strip() or fallback
+    if attribute == 'domain_from_cite_or_link':
+        cite = query_selector(element, 'cite.qLRx3b, .VuuXrf')
+        cite_text = text_content(cite) if cite is not None else ''
+        if cite_text:
+            return cite_text.split('›')[0].strip()
+        return hostname_or_fallback(url_property(query_selector(element, 'a'), 'href', base_url))
+    if attribute == 'website_from_parent':
+        return parent_link_with_text('Website')
+    if attribute == 'directions_from_parent':
+        return parent_link_with_text('Directions')
+    if attribute == 'source_img_from_parent':
+        parent = closest_class(element, 'Pl0lPb')
+        return url_property(query_selector(parent, 'img'), 'src', base_url) or fallback
+    if attribute == 'title_from_h1':
+        # The JS reads the live origin page, which never carries this heading
+        return fallback
+    if attribute == 'position':
+        return fallback
+    if config.get('fallback_attribute'):
+        return element.get(config['fallback_attribute']) or fallback
+    return element.get(attribute) or fallback
+
+
+def closest_class(element, class_name):
+    while element is not None:
+        if isinstance(element.tag, str) and has_class(element, class_name):
+            return element
+        element = element.getparent()
+    return None
+
+
+def extract_google_section(doc, section_config):
+    results = []
+    if not section_config or not section_config.get('container'):
+        return results
+    for index, container in enumerate(query_selector_all(doc, section_config['container'])):
+        item = {'position': index + 1}
+        for field_name, field_config in (section_config.get('fields') or {}).items():
+            element = container
+            if field_config.get('selector'):
+                element = query_selector(container, field_config['selector'])
+            item[field_name] = google_element_value(
+                element, field_config, doc,
+                index=index if field_config.get('attribute') == 'position' else None
+            )
+        if any(value and value not in (NA, '') for value in item.values()):
+            results.append(item)
+    return results
+
+
+GOOGLE_TOP_STORY_FIELDS = {
+    'title': 'Title',
+    'source': 'Source',
+    'date': 'Date',
+    'utc_date': 'UTC Date',
+    'link': 'Link',
+}
+
+
+def extract_google_web(html_text, query_obj, config, serp_options=None):
+    web_config = config.get('google_web') or {}
+    doc = parse_document(html_text)
+    query, query_id = query_parts(query_obj)
+
+    global_config = web_config.get('global') or {}
+    if global_config.get('page_title'):
+        title_config = global_config['page_title']
+        title = google_element_value(query_selector(doc, title_config['selector']), title_config, doc)
+    else:
+        title = last_title(html_text)
+
+    if global_config.get('result_count'):
+        count_config = global_config['result_count']
+        serp_result_count = google_element_value(query_selector(doc, count_config['selector']), count_config, doc)
+    else:
+        stats = query_selector(doc, '#result-stats')
+        match = re.search(r'About ([\d,]+) result', text_content(stats))
+        serp_result_count = int(match.group(1).replace(',', '')) if match else -1
+
+    pagination = {'pageLinks': [], 'currentPage': None, 'nextPageLink': None}
+    if web_config.get('pagination'):
+        for cell in query_selector_all(doc, web_config['pagination']['container']):
+            link = query_selector(cell, 'a.fl')
+            page_number = text_content(cell).strip()
+            if link is not None and page_number:
+                pagination['pageLinks'].append({
+                    'page': js_parse_int(page_number),
+                    'url': url_property(link, 'href', GOOGLE_ORIGIN)
+                })
+            elif link is None and page_number:
+                pagination['currentPage'] = js_parse_int(page_number)
+        next_anchor = query_selector(doc, 'a#pnnext')
+        if next_anchor is not None:
+            pagination['nextPageLink'] = url_property(next_anchor, 'href', GOOGLE_ORIGIN)
+
+    top_stories = []
+    top_config = web_config.get('top_stories')
+    if top_config:
+        for index, article in enumerate(query_selector_all(doc, top_config['container'])):
+            item = {'#': index + 1, 'Visible': 'true' if index < 3 else 'false'}
+            for field_name, field_config in (top_config.get('fields') or {}).items():
+                element = article
+                if field_config.get('selector'):
+                    element = query_selector(article, field_config['selector'])
+                value = google_element_value(element, field_config, doc)
+                if field_name == 'utc_date' and value and value != NA:
+                    value = iso_from_epoch_seconds(value) or NA
+                item[GOOGLE_TOP_STORY_FIELDS.get(field_name, field_name)] = value
+            top_stories.append(item)
+
+    hotel_results = extract_google_section(doc, web_config.get('hotel_results'))
+    for hotel in hotel_results:
+        if isinstance(hotel.get('reviewCount'), str) and hotel['reviewCount'] != NA:
+            hotel['reviewCount'] = re.sub(r'[()]', '', hotel['reviewCount']).strip()
+
+    movie_config = web_config.get('movie_data')
+    movie_data = {
+        'castData': [],
+        'reviewsData': {'rating': None, 'reviews': [], 'moreReviewsLinkText': None},
+        'servicesData': []
+    }
+    if movie_config:
+        if movie_config.get('cast_data'):
+            movie_data['castData'] = extract_google_section(doc, movie_config['cast_data'])
+        reviews_config = movie_config.get('reviews_data')
+        if reviews_config:
+            if reviews_config.get('rating'):
+                rating = query_selector(doc, reviews_config['rating']['selector'])
+                movie_data['reviewsData']['rating'] = text_content(rating).strip() if rating is not None else None
+            if reviews_config.get('reviews'):
+                movie_data['reviewsData']['reviews'] = extract_google_section(doc, reviews_config['reviews'])
+            if reviews_config.get('more_reviews_link'):
+                more = query_selector(doc, reviews_config['more_reviews_link']['selector'])
+                movie_data['reviewsData']['moreReviewsLinkText'] = text_content(more).strip() if more is not None else None
+        if movie_config.get('services_data'):
+            movie_data['servicesData'] = extract_google_section(doc, movie_config['services_data'])
+
+    raw_result = {
+        'success': True,
+        'query': query,
+        'query_id': query_id,
+        'title': title,
+        'serp_result_count': serp_result_count,
+        'organic_results': extract_google_section(doc, web_config.get('organic_results')),
+        'local_results': extract_google_section(doc, web_config.get('local_results')),
+        'pagination': pagination,
+        'relatedSearches': extract_google_section(doc, web_config.get('related_searches')),
+        'topStories': top_stories,
+        'visualStories': extract_google_section(doc, web_config.get('visual_stories')),
+        'videoResults': extract_google_section(doc, web_config.get('video_results')),
+        'tweetData': extract_google_section(doc, web_config.get('tweet_results')),
+        'hotelResults': hotel_results,
+        'movieData': movie_data,
+    }
+    cleaned = drop_empty(raw_result)
+
+    has_content = any(cleaned.get(key) for key in (
+        'organic_results', 'topStories', 'videoResults', 'visualStories',
+        'local_results', 'relatedSearches', 'tweetData', 'hotelResults'
+    )) or bool(movie_data['castData'])
+    if not has_content:
+        return {
+            'error': True,
+            'query': query,
+            'query_id': query_id,
+            'message': "No meaningful content found in result, Request limit reached"
+        }
+    return cleaned
+
+
+# ---------------------------------------------------------------------------
+# Google Images (google-image-yaml.js)
+# ---------------------------------------------------------------------------
+
+def google_image_value(element, attribute, fallback=NA):
+    if element is None:
+        return fallback
+    if attribute == 'textContent':
+        return text_content(element).strip() or fallback
+    if attribute == 'position':
+        return fallback
+    if attribute == 'closest_a':
+        return url_property(closest(element, 'a'), 'href', GOOGLE_ORIGIN) or fallback
+    return element.get(attribute) or fallback
+
+
+def extract_google_images(html_text, query_obj, config, serp_options=None):
+    images_config = config.get('google_images')
+    doc = parse_document(html_text)
+    query, query_id = query_parts(query_obj)
+
+    title_config = (images_config or {}).get('global', {}).get('page_title')
+    if title_config and title_config.get('selector'):
+        element = query_selector(doc, title_config['selector'])
+        title = text_content(element).strip() if element is not None else title_config.get('fallback') or NA
+    else:
+        title = last_title(html_text) or NA
+
+    serp_result_count = -1
+    count_config = (images_config or {}).get('global', {}).get('result_count')
+    match = re.search(count_config['regex'], html_text) if count_config and count_config.get('regex') else None
+    if match:
+        serp_result_count = match.group(1).replace(',', '')
+    else:
+        match = re.search(r'About ([\d,]+) result', html_text)
+        if match:
+            serp_result_count = match.group(1).replace(',', '')
+
+    image_results = []
+    if images_config:
+        for index, block in enumerate(query_selector_all(doc, images_config['container'])):
+            image_data = {}
+            for field_name, field_config in images_config['fields'].items():
+                value = field_config.get('fallback') or NA
+                if field_name == 'position' or (not field_config.get('selector') and field_config.get('attribute') == 'position'):
+                    value = index + 1
+                elif field_config.get('selector'):
+                    element = query_selector(block, field_config['selector'])
+                    value = google_image_value(element, field_config.get('attribute'), field_config.get('fallback'))
+                if field_config.get('parse_domain') and value and value != NA:
+                    try:
+                        value = url_hostname(value)
+                    except ValueError:
+                        value = NA
+                if field_config.get('parse_json') and value and value != NA:
+                    try:
+                        json_data = json.loads(value)
+                        if field_config.get('json_key') and json_data.get(field_config['json_key']):
+                            value = json_data[field_config['json_key']]
+                    except (ValueError, TypeError, AttributeError):
+                        value = field_config.get('fallback') or NA
+                image_data[field_name] = value
+
+            if image_data.get('source_link') or image_data.get('source_name') or image_data.get('domain'):
+                try:
+                    source_domain = url_hostname(image_data.get('source_link') or image_data.get('link') or '')
+                except ValueError:
+                    source_domain = NA
+                source = {
+                    'link': image_data.get('source_link') or NA,
+                    'domain': source_domain,
+                    'name': image_data.get('source_name') or image_data.get('domain') or NA
+                }
+                image_data['source'] = source
+                if image_data.get('title') == NA and source['name']:
+                    image_data['title'] = source['name']
+                if image_data.get('link') == NA and source['link']:
+                    image_data['link'] = source['link']
+                if 'title' in image_data and image_data['title'] == source['name']:
+                    del image_data['title']
+                if 'link' in image_data and image_data['link'] == source['link']:
+                    del image_data['link']
+                if 'domain' in image_data and image_data['domain'] == source['name']:
+                    del image_data['domain']
+                image_data.pop('source_link', None)
+                image_data.pop('source_name', None)
+            image_results.append(image_data)
+
+    cleaned = drop_empty({
+        'success': True,
+        'query': query,
+        'query_id': query_id,
+        'title': title,
+        'serp_result_count': serp_result_count,
+        'image_results': image_results,
+    })
+    if not cleaned.get('image_results'):
+        return {
+            'error': True,
+            'query': query,
+            'query_id': query_id,
+            'message': "No meaningful content found in result, Request limit reached out"
+        }
+    return cleaned
+
+
+# ---------------------------------------------------------------------------
+# Engine registry and batch entry point
+# ---------------------------------------------------------------------------
+
+def bing_url(path, **params):
+    return f"https://www.bing.com/{path}?{urlencode({k: v for k, v in params.items() if v is not None})}"
+
+
+# search_type -> (config section, url builder, extractor)
+SEARCH_TYPES = {
+    'news': ('bing_news',
+             lambda query, cc, qft, serp: bing_url('news/search', q=query, cc=cc, qft=qft),
+             lambda html_text, query_obj, config, cc, qft, serp: extract_bing_news(html_text, query_obj, config)),
+    'bing-images': ('bing_images',
+                    lambda query, cc, qft, serp: bing_url('images/search', q=query, cc=cc),
+                    lambda html_text, query_obj, config, cc, qft, serp: extract_bing_images(html_text, query_obj, config)),
+    'bing-web': ('bing_web',
+                 lambda query, cc, qft, serp: bing_url('search', q=query, cc=cc),
+                 lambda html_text, query_obj, config, cc, qft, serp: extract_bing_web(html_text, query_obj, config)),
+    'google-news': ('google_news',
+                    lambda query, cc, qft, serp: google_search_url(query, serp, '&tbm=nws'),
+                    lambda html_text, query_obj, config, cc, qft, serp: extract_google_news(html_text, query_obj, config, serp)),
+    # google-web-yaml.js does not forward serpOptions to its fetch
+    'google-web': ('google_web',
+                   lambda query, cc, qft, serp: google_search_url(query),
+                   lambda html_text, query_obj, config, cc, qft, serp: extract_google_web(html_text, query_obj, config)),
+    'google-images': ('google_images',
+                      lambda query, cc, qft, serp: google_search_url(query, serp, '&tbm=isch'),
+                      lambda html_text, query_obj, config, cc, qft, serp: extract_google_images(html_text, query_obj, config, serp)),
+}
+SEARCH_TYPES['bing-news'] = SEARCH_TYPES['news']
+
+
+def build_url(search_type, query, cc, qft, serp_options=None):
+    _, url_builder, _ = SEARCH_TYPES.get(search_type, SEARCH_TYPES['news'])
+    return url_builder(query, cc, qft, serp_options or {})
+
+
+def extract_results(search_type, html_text, query_obj, config, cc=None, qft=None, serp_options=None):
+    """Apply the config.yaml field specs for a search type to already fetched HTML"""
+    _, _, extractor = SEARCH_TYPES.get(search_type, SEARCH_TYPES['news'])
+    return extractor(html_text, query_obj, config, cc, qft, serp_options or {})
+
+
+def process_query(query_obj, search_type, cc, qft, serp_options, config, settings, traffic=None, keep_html=False,
+                  deadline=None, min_budget=0):
+    query, query_id = query_parts(query_obj)
+    timeout = None
+    if deadline is not None:
+        # Queries the invocation deadline leaves no room for are handed back for resubmission
+        remaining = deadline - time.time()
+        if remaining < min_budget:
+            return {'success': False, 'unprocessed': True, 'query': query, 'query_id': query_id,
+                    'error': 'Deadline reached before the query started'}
+        timeout = min(float(settings['timeout_seconds']), remaining)
+    try:
+        url = build_url(search_type, query, cc, qft, serp_options)
+        fetch_started = time.perf_counter()
+        status, final_url, html_text = fetch_page(url, settings, traffic, timeout)
+        # CAPTCHA, consent, rate-limit and empty pages are labelled without parsing them
+        blocked = block_detector.blocked_result(search_engine(search_type), status, final_url, html_text,
+                                                query, query_id)
+        if blocked is not None:
+            if keep_html:
+                blocked['raw_html'] = html_text
+            return blocked
+        if status >= 400:
+            raise RuntimeError(f"HTTP error! status: {status}")
+        fetched = time.perf_counter()
+        result = extract_results(search_type, html_text, query_obj, config, cc, qft, serp_options)
+        # Same per-query timings the in-page extractors report
+        if isinstance(result, dict) and result.get('success') is True:
+            result['timings'] = {
+                'fetch_ms': round((fetched - fetch_started) * 1000),
+                'extract_ms': round((time.perf_counter() - fetched) * 1000),
+            }
+        # Raw SERP for the HTML archive, kept for failed extractions too
+        if keep_html and isinstance(result, dict):
+            result['raw_html'] = html_text
+        return result
+    except requests.Timeout:
+        logger.error(f"HTTP engine timeout for query: {query}")
+        if deadline is not None and time.time() >= deadline:
+            return {'success': False, 'unprocessed': True, 'query': query, 'query_id': query_id,
+                    'error': 'Deadline reached while the query was running'}
+        return {'success': False, 'error': True, 'query': query, 'query_id': query_id,
+                'timeout': True, 'message': 'Query timeout'}
+    except Exception as ex:
+        logger.error(f"HTTP engine error for query {query}: {ex}")
+        return {'success': False, 'query': query, 'query_id': query_id, 'error': str(ex)}
+
+
+def http_search(queries, search_type, cc, qft, serp_options, config, traffic=None, keep_html=False, deadline=None,
+                on_result=None):
+    """
+    Fetch and extract every query without a browser.
+    Returns one raw result per query, in input order; with a deadline (epoch seconds)
+    queries that would not finish in time come back marked `unprocessed`.
+    on_result(index, result) is called as each query finishes
+    """
+    settings = dict(DEFAULT_HTTP_SETTINGS)
+    settings.update(config.get('http_engine') or {})
+    min_budget = float((config.get('execution') or {}).get('min_query_budget_seconds', 5))
+    max_workers = max(1, min(int(settings['max_workers']), len(queries) or 1))
+    results = [None] * len(queries)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(process_query, query_obj, search_type, cc, qft, serp_options, config, settings, traffic,
+                            keep_html, deadline, min_budget): index
+            for index, query_obj in enumerate(queries)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_result is not None:
+                on_result(index, results[index])
+    return results
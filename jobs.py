@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+# Job settings, overridable from the `jobs` section of config.yaml
+DEFAULT_JOB_SETTINGS = {
+    'directory': os.getenv('JOBS_DIR', '/tmp/serp-jobs'),
+    'max_running': int(os.getenv('JOBS_MAX_RUNNING', 2)),
+    'max_jobs': 100,          # finished jobs kept; the oldest are dropped with their results
+    'ttl_seconds': 3600,      # finished jobs are dropped after this long
+    'poll_seconds': 1.0,      # how often a following reader re-checks a running job
+}
+
+
+class Job:
+    """
+    State of one submitted batch. Results live in an NDJSON file, one line per
+    query in completion order, so only counters are held in memory
+    """
+
+    def __init__(self, payload, directory):
+        self.job_id = uuid.uuid4().hex
+        self.batch_id = payload.get('batch_id')
+        self.total = len(payload.get('queries') or [])
+        self.path = os.path.join(directory, f"{self.job_id}.ndjson")
+        self.state = 'queued'   # queued | running | done | failed
+        self.completed = 0
+        self.succeeded = 0
+        self.unprocessed_query_ids = []
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._emitted = bytearray(self.total)
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed')
+
+    def as_dict(self):
+        return {
+            'job_id': self.job_id,
+            'batch_id': self.batch_id,
+            'state': self.state,
+            'total': self.total,
+            'completed': self.completed,
+            'succeeded': self.succeeded,
+            'unprocessed_query_ids': self.unprocessed_query_ids,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobStore:
+    """Runs submitted batches in the background and serves their results as they complete"""
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_JOB_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = None
+
+    def configure(self, settings=None):
+        """Apply the `jobs` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    def submit(self, payload, runner):
+        """
+        Queue payload['queries'] and return the Job at once.
+        runner(payload, on_result) searches the batch, calling on_result(position, result) per query
+        """
+        os.makedirs(self.settings['directory'], exist_ok=True)
+        job = Job(payload, self.settings['directory'])
+        with self._lock:
+            self._evict()
+            self._jobs[job.job_id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, int(self.settings['max_running'])),
+                                                    thread_name_prefix='serp-job')
+            executor = self._executor
+        open(job.path, 'w', encoding='utf-8').close()
+        executor.submit(self._run, job, payload, runner)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _write(self, job, file, position, result):
+        line = json.dumps(result) + '\n'
+        with self._changed:
+            if job._emitted[position]:
+                return
+            job._emitted[position] = 1
+            file.write(line)
+            file.flush()
+            job.completed += 1
+            if isinstance(result, dict):
+                if result.get('success') is True:
+                    job.succeeded += 1
+                if result.get('unprocessed'):
+                    job.unprocessed_query_ids.append(result.get('query_id'))
+            self._changed.notify_all()
+
+    def _run(self, job, payload, runner):
+        queries = payload.get('queries') or []
+        with self._changed:
+            job.state = 'running'
+            job.started_at = time.time()
+            self._changed.notify_all()
+        state, error = 'done', None
+        with open(job.path, 'a', encoding='utf-8') as file:
+            try:
+                results = runner(payload, lambda position, result: self._write(job, file, position, result))
+                if isinstance(results, dict) and len(queries) == 1 and 'query' in results:
+                    results = [results]
+                if not isinstance(results, list):
+                    # The batch could not start; every query gets its error
+                    state, error = 'failed', (results or {}).get('error', 'Batch failed')
+                    results = [None] * len(queries)
+            except Exception as ex:
+                logger.error(f"Job {job.job_id} failed: {ex}")
+                state, error = 'failed', str(ex)
+                results = [None] * len(queries)
+            # Whatever was not streamed while the batch ran is written now
+            for position, query_obj in enumerate(queries):
+                result = results[position] if position < len(results) else None
+                if result is None:
+                    result = {
+                        'success': False,
+                        'error': error or 'No result returned',
+                        'query': query_obj['query'] if isinstance(query_obj, dict) and 'query' in query_obj
+                        else str(query_obj),
+                        'query_id': query_obj.get('query_id') if isinstance(query_obj, dict) else None,
+                        'batch_id': job.batch_id,
+                    }
+                self._write(job, file, position, result)
+        with self._changed:
+            job.state = state
+            job.error = error
+            job.finished_at = time.time()
+            self._changed.notify_all()
+        logger.info(f"Job {job.job_id} {state}: {job.succeeded}/{job.total} ok")
+
+    def results(self, job, offset=0, follow=False):
+        """
+        Yield the job's NDJSON lines from line `offset` on. With follow=True keep
+        yielding as queries complete until the job has finished
+        """
+        skipped = 0
+        with open(job.path, 'r', encoding='utf-8') as file:
+            while True:
+                position = file.tell()
+                line = file.readline()
+                if line.endswith('\n'):
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    yield line
+                    continue
+                # End of what has been written so far (or half a line): stop or wait for more
+                file.seek(position)
+                with self._changed:
+                    if job.finished and os.path.getsize(job.path) == position:
+                        return
+                    if not follow:
+                        return
+                    self._changed.wait(float(self.settings['poll_seconds']))
+
+    def _evict(self):
+        """Drop finished jobs past their TTL, and the oldest beyond max_jobs. Caller holds the lock"""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        excess = max(0, len(self._jobs) - int(self.settings['max_jobs']) + 1)
+        for n, job in enumerate(finished):
+            if n < excess or now - job.finished_at > float(self.settings['ttl_seconds']):
+                del self._jobs[job.job_id]
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+
+
+job_store = JobStore()
@@ -0,0 +1,86 @@
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from loguru import logger
+
+from http_engine import extract_results
+
+# Pool settings, overridable from the `hybrid` section of config.yaml
+DEFAULT_PARSE_SETTINGS = {
+    'max_workers': int(os.getenv('PARSE_POOL_WORKERS', os.cpu_count() or 2)),
+}
+
+
+def parse_serp(search_type, html_text, query_obj, config, cc, qft, serp_options):
+    """Apply the config.yaml selectors to one SERP; returns (result, extract_ms). Runs in a worker"""
+    started = time.perf_counter()
+    result = extract_results(search_type, html_text, query_obj, config, cc, qft, serp_options)
+    return result, round((time.perf_counter() - started) * 1000)
+
+
+class ParsePool:
+    """
+    Process pool that parses SERPs fetched by the browser, so extraction runs on
+    every core instead of in Chrome's single renderer. Falls back to parsing in
+    the calling thread where processes are unavailable (e.g. no /dev/shm on Lambda)
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_PARSE_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._executor = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def configure(self, settings=None):
+        """Apply the `hybrid` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = int(value)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None and not self._unavailable:
+                try:
+                    # spawn: forking a process that runs Selenium and Flask threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=max(1, int(self.settings['max_workers'])),
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    logger.debug(f"Started parse pool with {self.settings['max_workers']} workers")
+                except (OSError, ImportError, NotImplementedError) as ex:
+                    logger.warning(f"Parse pool unavailable, parsing in-process: {ex}")
+                    self._unavailable = True
+            return self._executor
+
+    def submit(self, search_type, html_text, query_obj, config, cc, qft, serp_options):
+        """Future of (result, extract_ms) for one SERP"""
+        args = (search_type, html_text, query_obj, config, cc, qft, serp_options)
+        executor = self._pool()
+        if executor is not None:
+            try:
+                return executor.submit(parse_serp, *args)
+            except Exception as ex:
+                # A crashed worker breaks the pool; start a fresh one next time
+                logger.error(f"Parse pool failed, parsing in-process: {ex}")
+                with self._lock:
+                    self._executor = None
+        future = Future()
+        try:
+            future.set_result(parse_serp(*args))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+parse_pool = ParsePool()
+atexit.register(parse_pool.shutdown)
@@ -0,0 +1,102 @@
+"""
+Re-run extraction over archived SERPs with a (fixed) config.yaml.
+
+Reads the manifests written by html_archive.py, loads each SERP from the archive
+and applies the config's selectors with the Python extractors of the http engine,
+one manifest per task on a process pool. No search engine is contacted.
+
+    python reextract.py --config fixed-config.yaml --day 2026-10-17 --out repaired.jsonl.gz
+"""
+import os
+import sys
+import gzip
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from html_archive import html_archive
+from http_engine import extract_results
+
+# Per-process state set up by init_worker
+_config = None
+
+
+def init_worker(config, archive_settings):
+    global _config
+    _config = config
+    html_archive.configure(archive_settings)
+
+
+def reextract_manifest(name, search_types=None, only_failed=False):
+    """Re-extract every SERP of one manifest; returns (results, skipped)"""
+    results, skipped = [], 0
+    for entry in html_archive.read_manifest(name):
+        if (search_types and entry.get('search_type') not in search_types) or (only_failed and entry.get('success')):
+            skipped += 1
+            continue
+        query_obj = {'query': entry.get('query'), 'query_id': entry.get('query_id')}
+        try:
+            html = html_archive.get_html(entry['key'])
+            result = extract_results(entry.get('search_type', 'news'), html, query_obj, _config,
+                                     entry.get('cc'), entry.get('qft'), entry.get('serpOptions') or {})
+        except Exception as ex:
+            result = {'success': False, 'query': entry.get('query'), 'error': f'Re-extraction failed: {ex}'}
+        if isinstance(result, dict):
+            result.update({
+                'query_id': entry.get('query_id'),
+                'batch_id': entry.get('batch_id'),
+                'html_archive': {'key': entry['key'], 'manifest': name, 'fetched_at': entry.get('fetched_at')},
+                'previous_success': entry.get('success'),
+            })
+        results.append(result)
+    return results, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.yaml', help='config.yaml with the selectors to apply')
+    parser.add_argument('--day', default='', help='only manifests of this UTC day (YYYY-MM-DD) or a longer prefix')
+    parser.add_argument('--search-type', action='append', dest='search_types',
+                        help='only this search type (repeatable)')
+    parser.add_argument('--only-failed', action='store_true', help='skip SERPs that extracted fine the first time')
+    parser.add_argument('--out', required=True, help='JSON lines output, gzipped when it ends in .gz')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--archive-dir', help='override html_archive.directory from the config')
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+    archive_settings = dict(config.get('html_archive') or {})
+    if args.archive_dir:
+        archive_settings.update({'backend': 'local', 'directory': args.archive_dir})
+    html_archive.configure(archive_settings)
+
+    manifests = html_archive.manifests(args.day)
+    if not manifests:
+        print(f"No manifests for '{args.day}' in the archive", file=sys.stderr)
+        sys.exit(1)
+
+    opener = gzip.open if args.out.endswith('.gz') else open
+    totals = {'serps': 0, 'ok': 0, 'was_ok': 0, 'skipped': 0}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(config, archive_settings)) as executor, \
+            opener(args.out, 'wt', encoding='utf-8') as out:
+        futures = [executor.submit(reextract_manifest, name, args.search_types, args.only_failed)
+                   for name in manifests]
+        for future in futures:
+            results, skipped = future.result()
+            totals['skipped'] += skipped
+            for result in results:
+                totals['serps'] += 1
+                totals['ok'] += 1 if isinstance(result, dict) and result.get('success') is True else 0
+                totals['was_ok'] += 1 if isinstance(result, dict) and result.get('previous_success') else 0
+                out.write(json.dumps(result) + '\n')
+
+    print(f"{len(manifests)} manifests, {totals['serps']} SERPs re-extracted ({totals['skipped']} skipped): "
+          f"{totals['ok']} ok now, {totals['was_ok']} ok when fetched -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from loguru import logger
+
+# Cache settings, overridable from the `cache` section of config.yaml
+DEFAULT_CACHE_SETTINGS = {
+    'enabled': True,
+    'max_entries': int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 1000)),
+    'sqlite_path': os.getenv('RESULT_CACHE_PATH', ''),
+    'ttl_seconds': {'default': 300},
+}
+
+# Per-request fields that must not be replayed from the cache: everything the batch, the engine,
+# the retry policy, fan-out and the Lambda handler stamp on top of the extractor's payload
+VOLATILE_FIELDS = (
+    'batch_id', 'query_id', 'browser', 'wait_ms', 'bootstrap_ms', 'captcha', 'engine', 'rotation', 'cache',
+    'timings', 'html_archive', 'attempts', 'failure', 'raw_html', 'fanout', 'unprocessed_query_ids',
+)
+
+
+def make_key(search_type, query, cc, qft, serp_options, engine):
+    """Canonical cache key for one SERP as fetched by one engine"""
+    canonical = json.dumps([
+        search_type or 'news',
+        engine or 'browser',
+        ' '.join(str(query).split()),
+        (cc or '').upper(),
+        qft or '',
+        serp_options or {},
+    ], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(result):
+    return isinstance(result, dict) and result.get('success') is True and not result.get('error')
+
+
+class ResultCache:
+    """
+    Two-tier SERP cache: an in-process LRU in front of an optional SQLite file,
+    so warm containers and restarts on the same disk can both reuse results
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_CACHE_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_path = None
+
+    def configure(self, settings=None):
+        """Apply the `cache` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key not in self.settings or value is None:
+                continue
+            if key == 'ttl_seconds' and not isinstance(value, dict):
+                value = {'default': value}
+            self.settings[key] = value
+
+    @property
+    def enabled(self):
+        return bool(self.settings['enabled'])
+
+    def ttl_for(self, search_type):
+        ttls = self.settings['ttl_seconds']
+        return float(ttls.get(search_type, ttls.get('default', 300)))
+
+    def _connection(self):
+        path = self.settings['sqlite_path']
+        if not path:
+            return None
+        if self._db is None or self._db_path != path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL, payload TEXT)"
+                )
+                self._db_path = path
+            except sqlite3.Error as ex:
+                logger.error(f"Could not open result cache {path}: {ex}")
+                self._db = None
+        return self._db
+
+    def get(self, key, ttl):
+        """Return (result, age_seconds) for a fresh entry, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                db = self._connection()
+                if db is not None:
+                    try:
+                        row = db.execute(
+                            "SELECT stored_at, payload FROM results WHERE key = ?", (key,)
+                        ).fetchone()
+                    except sqlite3.Error as ex:
+                        logger.error(f"Result cache read failed: {ex}")
+                        row = None
+                    if row:
+                        entry = (row[0], json.loads(row[1]))
+                        self._remember(key, entry)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            age = now - stored_at
+            if age > ttl:
+                return None
+            self._entries.move_to_end(key)
+            return json.loads(json.dumps(result)), age
+
+    def put(self, key, result):
+        if not is_cacheable(result):
+            return
+        stored = {k: v for k, v in result.items() if k not in VOLATILE_FIELDS}
+        entry = (time.time(), stored)
+        with self._lock:
+            self._remember(key, entry)
+            db = self._connection()
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO results (key, stored_at, payload) VALUES (?, ?, ?)",
+                        (key, entry[0], json.dumps(stored))
+                    )
+                    db.commit()
+                except sqlite3.Error as ex:
+                    logger.error(f"Result cache write failed: {ex}")
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > int(self.settings['max_entries']):
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM results")
+                db.commit()
+
+
+result_cache = ResultCache()
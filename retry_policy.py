@@ -0,0 +1,137 @@
+import re
+import time
+import random
+from loguru import logger
+
+from rotation import BLOCK_MARKERS
+
+# Retry settings, read from the `error_handling` section of config.yaml
+DEFAULT_RETRY_SETTINGS = {
+    'max_retries': 3,
+    'retry_delay': 1000,        # ms before the first retry, doubled for each further one
+    'max_retry_delay': 8000,    # ms cap on the backoff
+    # 'block' is left to the engine throttle and container rotation; add it to retry blocks right away
+    'retry_on': ['timeout', 'network', 'http_status', 'empty_serp'],
+    'retry_statuses': [408, 425, 429, 500, 502, 503, 504],
+}
+
+HTTP_STATUS = re.compile(r'status:?\s*(\d{3})')
+
+# Substrings of fetch failures that never reached a response
+NETWORK_MARKERS = ('failed to fetch', 'networkerror', 'connection', 'err_', 'network')
+
+
+def failure_text(result):
+    return f"{result.get('error', '')} {result.get('message', '')}".lower()
+
+
+def classify_failure(result):
+    """
+    Failure type of a result: None when it succeeded, otherwise one of 'unprocessed',
+    'timeout', 'http_status', 'empty_serp', 'block', 'network' or 'error'
+    """
+    if not isinstance(result, dict):
+        return 'error'
+    if result.get('success') is True and not result.get('error'):
+        return None
+    if result.get('unprocessed'):
+        return 'unprocessed'
+    # Labelled by block_detector before the page was parsed
+    if result.get('page_type'):
+        return 'empty_serp' if result['page_type'] == 'empty' else 'block'
+    text = failure_text(result)
+    if result.get('timeout') or 'timeout' in text or 'timed out' in text:
+        return 'timeout'
+    # The Google extractors report an empty SERP as "No meaningful content ... Request limit reached"
+    if 'no meaningful content' in text:
+        return 'empty_serp'
+    if any(marker in text for marker in BLOCK_MARKERS):
+        return 'block'
+    if HTTP_STATUS.search(text):
+        return 'http_status'
+    if any(marker in text for marker in NETWORK_MARKERS):
+        return 'network'
+    return 'error'
+
+
+def http_status(result):
+    match = HTTP_STATUS.search(failure_text(result))
+    return int(match.group(1)) if match else None
+
+
+class RetryPolicy:
+    """
+    Which failed queries of a batch are worth another attempt, and how long to back
+    off first. Only transient failures are retried; bad queries or broken selectors
+    fail the same way every time
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_RETRY_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+
+    def configure(self, settings=None):
+        """Apply the `error_handling` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    @property
+    def max_retries(self):
+        return max(0, int(self.settings['max_retries']))
+
+    def should_retry(self, result):
+        failure = classify_failure(result)
+        if failure not in self.settings['retry_on']:
+            return False
+        if failure == 'http_status':
+            return http_status(result) in self.settings['retry_statuses']
+        return True
+
+    def delay(self, retry):
+        """Seconds to wait before retry number `retry` (1-based): exponential, with half of it jittered"""
+        base = float(self.settings['retry_delay']) * (2 ** (retry - 1))
+        capped = min(base, float(self.settings['max_retry_delay'])) / 1000
+        return capped / 2 + random.uniform(0, capped / 2)
+
+    def run(self, queries, results, search, deadline=None, min_budget=0, sleep=None):
+        """
+        Retry the failed entries of `results` (parallel to `queries`) with search(sub_queries),
+        which returns a list of results for just those queries. Results get `attempts`,
+        and `failure` when they still failed. Returns the merged list
+        """
+        sleep = sleep or time.sleep
+        attempts = [1] * len(results)
+        for retry in range(1, self.max_retries + 1):
+            failed = [i for i, result in enumerate(results) if self.should_retry(result)]
+            if not failed:
+                break
+            wait = self.delay(retry)
+            if deadline is not None and deadline - time.time() < wait + min_budget:
+                logger.debug(f"Not retrying {len(failed)} queries: too close to the deadline")
+                break
+            logger.info(f"Retry {retry}/{self.max_retries} of {len(failed)} failed queries in {wait:.2f}s")
+            sleep(wait)
+            retried = search([queries[i] for i in failed])
+            if not isinstance(retried, list) or len(retried) != len(failed):
+                # The engine could not start this time; keep the failures we have
+                break
+            for i, result in zip(failed, retried):
+                results[i] = result
+                attempts[i] += 1
+
+        for result, count in zip(results, attempts):
+            self.stamp(result, count)
+        return results
+
+    @staticmethod
+    def stamp(result, attempts):
+        """Record the attempt count, and the failure type of a failed result"""
+        if isinstance(result, dict):
+            result['attempts'] = attempts
+            failure = classify_failure(result)
+            if failure:
+                result['failure'] = failure
+
+
+retry_policy = RetryPolicy()
@@ -0,0 +1,162 @@
+import os
+import time
+import random
+import threading
+from botocore.config import Config as BotoConfig
+from loguru import logger
+
+# Rotation policy, overridable from the `rotation` section of config.yaml
+DEFAULT_ROTATION_SETTINGS = {
+    'block_threshold': int(os.getenv('ROTATION_BLOCK_THRESHOLD', 3)),
+    'window_seconds': int(os.getenv('ROTATION_WINDOW_SECONDS', 300)),
+    'cadence_seconds': int(os.getenv('ROTATION_CADENCE_SECONDS', 0)),
+    'min_interval_seconds': int(os.getenv('ROTATION_MIN_INTERVAL_SECONDS', 60)),
+    # The Lambda API call runs before the handler returns, so it must be quick or give up
+    'connect_timeout_seconds': int(os.getenv('ROTATION_CONNECT_TIMEOUT_SECONDS', 2)),
+    'read_timeout_seconds': int(os.getenv('ROTATION_READ_TIMEOUT_SECONDS', 5)),
+}
+
+# Substrings in result errors that mean the search engine pushed back on this IP
+BLOCK_MARKERS = (
+    'captcha',
+    'request limit reached',
+    'status: 429',
+    'status: 403',
+    'unusual traffic',
+    'block page',
+)
+
+
+def is_block_signal(result):
+    """True when a single result looks like a block or CAPTCHA rather than an ordinary failure"""
+    if not isinstance(result, dict) or result.get('success') is True:
+        return False
+    text = f"{result.get('error', '')} {result.get('message', '')}".lower()
+    return any(marker in text for marker in BLOCK_MARKERS)
+
+
+def count_block_signals(results):
+    if isinstance(results, dict):
+        results = [results]
+    return sum(1 for result in results or [] if is_block_signal(result))
+
+
+class RotationPolicy:
+    """
+    Decides when the Lambda should be pushed onto a fresh container (and IP).
+    Rotation is triggered by block/CAPTCHA signals or an optional cadence,
+    never unconditionally, so warm containers survive normal traffic
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_ROTATION_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self.started_at = time.time()
+        self.last_rotation = None
+        self._signals = []
+        self._lock = threading.Lock()
+        self._rotating = False
+
+    def configure(self, settings=None):
+        """Apply limits from the `rotation` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = int(value)
+
+    def record(self, results):
+        """Remember block signals seen in a response; returns how many were found"""
+        count = count_block_signals(results)
+        if count:
+            now = time.time()
+            with self._lock:
+                self._signals.extend([now] * count)
+        return count
+
+    def _recent_signals(self, now):
+        cutoff = now - self.settings['window_seconds']
+        self._signals = [t for t in self._signals if t >= cutoff]
+        return len(self._signals)
+
+    def decide(self):
+        """Return the rotation decision as a dict suitable for the response"""
+        now = time.time()
+        with self._lock:
+            signals = self._recent_signals(now)
+            last = self.last_rotation or self.started_at
+            decision = {'rotate': False, 'reason': None, 'block_signals': signals}
+
+            if self._rotating:
+                decision['reason'] = 'rotation already in progress'
+                return decision
+            if self.last_rotation and now - self.last_rotation < self.settings['min_interval_seconds']:
+                return decision
+
+            if self.settings['block_threshold'] > 0 and signals >= self.settings['block_threshold']:
+                decision['rotate'] = True
+                decision['reason'] = f"{signals} block signals in {self.settings['window_seconds']}s"
+            elif self.settings['cadence_seconds'] > 0 and now - last >= self.settings['cadence_seconds']:
+                decision['rotate'] = True
+                decision['reason'] = f"cadence of {self.settings['cadence_seconds']}s elapsed"
+            return decision
+
+    def client_config(self):
+        """botocore settings for the rotation call: short timeouts and no retries"""
+        return BotoConfig(
+            connect_timeout=self.settings['connect_timeout_seconds'],
+            read_timeout=self.settings['read_timeout_seconds'],
+            retries={'max_attempts': 0},
+        )
+
+    def rotate(self, client, function_name, variables):
+        """
+        Push a new environment to the function. Runs on the request path: Lambda freezes
+        the container once the handler returns, so a background thread would never finish
+        """
+        with self._lock:
+            self.last_rotation = time.time()
+            self._rotating = True
+        try:
+            env = dict(variables)
+            env['ENV_VARIABLE'] = str(random.random())
+            client.update_function_configuration(
+                FunctionName=function_name,
+                Environment={'Variables': env}
+            )
+            logger.info(f"Rotated Lambda container for {function_name}")
+            with self._lock:
+                self._signals = []
+        finally:
+            with self._lock:
+                self._rotating = False
+
+    def after_request(self, results, function_name, client_factory, variables):
+        """
+        Record the signals in a finished response, rotate if the policy calls for it
+        and return the decision. client_factory(config=...) builds the Lambda client
+        """
+        self.record(results)
+        decision = self.decide()
+        if decision['rotate']:
+            if not function_name:
+                decision['rotate'] = False
+                decision['reason'] = 'no function name to rotate'
+            else:
+                try:
+                    self.rotate(client_factory(config=self.client_config()), function_name, variables)
+                except Exception as ex:
+                    # The signals are kept, so the next request after min_interval_seconds tries again
+                    logger.error(f"Error rotating Lambda container: {ex}")
+                    decision['rotate'] = False
+                    decision['reason'] = f'rotation failed: {ex}'
+        return decision
+
+
+def stamp_decision(results, decision):
+    """Attach the rotation decision to every result dict in a response"""
+    for result in results if isinstance(results, list) else [results]:
+        if isinstance(result, dict):
+            result['rotation'] = decision
+    return results
+
+
+rotation_policy = RotationPolicy()
@@ -3,69 +3,33 @@ from selenium.webdriver.common.keys import Keys
 import json
 import time
 import requests
-import random
 import boto3
 import os
+import yaml
 from selenium.webdriver.common.by import By
 from loguru import logger
-from twocaptcha import TwoCaptcha
 from dotenv import load_dotenv
 from tempfile import mkdtemp
 from flask import Flask, request, jsonify
+from browser_manager import browser_manager
+from rotation import rotation_policy, stamp_decision
+from captcha_solver import captcha_solver
 
 
 load_dotenv()
 
 app = Flask(__name__)
 PLATFORM = os.getenv("platform", "DEPLOY")
+DEFAULT_CONFIG_PATH = 'config.yaml'
 
 
 class TwoCaptchaGJ:
 
     @staticmethod
     def twocaptcha_solver(site_key, data_s, url):
-        try:
-            logger.debug(f"Starting 2captcha solver - {os.getenv('TWOCAPTCHA_API_KEY')}")
-            initial_time = time.time()
-            solver = TwoCaptcha(os.getenv("TWOCAPTCHA_API_KEY"))  # Replace with your 2captcha API key
-            
-            # Start the captcha solving process
-            captcha_data = solver.recaptcha(
-                sitekey=site_key,
-                url=url,
-                datas=data_s,
-                version='v2',
-                action='verify',
-                score=0.9
-            )
-            captcha_id = captcha_data['captchaId']
-            logger.debug(f"Captcha solving process started with ID: {captcha_id}")
-            
-            # Poll for the result
-            max_attempts = 30
-            attempt = 0
-            while attempt < max_attempts:
-                try:
-                    result = solver.get_result(captcha_id)
-                    if result:
-                        total_time = time.time() - initial_time
-                        logger.debug(f"Captcha solved in {total_time:.2f} seconds")
-                        return result
-                except Exception as e:
-                    if "CAPTCHA_NOT_READY" in str(e):
-                        logger.debug(f"Captcha solving attempt {attempt + 1} not ready, retrying...")
-                    else:
-                        logger.error(f"Error getting captcha result: {e}")
-                        return None
-                
-                attempt += 1
-                time.sleep(5)  # Wait 5 seconds before checking again
-            
-            logger.error("Failed to solve captcha after maximum attempts")
-            return None
-        except Exception as ex:
-            logger.error(f"Error in 2captcha solver: {ex}")
-            return None
+        """Solve on the shared captcha worker pool; only this page waits for the token"""
+        logger.debug("Starting 2captcha solver")
+        return captcha_solver.wait(captcha_solver.submit(site_key, data_s, url))
 
     @staticmethod
     def solve_captcha(driver):
@@ -95,6 +59,15 @@ class TwoCaptchaGJ:
         except Exception as ex:
             logger.error(ex)
 
+def load_browser_settings(config_path=DEFAULT_CONFIG_PATH):
+    """The `browser` section of config.yaml; the browser_manager defaults when it is missing"""
+    try:
+        with open(config_path, 'r', encoding="utf-8") as file:
+            return (yaml.safe_load(file) or {}).get("browser")
+    except (FileNotFoundError, yaml.YAMLError) as ex:
+        logger.error(f"Could not load browser settings from {config_path}: {ex}")
+        return None
+
 def get_js_file_path(search_type):
     """
     Determine which JavaScript file to use based on search_type
@@ -145,29 +118,20 @@ def load_js_script(search_type):
         return ""
 
 def bing_search(queries, cc, batch_id=None, search_type=None, qft=None):
-    # Set up the webdriver (make sure you have the appropriate driver installed)
-    if PLATFORM == "LOCAL":
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("C:/Users/i/Downloads/chromedriver-win64/chromedriver.exe")
-    else:
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("/opt/chromedriver")
-
-        options.binary_location = '/opt/chrome/chrome'
-        options.add_argument("--headless=new")
-        options.add_argument('--no-sandbox')
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1280x1696")
-        options.add_argument("--single-process")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-dev-tools")
-        options.add_argument("--no-zygote")
-        options.add_argument(f"--user-data-dir={mkdtemp()}")
-        options.add_argument(f"--data-path={mkdtemp()}")
-        options.add_argument(f"--disk-cache-dir={mkdtemp()}")
-        options.add_argument("--remote-debugging-port=9222")
-
-    driver = webdriver.Chrome(options=options, service=service)
+    browser_manager.configure(load_browser_settings())
+    browser, warm = browser_manager.acquire()
+    healthy = False
+    try:
+        results = run_batch(browser, warm, queries, cc, batch_id, search_type, qft)
+        healthy = True
+        return results
+    finally:
+        # Keep the browser warm for the next invocation unless the batch failed
+        browser_manager.release(browser, healthy=healthy)
+
+def run_batch(browser, warm, queries, cc, batch_id=None, search_type=None, qft=None):
+    driver = browser.driver
+    browser_state = 'warm' if warm else 'cold'
 
     # Log batch processing information
     logger.debug(f"Processing batch_id: {batch_id}")
@@ -191,15 +155,11 @@ def bing_search(queries, cc, batch_id=None, search_type=None, qft=None):
         query_strings = []
         query_ids = []
     
-    # Open Bing
-    driver.get(f"https://www.bing.com/search?q=botxbyte+company+in+rajkot")
-
     # Load the appropriate JavaScript file based on search_type
     js_code = load_js_script(search_type)
     
     if not js_code:
         logger.error("No JavaScript code loaded, terminating search")
-        driver.quit()
         return {
             'batch_id': batch_id,
             'success': False,
@@ -207,13 +167,19 @@ def bing_search(queries, cc, batch_id=None, search_type=None, qft=None):
             'image_results': []
         }
 
-    # Check and solve - CAPTCHA
-    try:
-        driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
-        TwoCaptchaGJ.solve_captcha(driver)
-    except:
-        pass
-    time.sleep(5)
+    # Open Bing unless a warm browser is already sitting on it
+    initial_url = "https://www.bing.com/search?q=botxbyte+company+in+rajkot"
+    if browser.origin != initial_url:
+        driver.get(initial_url)
+
+        # Check and solve - CAPTCHA
+        try:
+            driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
+            TwoCaptchaGJ.solve_captcha(driver)
+        except:
+            pass
+        time.sleep(5)
+        browser.origin = initial_url
 
     logger.debug(f"Page title: {driver.title}")
 
@@ -297,13 +263,13 @@ def bing_search(queries, cc, batch_id=None, search_type=None, qft=None):
                 'query': query_string,
                 result_key: []
             }
-        
+
+        fetch_results['browser'] = browser_state
+        browser.query_count += 1
         all_results.append(fetch_results)
 
     logger.debug("Exit")
-    # Close the browser
-    driver.quit()
-    
+
     # Return all results
     if len(all_results) == 1:
         return all_results[0]  # Return single result directly
@@ -340,32 +306,20 @@ def lambda_handler(event=None, context=None):
             'body': json.dumps('Error: AWS credentials are not set.')
         }
 
-    try:
-        # Create a boto3 client
-        client = boto3.client(
+    def lambda_client(**kwargs):
+        return boto3.client(
             'lambda',
             region_name=default_region,
             aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
+            aws_secret_access_key=secret_access_key,
+            **kwargs
         )
 
-        input_params = {
-            'FunctionName': function_name,
-            'Environment': {
-                'Variables': {
-                    'MY_AWS_ACCESS_KEY_ID': access_key_id,
-                    'MY_AWS_SECRET_ACCESS_KEY': secret_access_key,
-                    'ENV_VARIABLE': str(random.random()),
-                    'TWOCAPTCHA_API_KEY': os.getenv('TWOCAPTCHA_API_KEY')
-                }
-            }
-        }
-        response = client.update_function_configuration(**input_params)
-    except Exception as ex:
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f'Error updating environment variables: {str(ex)}')
-        }
+    rotation_variables = {
+        'MY_AWS_ACCESS_KEY_ID': access_key_id,
+        'MY_AWS_SECRET_ACCESS_KEY': secret_access_key,
+        'TWOCAPTCHA_API_KEY': os.getenv('TWOCAPTCHA_API_KEY', '')
+    }
 
     
     queries = json.loads(event['body']).get("queries", [])
@@ -384,6 +338,11 @@ def lambda_handler(event=None, context=None):
     logger.debug("Batch ID: {}", batch_id)
     
     results = bing_search(queries, cc, batch_id, search_type, qft)
+
+    # Rotate the container only when the policy asks for it; the call ends before the handler returns
+    decision = rotation_policy.after_request(results, function_name, lambda_client, rotation_variables)
+    logger.debug("Rotation decision: {}", decision)
+    stamp_decision(results, decision)
     return {
         'statusCode': 200,
         'body': json.dumps(results)
@@ -13,6 +13,7 @@ from twocaptcha import TwoCaptcha
 from dotenv import load_dotenv
 from tempfile import mkdtemp
 from flask import Flask, request, jsonify
+from browser_manager import browser_manager
 
 
 load_dotenv()
@@ -131,29 +132,21 @@ def bing_search(queries, cc, qft, batch_id=None, search_type="news"):
             'batch_id': batch_id
         }
 
-    # Set up the webdriver (make sure you have the appropriate driver installed)
-    if PLATFORM == "LOCAL":
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("C:/Users/i/Downloads/chromedriver-win64/chromedriver.exe")
-    else:
-        options = webdriver.ChromeOptions()
-        service = webdriver.ChromeService("/opt/chromedriver")
-
-        options.binary_location = '/opt/chrome/chrome'
-        options.add_argument("--headless=new")
-        options.add_argument('--no-sandbox')
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1280x1696")
-        options.add_argument("--single-process")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-dev-tools")
-        options.add_argument("--no-zygote")
-        options.add_argument(f"--user-data-dir={mkdtemp()}")
-        options.add_argument(f"--data-path={mkdtemp()}")
-        options.add_argument(f"--disk-cache-dir={mkdtemp()}")
-        options.add_argument("--remote-debugging-port=9222")
-
-    driver = webdriver.Chrome(options=options, service=service)
+    browser_manager.configure(config.get("browser"))
+    browser, warm = browser_manager.acquire()
+    healthy = False
+    try:
+        results = run_batch(browser, warm, config, queries, cc, qft, batch_id, search_type)
+        healthy = True
+        return results
+    finally:
+        # Keep the browser warm for the next invocation unless the batch failed
+        browser_manager.release(browser, healthy=healthy)
+
+
+def run_batch(browser, warm, config, queries, cc, qft, batch_id=None, search_type="news"):
+    driver = browser.driver
+    browser_state = 'warm' if warm else 'cold'
 
     # Choose JS and config section
     if search_type == "images":
@@ -169,14 +162,11 @@ def bing_search(queries, cc, qft, batch_id=None, search_type="news"):
         config_section = { "bing_news": config.get("bing_news", {}), "processing": config.get("processing", {}), "error_handling": config.get("error_handling", {}) }
         url = "https://www.bing.com/search?q=botxbyte+company+in+rajkot"
 
-    driver.get(url)
-
     try:
         with open(js_file, 'r', encoding="utf-8") as file:
             js_code = file.read()
     except FileNotFoundError:
         logger.error(f"{js_file} file not found")
-        driver.quit()
         return {
             'success': False,
             'error': f'{js_file} file not found',
@@ -203,17 +193,18 @@ def bing_search(queries, cc, qft, batch_id=None, search_type="news"):
         query_strings = []
         query_ids = []
     
-    # Open Bing
-    driver.get(f"https://www.bing.com/search?q=botxbyte+company+in+rajkot")
+    # Open Bing unless a warm browser is already sitting on it
+    if browser.origin != url:
+        driver.get(url)
 
-
-    # Check and solve - CAPTCHA
-    try:
-        driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
-        TwoCaptchaGJ.solve_captcha(driver)
-    except:
-        pass
-    time.sleep(5)
+        # Check and solve - CAPTCHA
+        try:
+            driver.find_element(by=By.CSS_SELECTOR, value="div#recaptcha")
+            TwoCaptchaGJ.solve_captcha(driver)
+        except:
+            pass
+        time.sleep(5)
+        browser.origin = url
 
     logger.debug(f"Page title: {driver.title}")
 
@@ -297,12 +288,12 @@ def bing_search(queries, cc, qft, batch_id=None, search_type="news"):
                 'news_results': [],
                 'error': 'Invalid or no results returned'
             }
-        
+
+        fetch_results['browser'] = browser_state
+        browser.query_count += 1
         all_results.append(fetch_results)
 
     logger.debug("Exit")
-    # Close the browser
-    driver.quit()
     
     # Return all results
     if len(all_results) == 1:
@@ -0,0 +1,61 @@
+import copy
+import threading
+from loguru import logger
+
+
+class Flight:
+    """One in-progress SERP fetch that other requests can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.followers = 0
+
+    def wait(self, timeout=None):
+        """Return a private copy of the leader's result, or None if it failed or timed out"""
+        if not self.done.wait(timeout):
+            return None
+        return copy.deepcopy(self.result) if self.result is not None else None
+
+
+class SingleFlight:
+    """
+    Coalesces identical SERP fetches across concurrent requests: the first caller
+    for a key leads and fetches, later callers wait for its result
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        """Split keys into (leading, following) where following maps key -> Flight"""
+        leading, following = [], {}
+        with self._lock:
+            for key in keys:
+                flight = self._flights.get(key)
+                if flight is None:
+                    self._flights[key] = Flight()
+                    leading.append(key)
+                else:
+                    flight.followers += 1
+                    following[key] = flight
+        if following:
+            logger.debug(f"Joining {len(following)} in-flight fetches")
+        return leading, following
+
+    def complete(self, key, result):
+        """Publish a leader's result (None on failure) and forget the key"""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.result = result
+            flight.done.set()
+
+    def release(self, keys):
+        """Fail any flights a leader is abandoning so their followers stop waiting"""
+        for key in keys:
+            self.complete(key, None)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,335 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from collections import OrderedDict, deque
+from loguru import logger
+from selenium.webdriver.remote.webelement import WebElement
+
+from browser_manager import ManagedBrowser, build_chrome_driver, browser_manager, psutil
+
+# Pool settings, overridable from the `browser_pool` section of config.yaml
+DEFAULT_POOL_SETTINGS = {
+    'enabled': os.getenv('BROWSER_POOL', 'auto'),   # auto: only in server mode (platform=LOCAL)
+    'browsers': os.getenv('BROWSER_POOL_BROWSERS', 'auto'),  # auto: from CPU cores and free RAM
+    'tabs_per_browser': int(os.getenv('BROWSER_POOL_TABS', 4)),
+    'mb_per_browser': 700,        # RAM budgeted per browser (all its tabs) when sizing automatically
+    'cores_per_browser': 1,
+    'max_browsers': 8,
+    'warm_search_types': ['news', 'google-web'],   # origins the tabs are bootstrapped on at start
+    'poll_ms': 100,               # how often a leased tab is asked for its settled query
+    'lease_timeout_seconds': 300,
+}
+
+# Background tabs must keep their timers and fetches running at full speed
+POOL_CHROME_ARGS = (
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+)
+
+
+class TabDriver:
+    """
+    WebDriver facade for one tab. Every command (and property read) first switches
+    the shared driver to this tab, under the browser's lock, so tabs of one Chrome
+    can be used from different threads. The lock is held for one command at a time,
+    so a tab waiting between commands (e.g. on a CAPTCHA token) never stalls the others
+    """
+
+    def __init__(self, browser, handle):
+        self._browser = browser
+        self._handle = handle
+
+    def _focus(self):
+        if self._browser.current_handle != self._handle:
+            self._browser.driver.switch_to.window(self._handle)
+            self._browser.current_handle = self._handle
+
+    def _command(self, target, name):
+        """target.name on this tab: property reads are done right away, methods wrapped"""
+        with self._browser.lock:
+            self._focus()
+            attribute = getattr(target, name)
+        if not callable(attribute):
+            return self._wrap(attribute)
+
+        def command(*args, **kwargs):
+            args = [self._unwrap(arg) for arg in args]
+            kwargs = {key: self._unwrap(value) for key, value in kwargs.items()}
+            with self._browser.lock:
+                self._focus()
+                return self._wrap(attribute(*args, **kwargs))
+        return command
+
+    def _wrap(self, value):
+        # Elements only exist in their own tab, so their commands must be focused too
+        if isinstance(value, WebElement):
+            return TabElement(self, value)
+        if isinstance(value, list) and value and all(isinstance(item, WebElement) for item in value):
+            return [TabElement(self, item) for item in value]
+        return value
+
+    @staticmethod
+    def _unwrap(value):
+        if isinstance(value, TabElement):
+            return value._element
+        if isinstance(value, (list, tuple)):
+            return type(value)(item._element if isinstance(item, TabElement) else item for item in value)
+        return value
+
+    def __getattr__(self, name):
+        return self._command(self._browser.driver, name)
+
+
+class TabElement:
+    """WebElement facade for an element of one tab; its commands run focused on that tab"""
+
+    def __init__(self, tab_driver, element):
+        self._tab_driver = tab_driver
+        self._element = element
+
+    def __getattr__(self, name):
+        return self._tab_driver._command(self._element, name)
+
+
+class BrowserTab:
+    """One tab of a pooled Chrome; quacks like ManagedBrowser for the extractor helpers"""
+
+    def __init__(self, browser, handle):
+        self.browser = browser
+        self.handle = handle
+        self.driver = TabDriver(browser, handle)
+        self.origin = None
+        self.installed = {}
+        self.leased = False
+
+    @property
+    def query_count(self):
+        return self.browser.query_count
+
+    @query_count.setter
+    def query_count(self, value):
+        self.browser.query_count = value
+
+
+class PooledBrowser(ManagedBrowser):
+    """A long-lived Chrome with several tabs, each leased to one query at a time"""
+
+    def __init__(self, driver, tab_count):
+        super().__init__(driver)
+        self.lock = threading.RLock()
+        self.current_handle = driver.current_window_handle
+        self.retiring = False
+        handles = [self.current_handle]
+        for _ in range(max(1, tab_count) - 1):
+            driver.switch_to.new_window('tab')
+            handles.append(driver.current_window_handle)
+        self.current_handle = handles[-1]
+        self.tabs = [BrowserTab(self, handle) for handle in handles]
+
+
+def auto_browser_count(settings):
+    """As many browsers as the host's cores and available RAM allow"""
+    by_cores = max(1, (os.cpu_count() or 1) // max(1, int(settings['cores_per_browser'])))
+    count = by_cores
+    if psutil is not None:
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        count = min(count, max(1, int(available_mb * 0.8 // int(settings['mb_per_browser']))))
+    return max(1, min(count, int(settings['max_browsers'])))
+
+
+class TabPool:
+    """
+    N long-lived Chromes with M tabs each for the Flask server. Every query of a
+    batch leases one tab; batches waiting for tabs are served round-robin so a large
+    batch cannot starve a small one that arrives after it
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_POOL_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._browsers = []
+        self._free = []
+        self._waiting = OrderedDict()   # batch key -> deque of lease tickets, in turn order
+        self._changed = threading.Condition()
+        self._started = False
+        self._ready = False
+
+    def configure(self, settings=None):
+        """Apply the `browser_pool` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key in self.settings and value is not None:
+                self.settings[key] = value
+
+    @property
+    def enabled(self):
+        enabled = self.settings['enabled']
+        if enabled == 'auto':
+            return os.getenv("platform", "DEPLOY") == "LOCAL"
+        return bool(enabled)
+
+    def size(self):
+        browsers = self.settings['browsers']
+        count = auto_browser_count(self.settings) if browsers == 'auto' else max(1, int(browsers))
+        return count, max(1, int(self.settings['tabs_per_browser']))
+
+    def _add_browser(self):
+        browser = PooledBrowser(build_chrome_driver(POOL_CHROME_ARGS), int(self.size()[1]))
+        with self._changed:
+            self._browsers.append(browser)
+        return browser
+
+    def start(self, bootstrap=None):
+        """
+        Start the browsers and pre-bootstrap their tabs, spread over the origins of
+        warm_search_types. bootstrap(tab, search_type) readies one tab and returns an error or None
+        """
+        with self._changed:
+            if self._started:
+                return
+            self._started = True
+        count, tabs = self.size()
+        logger.info(f"Starting browser pool: {count} browsers x {tabs} tabs")
+        warm_types = list(self.settings['warm_search_types'] or [])
+        started = []
+        for _ in range(count):
+            try:
+                started.append(self._add_browser())
+            except Exception as ex:
+                logger.error(f"Could not start pooled browser: {ex}")
+        all_tabs = [tab for browser in started for tab in browser.tabs]
+        if bootstrap is not None and warm_types:
+            for n, tab in enumerate(all_tabs):
+                try:
+                    error = bootstrap(tab, warm_types[n % len(warm_types)])
+                    if error:
+                        logger.warning(f"Tab bootstrap failed: {error}")
+                except Exception as ex:
+                    logger.warning(f"Tab bootstrap failed: {ex}")
+        with self._changed:
+            self._free.extend(all_tabs)
+            self._ready = True
+            self._changed.notify_all()
+
+    def lease(self, batch_key, origin, timeout=None):
+        """
+        Wait for a tab, preferring one already on `origin`. Batches take turns: each grant
+        goes to the batch at the head of the rotation, which then moves to the back
+        """
+        ticket = object()
+        deadline = time.time() + float(timeout if timeout is not None else self.settings['lease_timeout_seconds'])
+        with self._changed:
+            self._waiting.setdefault(batch_key, deque()).append(ticket)
+            try:
+                while True:
+                    turn = next(iter(self._waiting))
+                    if self._free and turn == batch_key and self._waiting[batch_key][0] is ticket:
+                        tab = next((t for t in self._free if t.origin == origin), self._free[0])
+                        self._free.remove(tab)
+                        tab.leased = True
+                        return tab
+                    if self._ready and not self._browsers:
+                        raise RuntimeError('No pooled browser could be started')
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError('No browser tab became free in time')
+                    self._changed.wait(remaining)
+            finally:
+                tickets = self._waiting.get(batch_key)
+                if tickets is not None:
+                    tickets.remove(ticket)
+                    if tickets:
+                        self._waiting.move_to_end(batch_key)
+                    else:
+                        del self._waiting[batch_key]
+                self._changed.notify_all()
+
+    def release(self, tab, healthy=True):
+        """Return a tab; a Chrome that failed or hit its recycle limits is replaced once its tabs are back"""
+        browser = tab.browser
+        if not healthy or browser.retiring or browser_manager.recycle_reason(browser):
+            browser.retiring = True
+        with self._changed:
+            tab.leased = False
+            if not browser.retiring:
+                self._free.append(tab)
+                self._changed.notify_all()
+                return
+            # Its idle tabs leave the pool now; the browser goes once the leased ones are back
+            self._free = [t for t in self._free if t.browser is not browser]
+            if any(t.leased for t in browser.tabs) or browser not in self._browsers:
+                return
+            self._browsers.remove(browser)
+        logger.info("Replacing pooled browser")
+        browser.quit()
+        try:
+            replacement = self._add_browser()
+        except Exception as ex:
+            logger.error(f"Could not replace pooled browser: {ex}")
+            return
+        with self._changed:
+            self._free.extend(replacement.tabs)
+            self._changed.notify_all()
+
+    def run_batch(self, batch_key, origin, count, bootstrap, run_query):
+        """
+        Run queries 0..count-1, each on its own leased tab, and yield (index, result)
+        as they settle. bootstrap(tab) readies a tab that is not on `origin` and returns
+        an error or None; run_query(tab, index) returns the query's result
+        """
+        if not self._started:
+            self.start()
+        results = queue.Queue()
+        next_index = iter(range(count))
+        index_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with index_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                try:
+                    tab = self.lease(batch_key, origin)
+                except Exception as ex:
+                    results.put((index, {'success': False, 'error': f'Browser pool: {ex}'}))
+                    continue
+                healthy = True
+                try:
+                    if tab.origin != origin:
+                        tab.origin = None
+                        tab.installed = {}
+                        # Not under the browser lock: a CAPTCHA solve must not stall the other tabs
+                        error = bootstrap(tab)
+                        if error:
+                            healthy = False
+                            results.put((index, {'success': False, 'error': error}))
+                            continue
+                        tab.origin = origin
+                    results.put((index, run_query(tab, index)))
+                except Exception as ex:
+                    healthy = False
+                    results.put((index, {'success': False, 'error': f'Browser pool: {ex}'}))
+                finally:
+                    self.release(tab, healthy)
+
+        with self._changed:
+            total_tabs = sum(len(browser.tabs) for browser in self._browsers) or self.size()[0] * self.size()[1]
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(count, total_tabs)))]
+        for thread in threads:
+            thread.start()
+        for _ in range(count):
+            yield results.get()
+
+    def shutdown(self):
+        with self._changed:
+            browsers, self._browsers, self._free = self._browsers, [], []
+            self._started = self._ready = False
+        for browser in browsers:
+            browser.quit()
+
+
+tab_pool = TabPool()
+atexit.register(tab_pool.shutdown)
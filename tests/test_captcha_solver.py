@@ -0,0 +1,199 @@
+"""
+CaptchaSolver against a local fake 2captcha: submit, CAPCHA_NOT_READY backoff,
+pingback delivery and the solve timeout. Nothing here waits on the token except
+the test itself, the way only the page that shows the CAPTCHA does
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from captcha_solver import CaptchaSolver, CaptchaStats, CaptchaError, NOT_READY  # noqa: E402
+
+SITE_KEY = 'fake-site-key'
+PAGE_URL = 'https://www.google.com/sorry/index'
+
+
+class FakeTwoCaptcha(ThreadingHTTPServer):
+    """in.php hands out ids; res.php answers CAPCHA_NOT_READY `not_ready` times, then the token"""
+
+    daemon_threads = True
+
+    def __init__(self, not_ready=0):
+        super().__init__(('127.0.0.1', 0), FakeTwoCaptchaHandler)
+        self.not_ready = not_ready
+        self.submitted = []
+        self.polls = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def poll_times(self):
+        with self.lock:
+            return [at for at, _ in self.polls]
+
+
+class FakeTwoCaptchaHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        server = self.server
+        if urlsplit(self.path).path != '/in.php':
+            return self.send_json({'status': 0, 'request': 'ERROR_WRONG_ACTION'})
+        with server.lock:
+            server.submitted.append(params)
+            captcha_id = str(len(server.submitted))
+        self.send_json({'status': 1, 'request': captcha_id})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        server = self.server
+        if parts.path != '/res.php':
+            return self.send_json({'status': 0, 'request': 'ERROR_WRONG_ACTION'})
+        with server.lock:
+            server.polls.append((time.time(), params['id']))
+            polls = sum(1 for _, captcha_id in server.polls if captcha_id == params['id'])
+        if server.not_ready is None or polls <= server.not_ready:
+            return self.send_json({'status': 0, 'request': NOT_READY})
+        self.send_json({'status': 1, 'request': f"token-{params['id']}"})
+
+
+@pytest.fixture
+def fake_2captcha(monkeypatch):
+    monkeypatch.setenv('TWOCAPTCHA_API_KEY', 'test-key')
+    servers = []
+
+    def start(not_ready=0):
+        server = FakeTwoCaptcha(not_ready)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def solver(server, **settings):
+    return CaptchaSolver(**{'base_url': server.base_url, 'initial_delay_seconds': 0.05,
+                            'poll_interval_seconds': 0.05, 'backoff': 2.0, 'max_poll_interval_seconds': 0.2,
+                            'timeout_seconds': 5.0, 'pingback_url': '', **settings})
+
+
+def test_submit_returns_before_the_token(fake_2captcha):
+    server = fake_2captcha(not_ready=None)
+    captcha_solver = solver(server, initial_delay_seconds=0.5)
+    started = time.time()
+    future = captcha_solver.submit(SITE_KEY, 'data-s', PAGE_URL)
+    assert time.time() - started < 0.2
+    assert not future.done()
+    while not server.submitted:
+        time.sleep(0.01)
+    future.cancel()
+
+
+def test_not_ready_backs_off_until_solved(fake_2captcha):
+    server = fake_2captcha(not_ready=3)
+    stats = CaptchaStats(cost_per_solve=0.003)
+    captcha_solver = solver(server, pingback_url='https://host/captcha/pingback')
+
+    token = captcha_solver.wait(captcha_solver.submit(SITE_KEY, 'data-s', PAGE_URL, stats))
+
+    assert token == 'token-1'
+    assert server.submitted == [{
+        'key': 'test-key', 'method': 'userrecaptcha', 'googlekey': SITE_KEY, 'pageurl': PAGE_URL,
+        'json': '1', 'data-s': 'data-s', 'pingback': 'https://host/captcha/pingback',
+    }]
+    polls = server.poll_times()
+    assert len(polls) == 4
+    # 0.05s, then 0.1s, then 0.2s between polls
+    gaps = [later - earlier for earlier, later in zip(polls, polls[1:])]
+    assert gaps[0] < gaps[1] < gaps[2]
+    assert gaps[2] >= 0.18
+    report = stats.as_dict()
+    assert (report['submitted'], report['solved'], report['failed']) == (1, 1, 0)
+    assert report['cost'] == 0.003
+
+
+def test_pingback_resolves_without_polling(fake_2captcha):
+    server = fake_2captcha(not_ready=None)
+    captcha_solver = solver(server, initial_delay_seconds=10)
+    future = captcha_solver.submit(SITE_KEY, None, PAGE_URL)
+    while not server.submitted:
+        time.sleep(0.01)
+    # The id is registered right after in.php answers
+    for _ in range(100):
+        if captcha_solver.deliver('1', 'pingback-token'):
+            break
+        time.sleep(0.01)
+
+    assert captcha_solver.wait(future) == 'pingback-token'
+    assert server.poll_times() == []
+    assert 'data-s' not in server.submitted[0]
+    assert captcha_solver.deliver('1', 'late-token') is False
+    assert captcha_solver.deliver('unknown', 'token') is False
+
+
+def test_pingback_route_delivers_to_the_waiting_job(fake_2captcha, monkeypatch):
+    import app
+    server = fake_2captcha(not_ready=None)
+    captcha_solver = solver(server, initial_delay_seconds=10)
+    monkeypatch.setattr(app, 'captcha_solver', captcha_solver)
+    future = captcha_solver.submit(SITE_KEY, None, PAGE_URL)
+    client = app.app.test_client()
+    for _ in range(100):
+        response = client.post('/captcha/pingback', data={'id': '1', 'code': 'route-token'})
+        if response.get_json()['delivered']:
+            break
+        time.sleep(0.01)
+    assert captcha_solver.wait(future) == 'route-token'
+    assert client.post('/captcha/pingback', data={'id': '1'}).status_code == 400
+
+
+def test_timeout_fails_the_solve(fake_2captcha):
+    server = fake_2captcha(not_ready=None)
+    stats = CaptchaStats()
+    captcha_solver = solver(server, timeout_seconds=0.3)
+    future = captcha_solver.submit(SITE_KEY, None, PAGE_URL, stats)
+
+    assert captcha_solver.wait(future) is None
+    assert isinstance(future.exception(), CaptchaError)
+    report = stats.as_dict()
+    assert (report['submitted'], report['solved'], report['failed']) == (1, 0, 1)
+
+
+def test_deadline_gives_up_and_stops_polling(fake_2captcha):
+    server = fake_2captcha(not_ready=None)
+    captcha_solver = solver(server)
+    future = captcha_solver.submit(SITE_KEY, None, PAGE_URL)
+
+    assert captcha_solver.wait(future, deadline=time.time() + 0.3) is None
+    assert future.cancelled()
+    time.sleep(0.3)
+    polls = len(server.poll_times())
+    time.sleep(0.5)
+    assert len(server.poll_times()) == polls
@@ -0,0 +1,166 @@
+"""
+The HTTP engine and the in-page extractors must agree on the same SERP.
+
+Each saved SERP in fixtures/ is run through http_engine.extract_results and through
+the matching *-yaml.js bundle in Chrome, with `fetch` stubbed to serve the fixture
+the way benchmarks/google_parse_benchmark.py does. The Chrome half is skipped where
+no Chrome can be started. The fixtures carry a <base href> of the engine's origin, so
+relative links resolve the same way in the page as in http_engine
+"""
+import os
+import sys
+import copy
+import json
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import http_engine  # noqa: E402
+from app import load_yaml_config, compile_extractor, EXTRACTOR_FILES, DEFAULT_CONFIG_PATH  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+QUERY = {'query': 'parity check', 'query_id': 'parity-1'}
+OPTIONS = {'cc': 'US', 'qft': '', 'serpOptions': {}}
+
+# search type -> (fixture, result list that must not come back empty)
+CASES = {
+    'news': ('bing-news.html', 'news_results'),
+    'bing-images': ('bing-images.html', 'image_results'),
+    'bing-web': ('bing-web.html', 'organic_results'),
+    'google-news': ('google-news.html', 'news_results'),
+    'google-web': ('google-web.html', 'organic_results'),
+    'google-images': ('google-images.html', 'image_results'),
+}
+
+# The Google fixtures carry count text inside <title>, which the raw-HTML scan must still
+# find first. The shipped count regexes are double-escaped and never match, so these cases
+# are also run with a working one: search type -> (config section, expected count)
+COUNT_REGEX = r'About ([\d,]+) result'
+COUNT_CASES = {
+    'google-news': ('google_news', '12'),
+    'google-images': ('google_images', '40'),
+}
+
+# Relative times ("3h") become now minus the offset, so the two sides differ by their run time
+RELATIVE_DATE_FIELDS = ('dateUTC',)
+
+# Serves the fixture for every fetch and returns the first result of the installed bundle
+RUN_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const [jsFile, html, query, options] = arguments;
+window.fetch = (url) => Promise.resolve({
+    ok: true, status: 200, url: String(url), text: () => Promise.resolve(html)
+});
+window.__serpExtractors[jsFile].run([query], options)
+    .then(results => done(results[0]))
+    .catch(error => done({ harness_error: error.message }));
+"""
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def load_config():
+    return load_yaml_config(os.path.join(ROOT, DEFAULT_CONFIG_PATH))
+
+
+def with_count_regex(config, section):
+    config = copy.deepcopy(config)
+    config[section]['global']['result_count']['regex'] = COUNT_REGEX
+    return config
+
+
+def python_result(search_type, html_text, config):
+    result = http_engine.extract_results(search_type, html_text, QUERY, config, OPTIONS['cc'], OPTIONS['qft'],
+                                         OPTIONS['serpOptions'])
+    # Same value types as a result handed back by the page
+    return json.loads(json.dumps(result))
+
+
+def normalize(result):
+    """(result without per-run fields, relative dates pulled out of it)"""
+    result = {k: v for k, v in result.items() if k not in ('timings', 'raw_html')}
+    dates = []
+    for items in result.values():
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict):
+                    dates.extend(item.pop(field) for field in RELATIVE_DATE_FIELDS if field in item)
+    return result, dates
+
+
+def assert_same_dates(page_dates, python_dates):
+    assert len(page_dates) == len(python_dates)
+    for page_date, python_date in zip(page_dates, python_dates):
+        if page_date == 'N/A' or python_date == 'N/A':
+            assert page_date == python_date
+            continue
+        page_moment = datetime.fromisoformat(page_date.replace('Z', '+00:00'))
+        python_moment = datetime.fromisoformat(python_date.replace('Z', '+00:00'))
+        assert abs((page_moment - python_moment).total_seconds()) < 60
+
+
+@pytest.mark.parametrize('search_type', sorted(CASES))
+def test_fixture_exercises_extractor(search_type):
+    fixture, results_key = CASES[search_type]
+    result = python_result(search_type, load_fixture(fixture), load_config())
+    assert result.get('success') is True
+    assert result.get(results_key)
+
+
+@pytest.mark.parametrize('search_type', sorted(COUNT_CASES))
+def test_count_inside_title_is_found(search_type):
+    section, expected = COUNT_CASES[search_type]
+    fixture, _ = CASES[search_type]
+    result = python_result(search_type, load_fixture(fixture), with_count_regex(load_config(), section))
+    assert result['serp_result_count'] == expected
+
+
+@pytest.fixture(scope='module')
+def page():
+    from browser_manager import build_chrome_driver
+    try:
+        driver = build_chrome_driver()
+    except Exception as ex:
+        pytest.skip(f"Chrome is not available: {ex}")
+    try:
+        driver.get('data:text/html,<html></html>')
+        driver.set_script_timeout(60)
+        yield driver
+    finally:
+        driver.quit()
+
+
+def assert_parity(page, search_type, config):
+    fixture, _ = CASES[search_type]
+    html_text = load_fixture(fixture)
+    js_file, section = EXTRACTOR_FILES[search_type]
+    bundle_source, _ = compile_extractor(js_file, section, config)
+    page.execute_script(bundle_source)
+
+    page_result = page.execute_async_script(RUN_SCRIPT, js_file, html_text, QUERY, OPTIONS)
+    assert 'harness_error' not in page_result
+
+    page_result, page_dates = normalize(page_result)
+    expected, python_dates = normalize(python_result(search_type, html_text, config))
+    assert page_result == expected
+    assert_same_dates(page_dates, python_dates)
+
+
+@pytest.mark.parametrize('search_type', sorted(CASES))
+def test_http_engine_matches_in_page_extractor(page, search_type, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    assert_parity(page, search_type, load_config())
+
+
+@pytest.mark.parametrize('search_type', sorted(COUNT_CASES))
+def test_result_count_parity(page, search_type, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    section, _ = COUNT_CASES[search_type]
+    assert_parity(page, search_type, with_count_regex(load_config(), section))
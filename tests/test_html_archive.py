@@ -0,0 +1,158 @@
+"""
+HtmlArchive round trip: archive_results -> manifests -> reextract_manifest, on a local
+directory with gzip and zstd blobs and on an S3-compatible endpoint through a stubbed client
+"""
+import io
+import os
+import sys
+import gzip
+import time
+
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber, ANY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import reextract  # noqa: E402
+import html_archive as html_archive_module  # noqa: E402
+from html_archive import HtmlArchive, html_key, blob_name  # noqa: E402
+from http_engine import extract_results  # noqa: E402
+from app import load_yaml_config, DEFAULT_CONFIG_PATH  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CONTEXT = {'search_type': 'news', 'engine': 'http', 'cc': 'US', 'qft': '', 'serpOptions': {}, 'batch_id': 'batch-1'}
+QUERIES = [
+    {'query': 'solar panels', 'query_id': '1'},
+    {'query': 'solar panels', 'query_id': '2'},
+    {'query': 'wind farms', 'query_id': '3'},
+]
+
+BUCKET = 'serp-archive'
+PREFIX = 'serp-html/'
+ENDPOINT = 'http://minio.test:9000'
+
+zstd = pytest.param('zstd', marks=pytest.mark.skipif(html_archive_module.zstandard is None,
+                                                     reason='zstandard is not installed'))
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def fetched(html):
+    """Engine results: a good SERP, the same SERP marked failed, and a query that timed out"""
+    return [
+        {'success': True, 'query': 'solar panels', 'news_results': [], 'raw_html': html},
+        {'success': False, 'query': 'solar panels', 'error': 'No news results', 'raw_html': html},
+        {'success': False, 'query': 'wind farms', 'error': 'Query timeout'},
+    ]
+
+
+def without_dates(items):
+    # Relative times ("3h") become now minus the offset, so two extractions differ by their run time
+    return [{k: v for k, v in item.items() if k != 'dateUTC'} for item in items]
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = load_yaml_config(os.path.join(ROOT, DEFAULT_CONFIG_PATH))
+    monkeypatch.setattr(reextract, '_config', config)
+    return config
+
+
+@pytest.mark.parametrize('compression', ['gzip', zstd])
+def test_local_round_trip(tmp_path, monkeypatch, config, compression):
+    archive = HtmlArchive(backend='local', directory=str(tmp_path), compression=compression)
+    monkeypatch.setattr(reextract, 'html_archive', archive)
+    html = load_fixture('bing-news.html')
+    key = html_key(html)
+    results = fetched(html)
+
+    manifest = archive.archive_results(results, QUERIES, CONTEXT)
+
+    assert all('raw_html' not in result for result in results)
+    assert results[0]['html_archive'] == results[1]['html_archive'] == {'key': key, 'bytes': len(html)}
+    assert 'html_archive' not in results[2]
+    # One blob for the two copies of the SERP
+    assert archive.store().list('blobs/') == [blob_name(key, compression)]
+    assert archive.manifests() == [manifest]
+    assert archive.manifests(time.strftime('%Y-%m-%d', time.gmtime())) == [manifest]
+    entries = archive.read_manifest(manifest)
+    assert [(entry['query_id'], entry['success']) for entry in entries] == [('1', True), ('2', False)]
+    assert entries[0]['search_type'] == 'news' and entries[0]['batch_id'] == 'batch-1'
+
+    repaired, skipped = reextract.reextract_manifest(manifest)
+
+    expected = extract_results('news', html, QUERIES[0], config, 'US', '', {})
+    assert skipped == 0
+    assert [result['success'] for result in repaired] == [True, True]
+    assert [result['previous_success'] for result in repaired] == [True, False]
+    assert without_dates(repaired[0]['news_results']) == without_dates(expected['news_results'])
+    assert repaired[1]['html_archive'] == {'key': key, 'manifest': manifest, 'fetched_at': entries[1]['fetched_at']}
+
+    repaired, skipped = reextract.reextract_manifest(manifest, only_failed=True)
+    assert [result['query_id'] for result in repaired] == ['2']
+    assert skipped == 1
+
+
+def streaming(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+@pytest.fixture
+def s3_archive(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    archive = HtmlArchive(backend='s3', bucket=BUCKET, prefix=PREFIX, endpoint_url=ENDPOINT, compression='gzip')
+    monkeypatch.setattr(reextract, 'html_archive', archive)
+    client = archive.store().client
+    # The stub answers every call; keep what was uploaded so it can be served back
+    uploads = {}
+    client.meta.events.register('before-parameter-build.s3.PutObject',
+                                lambda params, **kwargs: uploads.__setitem__(params['Key'], params['Body']))
+    with Stubber(client) as stubber:
+        yield archive, stubber, uploads
+        stubber.assert_no_pending_responses()
+
+
+def test_s3_round_trip(s3_archive, config):
+    archive, stubber, uploads = s3_archive
+    assert archive.store().client.meta.endpoint_url == ENDPOINT
+    html = load_fixture('bing-news.html')
+    key = html_key(html)
+    blob = PREFIX + blob_name(key, 'gzip')
+
+    stubber.add_client_error('head_object', service_error_code='404', http_status_code=404,
+                             expected_params={'Bucket': BUCKET, 'Key': blob})
+    stubber.add_response('put_object', {}, {'Bucket': BUCKET, 'Key': blob, 'Body': ANY})
+    stubber.add_response('put_object', {}, {'Bucket': BUCKET, 'Key': ANY, 'Body': ANY})
+    results = fetched(html)[:1]
+    manifest = archive.archive_results(results, QUERIES[:1], CONTEXT)
+
+    assert manifest.startswith('manifests/')
+    assert gzip.decompress(uploads[blob]).decode('utf-8') == html
+    assert results[0]['html_archive'] == {'key': key, 'bytes': len(html)}
+
+    stubber.add_response('list_objects_v2', {'Contents': [{'Key': PREFIX + manifest}], 'IsTruncated': False},
+                         {'Bucket': BUCKET, 'Prefix': PREFIX + 'manifests/'})
+    assert archive.manifests() == [manifest]
+
+    stubber.add_response('get_object', {'Body': streaming(uploads[PREFIX + manifest])},
+                         {'Bucket': BUCKET, 'Key': PREFIX + manifest})
+    # get_html looks for a zstd blob first
+    stubber.add_client_error('head_object', service_error_code='404', http_status_code=404,
+                             expected_params={'Bucket': BUCKET, 'Key': PREFIX + blob_name(key, 'zstd')})
+    stubber.add_response('head_object', {}, {'Bucket': BUCKET, 'Key': blob})
+    stubber.add_response('get_object', {'Body': streaming(uploads[blob])}, {'Bucket': BUCKET, 'Key': blob})
+    repaired, skipped = reextract.reextract_manifest(manifest)
+
+    expected = extract_results('news', html, QUERIES[0], config, 'US', '', {})
+    assert skipped == 0
+    assert repaired[0]['success'] is True
+    assert without_dates(repaired[0]['news_results']) == without_dates(expected['news_results'])
+    assert repaired[0]['html_archive']['manifest'] == manifest
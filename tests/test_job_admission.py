@@ -0,0 +1,93 @@
+"""
+/jobs and /stream batches run under the same admission limits as the / endpoint
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+from jobs import JobStore  # noqa: E402
+
+QUERIES = [{'query': 'first', 'query_id': '1'}, {'query': 'second', 'query_id': '2'}]
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    config = {
+        'admission': {'enabled': True, 'max_browsers': 4, 'max_running_queries': 2, 'max_queued_queries': 10,
+                      'max_wait_seconds': 5},
+        'browser_pool': {'enabled': False},
+        'jobs': {'directory': str(tmp_path), 'max_running': 2},
+    }
+    monkeypatch.setattr(app, 'load_yaml_config', lambda *args, **kwargs: config)
+    monkeypatch.setattr(app, 'admission', AdmissionController())
+    monkeypatch.setattr(app, 'job_store', JobStore())
+    release = threading.Event()
+    running = []
+
+    def search_payload(payload, on_result=None):
+        running.append(app.admission.stats()['running_queries'])
+        release.wait(5)
+        return [{'success': True, 'query': query['query'], 'query_id': query['query_id']}
+                for query in payload['queries']]
+
+    monkeypatch.setattr(app, 'search_payload', search_payload)
+    return config, release, running
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_job_holds_an_admission_ticket_while_it_runs(server):
+    _, release, running = server
+    response = app.app.test_client().post('/jobs', json={'queries': QUERIES, 'engine': 'http'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    wait_for(lambda: running)
+    assert running == [2]
+    assert app.admission.stats()['running_queries'] == 2
+    release.set()
+    wait_for(lambda: app.job_store.get(job_id).finished)
+    assert app.job_store.get(job_id).succeeded == 2
+    assert app.admission.stats()['running_queries'] == 0
+
+
+def test_second_job_waits_for_the_first(server):
+    _, release, running = server
+    client = app.app.test_client()
+    first = client.post('/jobs', json={'queries': QUERIES, 'engine': 'http'}).get_json()['job_id']
+    wait_for(lambda: running)
+    second = client.post('/jobs', json={'queries': QUERIES, 'engine': 'http'}).get_json()['job_id']
+    wait_for(lambda: app.admission.stats()['queue_depth'] == 1)
+    assert len(running) == 1
+
+    release.set()
+    wait_for(lambda: app.job_store.get(second).finished)
+    assert app.job_store.get(first).succeeded == app.job_store.get(second).succeeded == 2
+    assert app.admission.stats()['admitted'] == 2
+
+
+def test_stream_turned_away_reports_server_busy(server):
+    config, release, running = server
+    config['admission']['max_queued_queries'] = 0
+    ticket = app.admission.acquire(2, 0)
+    try:
+        response = app.app.test_client().post('/stream', json={'queries': QUERIES, 'engine': 'http'})
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    finally:
+        app.admission.release(ticket, 0)
+    assert running == []
+    assert [line['query_id'] for line in lines] == ['1', '2']
+    assert all(line['error'] == 'Server busy: queue full' for line in lines)
@@ -0,0 +1,68 @@
+"""ResultCache keeps only the extractor payload of a result, never what a run stamped on it"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import ResultCache, VOLATILE_FIELDS, make_key  # noqa: E402
+
+PAYLOAD = {
+    'success': True,
+    'query': 'solar panels',
+    'title': 'solar panels - Bing News',
+    'news_results': [{'position': 1, 'title': 'Rooftop solar output hits a record'}],
+    'result_count': '1230',
+}
+
+# What a browser batch, the retry policy, fan-out and the Lambda handler add to a result
+STAMPS = {
+    'batch_id': 'batch-1',
+    'query_id': 'q-1',
+    'browser': 'warm',
+    'wait_ms': 12.5,
+    'bootstrap_ms': 840,
+    'captcha': {'solved': 1, 'solve_ms': 21000},
+    'engine': 'browser',
+    'rotation': {'rotate': False, 'reason': None, 'block_signals': 0},
+    'cache': {'status': 'miss', 'age_seconds': 0},
+    'timings': {'fetch_ms': 310, 'extract_ms': 4},
+    'html_archive': {'key': 'ab/cd'},
+    'attempts': 2,
+    'failure': 'timeout',
+    'raw_html': '<html></html>',
+    'fanout': {'shard': 3, 'attempts': 1},
+    'unprocessed_query_ids': ['q-9'],
+}
+
+
+def test_every_stamp_is_volatile():
+    assert set(STAMPS) <= set(VOLATILE_FIELDS)
+
+
+def test_cache_replays_only_the_payload(tmp_path):
+    cache = ResultCache(sqlite_path=str(tmp_path / 'cache.sqlite'))
+    key = make_key('news', 'solar  panels', 'us', None, None, 'browser')
+    cache.put(key, {**PAYLOAD, **STAMPS})
+
+    result, age = cache.get(key, ttl=60)
+    assert result == PAYLOAD
+    assert age >= 0
+
+    # Same through the SQLite tier, as after a restart
+    restarted = ResultCache(sqlite_path=str(tmp_path / 'cache.sqlite'))
+    assert restarted.get(key, ttl=60)[0] == PAYLOAD
+
+
+def test_failed_results_are_not_cached():
+    cache = ResultCache()
+    key = make_key('news', 'solar panels', 'US', None, None, 'browser')
+    cache.put(key, {'success': False, 'query': 'solar panels', 'error': 'Block page: CAPTCHA challenge',
+                    'page_type': 'captcha', 'http_status': 200})
+    assert cache.get(key, ttl=60) is None
+
+
+def test_engines_do_not_share_entries():
+    cache = ResultCache()
+    cache.put(make_key('news', 'solar panels', 'US', None, None, 'browser'), PAYLOAD)
+    assert cache.get(make_key('news', 'solar  panels', 'us', None, None, 'browser'), ttl=60)[0] == PAYLOAD
+    assert cache.get(make_key('news', 'solar panels', 'US', None, None, 'http'), ttl=60) is None
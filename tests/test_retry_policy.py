@@ -0,0 +1,59 @@
+"""
+RetryPolicy: transient failures are re-run, blocks only when `block` is opted in
+"""
+import os
+import sys
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from retry_policy import RetryPolicy  # noqa: E402
+from block_detector import block_detector  # noqa: E402
+
+QUERIES = [{'query': 'blocked', 'query_id': '1'}, {'query': 'timed out', 'query_id': '2'}]
+FOUND = {'success': True, 'news_results': []}
+
+
+def first_results():
+    return [
+        block_detector.blocked_result('google', 200, 'https://www.google.com/sorry/index', '', 'blocked', '1'),
+        {'success': False, 'query': 'timed out', 'error': 'Query timeout'},
+    ]
+
+
+def run(policy):
+    searched = []
+
+    def search(sub_queries):
+        searched.append([query['query_id'] for query in sub_queries])
+        return [dict(FOUND, query=query['query']) for query in sub_queries]
+
+    results = policy.run(QUERIES, first_results(), search, sleep=lambda seconds: None)
+    return results, searched
+
+
+def test_blocks_are_not_retried_by_default():
+    results, searched = run(RetryPolicy())
+    assert searched == [['2']]
+    assert results[0]['failure'] == 'block'
+    assert results[0]['attempts'] == 1
+    assert results[1]['success'] is True
+    assert results[1]['attempts'] == 2
+
+
+def test_shipped_config_leaves_blocks_alone():
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as file:
+        settings = yaml.safe_load(file)['error_handling']
+    policy = RetryPolicy()
+    policy.configure(settings)
+    assert run(policy)[1] == [['2']]
+
+
+def test_block_retries_are_opt_in():
+    policy = RetryPolicy()
+    policy.configure({'retry_on': ['timeout', 'block']})
+    results, searched = run(policy)
+    assert searched == [['1', '2']]
+    assert [result['attempts'] for result in results] == [2, 2]
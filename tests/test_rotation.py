@@ -0,0 +1,183 @@
+"""
+RotationPolicy against a stubbed Lambda client: block-signal threshold, the
+min_interval_seconds cooldown and what counts as a block
+"""
+import os
+import sys
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rotation  # noqa: E402
+from rotation import RotationPolicy, is_block_signal  # noqa: E402
+from block_detector import block_detector  # noqa: E402
+
+FUNCTION_NAME = 'serp-scraper'
+VARIABLES = {'MY_AWS_ACCESS_KEY_ID': 'key', 'TWOCAPTCHA_API_KEY': ''}
+
+BLOCKED = {'success': False, 'query': 'q', 'error': 'Block page: CAPTCHA challenge'}
+FAILED = {'success': False, 'query': 'q', 'error': 'HTTP error! status: 500'}
+FOUND = {'success': True, 'query': 'q', 'news_results': []}
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubbedLambda:
+    """client_factory handing out boto3 Lambda clients whose calls are stubbed"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.configs = []
+        self.stubbers = []
+
+    def __call__(self, **kwargs):
+        client = boto3.client('lambda', region_name='us-east-1', aws_access_key_id='test',
+                              aws_secret_access_key='test', **kwargs)
+        stubber = Stubber(client)
+        if self.error:
+            stubber.add_client_error('update_function_configuration', service_error_code=self.error,
+                                     http_status_code=429)
+        else:
+            stubber.add_response('update_function_configuration', {'FunctionName': FUNCTION_NAME}, {
+                'FunctionName': FUNCTION_NAME,
+                'Environment': {'Variables': {**VARIABLES, 'ENV_VARIABLE': StubbedValue()}},
+            })
+        stubber.activate()
+        self.configs.append(kwargs.get('config'))
+        self.stubbers.append(stubber)
+        return client
+
+    @property
+    def calls(self):
+        return len(self.stubbers)
+
+    def assert_called(self):
+        for stubber in self.stubbers:
+            stubber.assert_no_pending_responses()
+
+
+class StubbedValue(str):
+    """Matches the random ENV_VARIABLE every rotation writes"""
+
+    def __eq__(self, other):
+        return isinstance(other, str) and bool(other)
+
+    def __hash__(self):
+        return 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rotation.time, 'time', clock)
+    return clock
+
+
+def policy(**settings):
+    return RotationPolicy(**{'block_threshold': 3, 'window_seconds': 300, 'cadence_seconds': 0,
+                             'min_interval_seconds': 60, **settings})
+
+
+def test_below_threshold_does_not_rotate(clock):
+    lambda_client = StubbedLambda()
+    rotation_policy = policy()
+    decision = rotation_policy.after_request([BLOCKED, BLOCKED, FOUND], FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision == {'rotate': False, 'reason': None, 'block_signals': 2}
+    assert lambda_client.calls == 0
+
+
+def test_threshold_rotates_before_returning(clock):
+    lambda_client = StubbedLambda()
+    rotation_policy = policy()
+    rotation_policy.after_request([BLOCKED, BLOCKED], FUNCTION_NAME, lambda_client, VARIABLES)
+    decision = rotation_policy.after_request([BLOCKED], FUNCTION_NAME, lambda_client, VARIABLES)
+
+    assert decision['rotate'] is True
+    assert decision['reason'] == '3 block signals in 300s'
+    # The Lambda API call has already been made when after_request returns
+    lambda_client.assert_called()
+    assert lambda_client.calls == 1
+    config = lambda_client.configs[0]
+    assert config.connect_timeout == rotation_policy.settings['connect_timeout_seconds']
+    assert config.read_timeout == rotation_policy.settings['read_timeout_seconds']
+    assert rotation_policy.last_rotation == clock.now
+    assert rotation_policy.decide()['block_signals'] == 0
+
+
+def test_signals_outside_the_window_expire(clock):
+    lambda_client = StubbedLambda()
+    rotation_policy = policy()
+    rotation_policy.after_request([BLOCKED, BLOCKED], FUNCTION_NAME, lambda_client, VARIABLES)
+    clock.now += 301
+    decision = rotation_policy.after_request([BLOCKED], FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision['rotate'] is False
+    assert decision['block_signals'] == 1
+    assert lambda_client.calls == 0
+
+
+def test_cooldown_holds_back_the_next_rotation(clock):
+    lambda_client = StubbedLambda()
+    rotation_policy = policy()
+    assert rotation_policy.after_request([BLOCKED] * 3, FUNCTION_NAME, lambda_client, VARIABLES)['rotate']
+
+    clock.now += 30
+    decision = rotation_policy.after_request([BLOCKED] * 5, FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision['rotate'] is False
+    assert lambda_client.calls == 1
+
+    clock.now += 31
+    decision = rotation_policy.after_request([], FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision['rotate'] is True
+    assert lambda_client.calls == 2
+    lambda_client.assert_called()
+
+
+def test_cadence_rotates_without_block_signals(clock):
+    lambda_client = StubbedLambda()
+    rotation_policy = policy(cadence_seconds=600)
+    assert rotation_policy.after_request([FOUND], FUNCTION_NAME, lambda_client, VARIABLES)['rotate'] is False
+    clock.now += 600
+    decision = rotation_policy.after_request([FOUND], FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision['rotate'] is True
+    assert decision['reason'] == 'cadence of 600s elapsed'
+
+
+def test_failed_rotation_keeps_the_signals(clock):
+    lambda_client = StubbedLambda(error='TooManyRequestsException')
+    rotation_policy = policy()
+    decision = rotation_policy.after_request([BLOCKED] * 3, FUNCTION_NAME, lambda_client, VARIABLES)
+    assert decision['rotate'] is False
+    assert decision['reason'].startswith('rotation failed:')
+    assert rotation_policy.decide()['block_signals'] == 3
+
+
+def test_no_function_name_never_calls_the_api(clock):
+    lambda_client = StubbedLambda()
+    decision = policy().after_request([BLOCKED] * 3, None, lambda_client, VARIABLES)
+    assert decision == {'rotate': False, 'reason': 'no function name to rotate', 'block_signals': 3}
+    assert lambda_client.calls == 0
+
+
+@pytest.mark.parametrize('result, blocked', [
+    (BLOCKED, True),
+    (block_detector.blocked_result('google', 200, 'https://www.google.com/sorry/index', '', 'q'), True),
+    (block_detector.blocked_result('bing', 429, 'https://www.bing.com/search?q=q', 'x' * 600, 'q'), True),
+    ({'error': True, 'query': 'q', 'message': 'No meaningful content found in result, Request limit reached'},
+     True),
+    ({'success': False, 'error': 'HTTP error! status: 403'}, True),
+    (FAILED, False),
+    ({'success': False, 'error': 'Query timeout'}, False),
+    (FOUND, False),
+    ({**BLOCKED, 'success': True}, False),
+])
+def test_block_trigger(result, blocked):
+    assert is_block_signal(result) is blocked
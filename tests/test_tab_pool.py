@@ -0,0 +1,127 @@
+"""
+TabPool on a fake driver: a tab bootstrapping (e.g. waiting on a CAPTCHA token) must
+not hold the browser lock, and elements stay bound to their own tab. Fan-out shards
+must keep their worker processes off the pool
+"""
+import os
+import sys
+import threading
+
+import pytest
+from selenium.webdriver.remote.webelement import WebElement
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tab_pool as tab_pool_module  # noqa: E402
+from tab_pool import TabPool  # noqa: E402
+
+ORIGIN = 'https://www.google.com/search?q=warm'
+
+
+class FakeElement(WebElement):
+    """Answers with the tab the driver is focused on when the command runs"""
+
+    def __init__(self, driver, handle):
+        super().__init__(driver, f'element-{handle}')
+        self.handle = handle
+
+    def get_attribute(self, name):
+        return self.parent.current_window_handle
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.handles.append(f'tab-{len(self.driver.handles)}')
+        self.driver.current_window_handle = self.driver.handles[-1]
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    def __init__(self):
+        self.handles = ['tab-0']
+        self.current_window_handle = 'tab-0'
+        self.switch_to = FakeSwitchTo(self)
+        self.script_args = []
+
+    def find_element(self, by=None, value=None):
+        return FakeElement(self, self.current_window_handle)
+
+    def execute_script(self, script, *args):
+        self.script_args.append(args)
+        return self.current_window_handle
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(tab_pool_module, 'build_chrome_driver', lambda args=(): FakeDriver())
+    tab_pool = TabPool(enabled=True, browsers=1, tabs_per_browser=2, lease_timeout_seconds=5)
+    tab_pool.start()
+    yield tab_pool
+    tab_pool.shutdown()
+
+
+def test_bootstrap_does_not_hold_the_browser_lock(pool):
+    token_wanted = threading.Event()
+    other_tab_ran = threading.Event()
+
+    def bootstrap(tab):
+        # The first tab waits for its "token" until the other tab got a command through
+        if not token_wanted.is_set():
+            token_wanted.set()
+            assert other_tab_ran.wait(5), 'the other tab was stalled by the bootstrap'
+        return None
+
+    def run_query(tab, index):
+        result = tab.driver.execute_script('return 1;')
+        if token_wanted.is_set():
+            other_tab_ran.set()
+        return {'success': True, 'tab': result}
+
+    results = dict(pool.run_batch(object(), ORIGIN, 2, bootstrap, run_query))
+    assert all(result['success'] for result in results.values())
+    assert {result['tab'] for result in results.values()} == {'tab-0', 'tab-1'}
+
+
+def test_elements_run_on_their_own_tab(pool):
+    first, second = pool.lease('a', ORIGIN), pool.lease('b', ORIGIN)
+    try:
+        element = first.driver.find_element('css selector', 'div#recaptcha')
+        # Another thread moves the shared driver to the other tab in between
+        second.driver.execute_script('return 1;')
+        assert element.get_attribute('data-sitekey') == first.handle
+
+        second.driver.execute_script('arguments[0].click();', element)
+        assert isinstance(first.browser.driver.script_args[-1][0], FakeElement)
+    finally:
+        pool.release(first)
+        pool.release(second)
+
+
+def test_fanout_shards_stay_off_the_pool(monkeypatch):
+    import app
+    calls = []
+
+    def run(payload, invoke, processes=False, deadline=None):
+        calls.append((payload, processes))
+        return []
+
+    monkeypatch.setattr(app.fanout_coordinator, 'mode', lambda function_name: 'local')
+    monkeypatch.setattr(app.fanout_coordinator, 'run', run)
+    app.fanout_search({'queries': [{'query': 'q'}], 'search_type': 'news'})
+    payload, processes = calls[0]
+    assert processes is True
+    assert payload['browser_pool'] == {'enabled': False}
+
+    seen = []
+    monkeypatch.setattr(app, 'Gen_search', lambda *args, **kwargs: seen.append(kwargs['use_pool']))
+    app.search_payload(payload)
+    app.search_payload({'queries': []})
+    assert seen == [False, True]
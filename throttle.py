@@ -0,0 +1,234 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from loguru import logger
+
+from rotation import is_block_signal
+
+# Throttle settings, overridable from the `throttle` section of config.yaml
+DEFAULT_THROTTLE_SETTINGS = {
+    'enabled': True,
+    # Shared by every process on this host (Flask threads, local fan-out workers)
+    'sqlite_path': os.getenv('THROTTLE_PATH', '/tmp/serp-throttle.sqlite'),
+    'identity': os.getenv('EGRESS_IDENTITY', 'auto'),   # auto: this host, i.e. its egress IP
+    'engines': {
+        'bing': {'rate_per_second': 2.0, 'burst': 10},
+        'google': {'rate_per_second': 0.5, 'burst': 5},
+    },
+    'max_wait_seconds': 30,       # queries still without a token after this long come back unprocessed
+    'window_seconds': 120,        # block rate is measured over this window
+    'min_samples': 10,
+    'block_rate': 0.3,            # open the circuit at this share of blocked results
+    'open_seconds': 60,           # then stop fetching for this long before probing
+    'probe_queries': 2,           # queries let through while half-open; all must pass to close
+}
+
+GOOGLE_SEARCH_TYPES = ("google-news", "google-web", "google-images")
+
+
+def search_engine(search_type):
+    """'google' or 'bing', the site a search type fetches from"""
+    return "google" if search_type in GOOGLE_SEARCH_TYPES else "bing"
+
+
+class EngineThrottle:
+    """
+    Token bucket and circuit breaker per search engine and egress identity, kept in
+    SQLite so all worker processes on the host draw from the same budget. The circuit
+    opens when too many recent results were blocks or CAPTCHAs, then half-opens after
+    open_seconds and lets a few probe queries decide whether to close again
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_THROTTLE_SETTINGS)
+        self.settings.update({k: v for k, v in settings.items() if v is not None})
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_path = None
+
+    def configure(self, settings=None):
+        """Apply the `throttle` section of config.yaml"""
+        for key, value in (settings or {}).items():
+            if key not in self.settings or value is None:
+                continue
+            if key == 'engines':
+                value = {**self.settings['engines'], **value}
+            self.settings[key] = value
+
+    @property
+    def enabled(self):
+        return bool(self.settings['enabled'])
+
+    def key(self, engine):
+        identity = self.settings['identity']
+        if not identity or identity == 'auto':
+            identity = socket.gethostname()
+        return f"{engine}@{identity}"
+
+    def limits(self, engine):
+        limits = self.settings['engines'].get(engine) or {}
+        return max(0.001, float(limits.get('rate_per_second', 1.0))), max(1, int(limits.get('burst', 1)))
+
+    def _connection(self):
+        path = self.settings['sqlite_path']
+        if self._db is None or self._db_path != path:
+            self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL);"
+                "CREATE TABLE IF NOT EXISTS breakers (key TEXT PRIMARY KEY, state TEXT, opened_at REAL,"
+                " probes INTEGER, passed INTEGER);"
+                "CREATE TABLE IF NOT EXISTS outcomes (key TEXT, at REAL, blocked INTEGER);"
+                "CREATE INDEX IF NOT EXISTS outcomes_key_at ON outcomes (key, at);"
+            )
+            self._db_path = path
+        return self._db
+
+    @contextmanager
+    def _transaction(self):
+        """One read-modify-write of the shared state, exclusive across processes"""
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _breaker(self, db, key, now):
+        """(state, opened_at, probes, passed), moving an expired open circuit to half-open"""
+        row = db.execute("SELECT state, opened_at, probes, passed FROM breakers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return 'closed', None, 0, 0
+        state, opened_at, probes, passed = row
+        open_seconds = float(self.settings['open_seconds'])
+        if state == 'open' and now - opened_at >= open_seconds:
+            state, probes, passed = 'half_open', 0, 0
+            self._set_breaker(db, key, state, opened_at, probes, passed)
+            logger.info(f"Circuit for {key} half-open: probing")
+        elif state == 'half_open' and probes and now - opened_at >= 2 * open_seconds:
+            # Probes that never reported back (e.g. a crashed worker) must not hold the circuit forever
+            probes, passed, opened_at = 0, 0, now - open_seconds
+            self._set_breaker(db, key, state, opened_at, probes, passed)
+        return state, opened_at, probes, passed
+
+    @staticmethod
+    def _set_breaker(db, key, state, opened_at, probes, passed):
+        db.execute("INSERT OR REPLACE INTO breakers (key, state, opened_at, probes, passed) VALUES (?, ?, ?, ?, ?)",
+                   (key, state, opened_at, probes, passed))
+
+    def _take(self, engine, wanted, now, partial=False):
+        """
+        Try to take tokens for up to `wanted` queries, a full burst unless `partial`.
+        Returns (granted, wait, reason): granted > 0 on success, otherwise the seconds
+        until the tokens are there, or wait None with the reason when waiting cannot help
+        """
+        key = self.key(engine)
+        rate, burst = self.limits(engine)
+        with self._transaction() as db:
+            state, opened_at, probes, passed = self._breaker(db, key, now)
+            if state == 'open':
+                return 0, None, f"Circuit open for {engine}: too many blocked requests"
+            if state == 'half_open':
+                wanted = min(wanted, int(self.settings['probe_queries']) - probes)
+                if wanted <= 0:
+                    return 0, None, f"Circuit half-open for {engine}: waiting for probe queries"
+            row = db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            # Fetch in chunks of a full burst; a smaller chunk only when the batch is smaller
+            need = min(wanted, burst)
+            if partial:
+                need = min(need, max(1, int(tokens)))
+            granted = need if tokens >= need else 0
+            db.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                       (key, tokens - granted, now))
+            if granted and state == 'half_open':
+                self._set_breaker(db, key, state, opened_at, probes + granted, passed)
+            if granted:
+                return granted, 0, None
+            return 0, (need - tokens) / rate, None
+
+    def acquire(self, engine, wanted, deadline=None):
+        """
+        Wait until the engine may take more queries and return (granted, reason).
+        granted is how many of the `wanted` queries may be fetched now; 0 with the reason
+        when the circuit is open or no token comes before max_wait_seconds or the deadline
+        """
+        if not self.enabled or wanted <= 0:
+            return wanted, None
+        limit = time.time() + float(self.settings['max_wait_seconds'])
+        if deadline is not None:
+            limit = min(limit, deadline)
+        partial = False
+        while True:
+            now = time.time()
+            try:
+                granted, wait, reason = self._take(engine, wanted, now, partial)
+            except sqlite3.Error as ex:
+                # A broken store must not stop searching; fall back to no limit
+                logger.error(f"Throttle store unavailable, not throttling: {ex}")
+                return wanted, None
+            if granted:
+                return granted, None
+            if wait is None:
+                return 0, reason
+            if now + wait > limit and not partial:
+                # A full chunk would come too late; settle for the tokens there are
+                partial = True
+                continue
+            if now + wait > limit:
+                return 0, f"Rate limit for {engine}: no capacity within {self.settings['max_wait_seconds']}s"
+            time.sleep(wait)
+
+    def record(self, engine, results):
+        """Feed finished results to the circuit breaker; unprocessed ones are not samples"""
+        if not self.enabled:
+            return
+        samples = [is_block_signal(r) for r in results or []
+                   if isinstance(r, dict) and not r.get('unprocessed')]
+        if not samples:
+            return
+        key = self.key(engine)
+        now = time.time()
+        window = float(self.settings['window_seconds'])
+        try:
+            with self._transaction() as db:
+                db.executemany("INSERT INTO outcomes (key, at, blocked) VALUES (?, ?, ?)",
+                               [(key, now, int(blocked)) for blocked in samples])
+                db.execute("DELETE FROM outcomes WHERE at < ?", (now - window,))
+                state, opened_at, probes, passed = self._breaker(db, key, now)
+                if state == 'half_open':
+                    if any(samples):
+                        self._set_breaker(db, key, 'open', now, 0, 0)
+                        logger.warning(f"Circuit for {key} reopened: a probe query was blocked")
+                    elif passed + len(samples) >= int(self.settings['probe_queries']):
+                        self._set_breaker(db, key, 'closed', None, 0, 0)
+                        db.execute("DELETE FROM outcomes WHERE key = ?", (key,))
+                        logger.info(f"Circuit for {key} closed: probe queries passed")
+                    else:
+                        self._set_breaker(db, key, state, opened_at, probes, passed + len(samples))
+                elif state == 'closed':
+                    total, blocked = db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(blocked), 0) FROM outcomes WHERE key = ?", (key,)
+                    ).fetchone()
+                    if total >= int(self.settings['min_samples']) and blocked / total >= float(self.settings['block_rate']):
+                        self._set_breaker(db, key, 'open', now, 0, 0)
+                        logger.warning(f"Circuit for {key} opened: {blocked}/{total} results blocked "
+                                       f"in {window:.0f}s")
+        except sqlite3.Error as ex:
+            logger.error(f"Could not record throttle outcomes: {ex}")
+
+    def state(self, engine):
+        """The circuit state of an engine for this egress identity"""
+        try:
+            with self._transaction() as db:
+                return self._breaker(db, self.key(engine), time.time())[0]
+        except sqlite3.Error:
+            return 'closed'
+
+
+engine_throttle = EngineThrottle()
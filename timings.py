@@ -0,0 +1,92 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Metric settings, overridable from the `metrics` section of config.yaml
+DEFAULT_METRICS_SETTINGS = {
+    'emf': True,
+    'namespace': 'SerpScraper',
+}
+
+# Per-query timings the extractors report alongside each result
+QUERY_TIMINGS = ('fetch_ms', 'extract_ms', 'wait_ms')
+
+
+class BatchTimer:
+    """Wall-clock spans for the phases of one batch, plus per-query timings and event counts"""
+
+    def __init__(self):
+        self.spans = {}
+        self.counts = {}
+        self.queries = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name, ms):
+        """Add to a phase; repeated phases (e.g. several CAPTCHA solves) accumulate"""
+        with self._lock:
+            self.spans[name] = round(self.spans.get(name, 0) + ms, 1)
+
+    def count(self, name, n=1):
+        """Count an event of the batch, e.g. a block page"""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def take_query_timings(self, result, wait_ms=None):
+        """Pop the timings an extractor attached to a result and remember them for the batch"""
+        timings = {}
+        if isinstance(result, dict) and isinstance(result.get('timings'), dict):
+            timings = result.pop('timings')
+        if wait_ms is not None:
+            timings['wait_ms'] = wait_ms
+        self.queries.append(timings)
+        return timings
+
+    def as_dict(self, query_timings=None):
+        block = {'phases': dict(self.spans)}
+        if self.counts:
+            block['counts'] = dict(self.counts)
+        if query_timings is not None:
+            block['query'] = query_timings
+        return block
+
+    def emit(self, search_type, engine, settings=None):
+        """Print the batch as one CloudWatch Embedded Metric Format line"""
+        options = dict(DEFAULT_METRICS_SETTINGS)
+        options.update(settings or {})
+        if not options['emf']:
+            return None
+
+        values = {f'{name}_ms': ms for name, ms in self.spans.items()}
+        for key in QUERY_TIMINGS:
+            samples = [q[key] for q in self.queries if isinstance(q.get(key), (int, float))]
+            if samples:
+                values[f'query_{key}'] = samples[:100]  # EMF caps a metric at 100 values
+        units = {name: 'Milliseconds' for name in values}
+        values.update(self.counts)
+        units.update({name: 'Count' for name in self.counts})
+
+        line = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': options['namespace'],
+                    'Dimensions': [['search_type'], ['search_type', 'engine']],
+                    'Metrics': [{'Name': name, 'Unit': units[name]} for name in values],
+                }],
+            },
+            'search_type': search_type or 'news',
+            'engine': engine or 'browser',
+            'queries': len(self.queries),
+        }
+        line.update(values)
+        print(json.dumps(line), flush=True)
+        return line
@@ -0,0 +1,160 @@
+import gzip
+import json
+import time
+import threading
+from collections import defaultdict, deque
+from loguru import logger
+
+ARCHIVE_FORMAT = 'serp-traffic'
+ARCHIVE_VERSION = 1
+
+MODES = ('record', 'replay')
+TIMINGS = ('original', 'fast')
+
+# Swaps window.fetch for a recorder or an archive-backed replayer. The real fetch is
+# kept so `mode = null` restores live traffic for the next batch on a warm browser.
+# arguments: mode, replay entries, timing
+TRAFFIC_SHIM_SCRIPT = """
+const mode = arguments[0];
+const entries = arguments[1] || [];
+const timing = arguments[2];
+const state = window.__serpTraffic || (window.__serpTraffic = { realFetch: window.fetch.bind(window) });
+state.mode = mode;
+state.timing = timing;
+state.recorded = [];
+state.replay = {};
+for (const entry of entries) {
+    (state.replay[entry.url] = state.replay[entry.url] || []).push(entry);
+}
+if (!state.installed) {
+    state.installed = true;
+    window.fetch = async function (input, init) {
+        const url = typeof input === 'string' ? input : (input && input.url) || String(input);
+        const method = (init && init.method) || (input && input.method) || 'GET';
+        if (state.mode === 'record') {
+            const started = performance.now();
+            const response = await state.realFetch(input, init);
+            const body = await response.clone().text();
+            const headers = {};
+            response.headers.forEach((value, name) => { headers[name] = value; });
+            state.recorded.push({
+                url, method, status: response.status, headers, body,
+                started_ms: started, elapsed_ms: performance.now() - started
+            });
+            return response;
+        }
+        if (state.mode === 'replay') {
+            // Repeated URLs are served in recorded order; the last one keeps answering
+            const queue = state.replay[url];
+            const entry = queue && (queue.length > 1 ? queue.shift() : queue[0]);
+            if (!entry) {
+                return new Response(`Not in traffic archive: ${url}`, { status: 504 });
+            }
+            if (state.timing === 'original' && entry.elapsed_ms > 0) {
+                await new Promise(resolve => setTimeout(resolve, entry.elapsed_ms));
+            }
+            const nullBody = [101, 204, 205, 304].includes(entry.status);
+            return new Response(nullBody ? null : entry.body, { status: entry.status, headers: entry.headers || {} });
+        }
+        return state.realFetch(input, init);
+    };
+}
+return true;
+"""
+
+# Hands back what the recorder captured and puts the page back on live traffic
+TRAFFIC_COLLECT_SCRIPT = """
+const state = window.__serpTraffic;
+if (!state) return [];
+const recorded = state.recorded || [];
+state.mode = null;
+state.recorded = [];
+state.replay = {};
+return recorded;
+"""
+
+
+class TrafficArchive:
+    """
+    SERP fetch responses (URL, status, headers, body, timing) for record/replay runs
+    of Gen_search, stored as gzipped JSON lines: a header line, then one line per response
+    """
+
+    def __init__(self, mode, path, timing='original'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown traffic mode {mode!r}, expected one of {MODES}")
+        if timing not in TIMINGS:
+            raise ValueError(f"Unknown replay timing {timing!r}, expected one of {TIMINGS}")
+        self.mode = mode
+        self.path = path
+        self.timing = timing
+        self.meta = {}
+        self.entries = []
+        self._queues = None
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self.load()
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def add(self, entries):
+        with self._lock:
+            self.entries.extend(entries)
+
+    def record(self, url, method, status, headers, body, started_ms, elapsed_ms):
+        self.add([{
+            'url': url, 'method': method, 'status': status, 'headers': headers, 'body': body,
+            'started_ms': started_ms, 'elapsed_ms': elapsed_ms,
+        }])
+
+    def replay(self, url):
+        """Next recorded response for a URL, after its original latency unless timing is 'fast'"""
+        with self._lock:
+            if self._queues is None:
+                self._queues = defaultdict(deque)
+                for entry in self.entries:
+                    self._queues[entry['url']].append(entry)
+            queue = self._queues.get(url)
+            if not queue:
+                return None
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.timing == 'original' and entry.get('elapsed_ms'):
+            time.sleep(entry['elapsed_ms'] / 1000)
+        return entry
+
+    def save(self, **meta):
+        header = {'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION, 'created': time.time()}
+        header.update(meta)
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as file:
+            file.write(json.dumps(header) + '\n')
+            for entry in entries:
+                file.write(json.dumps(entry) + '\n')
+        logger.info(f"Recorded {len(entries)} responses to {self.path}")
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            header = json.loads(file.readline() or '{}')
+            if header.get('format') != ARCHIVE_FORMAT:
+                raise ValueError(f"{self.path} is not a SERP traffic archive")
+            self.meta = header
+            self.entries = [json.loads(line) for line in file if line.strip()]
+        self._queues = None
+        logger.debug(f"Loaded {len(self.entries)} recorded responses from {self.path}")
+
+
+def install_traffic_shim(driver, archive):
+    """Start recording or replaying the page's fetch calls for one batch"""
+    entries = [] if archive.recording else archive.entries
+    driver.execute_script(TRAFFIC_SHIM_SCRIPT, archive.mode, entries, archive.timing)
+
+
+def collect_traffic(driver, archive):
+    """Stop the shim and keep whatever the page recorded"""
+    recorded = driver.execute_script(TRAFFIC_COLLECT_SCRIPT) or []
+    if archive.recording:
+        archive.add(recorded)
+    return len(recorded)